@@ -8,4 +8,7 @@ pip install -r requirements.txt
 python manage.py collectstatic --no-input
 
 # Jalankan migrasi database
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+
+# Tabel cache bersama (nomor versi laporan), jika REDIS_URL tidak diisi
+python manage.py createcachetable
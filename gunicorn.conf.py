@@ -0,0 +1,23 @@
+# gunicorn.conf.py
+
+"""
+Dibaca otomatis oleh gunicorn (`gunicorn spp_sekolah.wsgi` dari folder ini).
+Hook di bawah merapikan folder metrik multi-proses (lihat pembayaran/metrics.py).
+"""
+
+import os
+
+from pembayaran import metrics
+
+
+def on_starting(server):
+    # File dari run sebelumnya (worker yang sudah mati) tidak ikut dijumlahkan
+    folder = os.getenv('METRICS_MULTIPROC_DIR')
+    if folder:
+        metrics.bersihkan_folder(folder)
+
+
+def child_exit(server, worker):
+    folder = os.getenv('METRICS_MULTIPROC_DIR')
+    if folder:
+        metrics.tutup_proses(folder, worker.pid)
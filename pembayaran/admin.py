@@ -3,13 +3,79 @@
 import os
 from django.conf import settings
 from django.contrib.staticfiles import finders
+from django import forms
 from django.contrib import admin, messages
 from django.contrib.humanize.templatetags.humanize import intcomma
 from django.db.models import Sum
-from .models import Siswa, Tagihan, Pembayaran, BuatTagihanMassal
-from django.shortcuts import render
+from .models import Sekolah, Siswa, Tagihan, Pembayaran, BuatTagihanMassal, TagihanArsip, PembayaranArsip, MutasiSaldo, PengingatTerkirim, TutupTahun, WaliKelas, JadwalTagihan
+from .search import PencarianTerindeksMixin, cari_siswa, cari_tagihan, cari_pembayaran
+from .importer import baca_csv, impor_siswa, tautan_aktivasi, tulis_csv_tautan, validasi
+from . import reports
+from .tenancy import staff_sekolah
+from .cash import catat_pembayaran_tunai
+from django.contrib.admin.helpers import ActionForm
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import render, redirect
 from django.utils.html import format_html
-from django.urls import reverse
+from django.urls import reverse, path
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+class PerSekolahMixin:
+    """
+    Admin hanya melihat & membuat data milik sekolah domain yang sedang dibuka
+    (request.sekolah, diisi tenancy.SekolahMiddleware), dan hanya jika akunnya
+    staff sekolah itu (Sekolah.staff) atau superuser.
+    `field_sekolah` = lookup ke Sekolah untuk model yang tidak punya kolom sekolah sendiri.
+    """
+    field_sekolah = 'sekolah'
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if not staff_sekolah(request):
+            return qs.none()
+        return qs.filter(**{self.field_sekolah: request.sekolah})
+
+    def has_module_permission(self, request):
+        return staff_sekolah(request) and super().has_module_permission(request)
+
+    def has_view_permission(self, request, obj=None):
+        return staff_sekolah(request) and super().has_view_permission(request, obj)
+
+    def has_add_permission(self, request):
+        return staff_sekolah(request) and super().has_add_permission(request)
+
+    def has_change_permission(self, request, obj=None):
+        return staff_sekolah(request) and super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        return staff_sekolah(request) and super().has_delete_permission(request, obj)
+
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        if self.field_sekolah != 'sekolah':
+            return form
+        sekolah = request.sekolah
+
+        class FormPerSekolah(form):
+            def __init__(self, *args, **kw):
+                super().__init__(*args, **kw)
+                if self.instance.sekolah_id is None:
+                    self.instance.sekolah = sekolah
+
+            def _get_validation_exclusions(self):
+                # Tetap validasi constraint yang memuat sekolah (misal NIS unik per sekolah)
+                exclude = super()._get_validation_exclusions()
+                exclude.discard('sekolah')
+                return exclude
+
+        return FormPerSekolah
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # Pilihan siswa/tagihan di form juga dibatasi ke sekolah ini
+        if db_field.name in ('siswa', 'tagihan'):
+            kwargs['queryset'] = db_field.related_model.objects.filter(sekolah=request.sekolah)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 class TagihanInline(admin.TabularInline):
     """
@@ -37,10 +103,14 @@ class PembayaranInline(admin.TabularInline):
     def has_add_permission(self, request, obj=None):
         return False
 
+class ImporSiswaForm(forms.Form):
+    file_csv = forms.FileField(label="File CSV")
+
 @admin.register(Siswa)
-class SiswaAdmin(admin.ModelAdmin):
+class SiswaAdmin(PerSekolahMixin, PencarianTerindeksMixin, admin.ModelAdmin):
     list_display = ('nama_lengkap', 'nis', 'kelas', 'total_tagihan_siswa', 'total_tunggakan_siswa')
     search_fields = ('nama_lengkap', 'nis')
+    fungsi_pencarian = staticmethod(cari_siswa)
     list_filter = ('kelas',)
     inlines = [TagihanInline]
 
@@ -50,7 +120,7 @@ class SiswaAdmin(admin.ModelAdmin):
     total_tagihan_siswa.short_description = "Total Tagihan (Semua)"
 
     def total_tunggakan_siswa(self, obj):
-        tagihan_list = Tagihan.objects.filter(siswa=obj).exclude(status='LUNAS')
+        tagihan_list = Tagihan.objects.filter(siswa=obj).exclude(status__in=Tagihan.STATUS_TIDAK_DITAGIH)
         tunggakan = 0
         for t in tagihan_list:
             tunggakan += t.sisa_tagihan
@@ -59,6 +129,53 @@ class SiswaAdmin(admin.ModelAdmin):
         return "✅ Lunas"
     total_tunggakan_siswa.short_description = "Sisa Tunggakan"
 
+    # === IMPOR SISWA DARI CSV ===
+    change_list_template = 'admin/pembayaran/siswa/change_list.html'
+
+    def get_urls(self):
+        custom_urls = [
+            path('impor-csv/', self.admin_site.admin_view(self.impor_csv), name='pembayaran_siswa_impor_csv'),
+        ]
+        return custom_urls + super().get_urls()
+
+    def impor_csv(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        errors = []
+        form = ImporSiswaForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            try:
+                baris = baca_csv(form.cleaned_data['file_csv'])
+            except UnicodeDecodeError:
+                baris = None
+                errors = ["File harus berformat CSV dengan encoding UTF-8."]
+            if baris is not None:
+                errors = validasi(baris, request.sekolah)
+            if not errors:
+                # Tanpa hashing password di request web: kolom password diabaikan,
+                # akun baru diaktifkan siswa sendiri lewat tautan
+                hasil = impor_siswa(baris, request.sekolah, pakai_password_csv=False)
+                self.message_user(
+                    request,
+                    f"Impor selesai: {hasil['dibuat']} siswa baru, {hasil['diperbarui']} siswa diperbarui.",
+                )
+                if not hasil['akun_baru']:
+                    return redirect('admin:pembayaran_siswa_changelist')
+                # Unduh daftar tautan aktivasi untuk dibagikan ke siswa
+                response = HttpResponse(content_type='text/csv')
+                response['Content-Disposition'] = 'attachment; filename="tautan_aktivasi_siswa.csv"'
+                tulis_csv_tautan(tautan_aktivasi(hasil['akun_baru'], request.build_absolute_uri('/')), response)
+                return response
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'errors': errors,
+        }
+        return render(request, 'admin/pembayaran/siswa/impor_csv.html', context)
+
 def get_image_base64(filename):
     """Mengubah file gambar menjadi string base64"""
     path = os.path.join(settings.BASE_DIR, 'pembayaran/static/pembayaran/images/', filename)
@@ -79,7 +196,7 @@ def view_laporan_tunggakan(modeladmin, request, queryset):
         judul = "LAPORAN REKAPITULASI TAGIHAN"
     total_sisa_hitung = 0
     for t in queryset:
-        total_sisa_hitung += t.sisa_tagihan
+        total_sisa_hitung += t.sisa_ditagih
     context = {
         'data_tagihan': queryset.order_by('siswa__kelas', 'siswa__nama_lengkap'),
         'total_sisa': total_sisa_hitung, 
@@ -88,17 +205,56 @@ def view_laporan_tunggakan(modeladmin, request, queryset):
     }
     return render(request, 'pembayaran/laporan_tunggakan_js.html', context)
 
+class BayarTunaiActionForm(ActionForm):
+    nominal = forms.DecimalField(
+        required=False, min_value=1, decimal_places=0, label="",
+        widget=forms.NumberInput(attrs={'placeholder': "Nominal tunai (kosong = lunasi)", 'class': 'form-control'}),
+    )
+
+@admin.action(description='Catat pembayaran tunai untuk tagihan terpilih', permissions=['bayar_tunai'])
+def catat_bayar_tunai(modeladmin, request, queryset):
+    form = BayarTunaiActionForm(request.POST)
+    # Pilihan field 'action' sudah divalidasi changelist admin; di sini cukup nominal
+    form.full_clean()
+    if 'nominal' in form.errors:
+        modeladmin.message_user(request, f"Nominal tidak valid: {' '.join(form.errors['nominal'])}", messages.ERROR)
+        return None
+    try:
+        pembayaran = catat_pembayaran_tunai(queryset, form.cleaned_data['nominal'])
+    except (ValueError, ArithmeticError):
+        modeladmin.message_user(request, "Nominal tidak valid.", messages.ERROR)
+        return None
+    if not pembayaran:
+        modeladmin.message_user(request, "Tidak ada tagihan terpilih yang masih punya sisa.", messages.WARNING)
+        return None
+
+    url = reverse('admin:pembayaran_tagihan_kwitansi_gabungan') + '?ids=' + ','.join(str(p.id) for p in pembayaran)
+    total = sum(p.jumlah_bayar for p in pembayaran)
+    modeladmin.message_user(request, format_html(
+        '{} pembayaran tunai dicatat (total Rp {}). <a href="{}" target="_blank">🖨️ Unduh kwitansi gabungan</a>',
+        len(pembayaran), intcomma(total), url,
+    ))
+    return None
+
 @admin.register(Tagihan)
-class TagihanAdmin(admin.ModelAdmin):
+class TagihanAdmin(PerSekolahMixin, PencarianTerindeksMixin, admin.ModelAdmin):
     list_display = ('judul', 'siswa', 'jumlah_rp', 'jumlah_terbayar', 'sisa_rp', 'status_warna', 'tombol_cetak')
     list_filter = ('status', 'tahun', 'bulan', 'siswa__kelas')
     search_fields = ('judul', 'siswa__nama_lengkap')
+    fungsi_pencarian = staticmethod(cari_tagihan)
     list_editable = ('jumlah_terbayar',)
-    actions = [view_laporan_tunggakan]
+    actions = [view_laporan_tunggakan, catat_bayar_tunai]
+    action_form = BayarTunaiActionForm
+
+    def has_bayar_tunai_permission(self, request):
+        # Action ini menulis Pembayaran & ledger serta mengubah saldo tagihan
+        return self.has_change_permission(request) and request.user.has_perm('pembayaran.add_pembayaran')
     
     def jumlah_rp(self, obj): return f"Rp {intcomma(obj.jumlah)}"
     
     def sisa_rp(self, obj):
+        if obj.status == 'DITUTUP':
+            return f"Rp {intcomma(obj.sisa_tagihan)} (dipindah ke tunggakan)"
         return f"Rp {intcomma(obj.sisa_tagihan)}"
     sisa_rp.short_description = "Sisa Tagihan"
 
@@ -109,6 +265,8 @@ class TagihanAdmin(admin.ModelAdmin):
             return "⏳ PENDING"
         elif obj.status == 'KADALUARSA':
             return "❌ BATAL"
+        elif obj.status == 'DITUTUP':
+            return "📦 DITUTUP"
         else:
             if obj.jumlah_terbayar > 0:
                 return "⚠️ BELUM LUNAS (Dicicil)"
@@ -152,10 +310,96 @@ class TagihanAdmin(admin.ModelAdmin):
     tombol_cetak.short_description = "Kwitansi" # Judul Header Kolom
     tombol_cetak.allow_tags = True
 
+    # === LAPORAN UMUR TUNGGAKAN (AGING) ===
+    change_list_template = 'admin/pembayaran/tagihan/change_list.html'
+
+    def get_urls(self):
+        custom_urls = [
+            path('umur-tunggakan/', self.admin_site.admin_view(self.umur_tunggakan), name='pembayaran_tagihan_umur_tunggakan'),
+            path('matriks-pembayaran/', self.admin_site.admin_view(self.matriks_pembayaran), name='pembayaran_tagihan_matriks'),
+            path('kwitansi-gabungan/', self.admin_site.admin_view(self.kwitansi_gabungan), name='pembayaran_tagihan_kwitansi_gabungan'),
+        ]
+        return custom_urls + super().get_urls()
+
+    def umur_tunggakan(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        kelas = request.GET.get('kelas')
+        if kelas:
+            data = reports.umur_tunggakan_per_siswa(request.sekolah, kelas)
+            label = lambda b: f"{b['nama']} ({b['nis']})"
+        else:
+            data = reports.umur_tunggakan_per_kelas(request.sekolah)
+            label = lambda b: f"Kelas {b['kelas']}"
+
+        kolom = [k for k, *_ in reports.KELOMPOK_UMUR] + ['total']
+        baris = [
+            {'label': label(b), 'kelas': b.get('kelas'), 'nilai': [b[k] for k in kolom]}
+            for b in data
+        ]
+        total = reports.total_baris(data)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'kelas': kelas,
+            'judul_kolom': [lbl for _, lbl, *_ in reports.KELOMPOK_UMUR] + ['Total'],
+            'baris': baris,
+            'total': [total[k] for k in kolom],
+        }
+        return render(request, 'admin/pembayaran/tagihan/umur_tunggakan.html', context)
+
+    def matriks_pembayaran(self, request):
+        # Matriks siswa x bulan untuk wali kelas; ?format=json untuk versi JSON
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        pilihan_kelas = [k for k, _ in BuatTagihanMassal.KELAS_CHOICES if k != 'SEMUA']
+        kelas = request.GET.get('kelas') or pilihan_kelas[0]
+        try:
+            tahun = int(request.GET.get('tahun') or timezone.localdate().year)
+        except ValueError:
+            tahun = timezone.localdate().year
+        baris = reports.matriks_pembayaran(request.sekolah, kelas, tahun)
+
+        if request.GET.get('format') == 'json':
+            return JsonResponse({'kelas': kelas, 'tahun': tahun, 'bulan': reports.BULAN, 'siswa': baris})
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'kelas': kelas,
+            'tahun': tahun,
+            'pilihan_kelas': pilihan_kelas,
+            'bulan': reports.BULAN,
+            'baris': baris,
+        }
+        return render(request, 'admin/pembayaran/tagihan/matriks.html', context)
+
+    def kwitansi_gabungan(self, request):
+        # Satu kwitansi untuk banyak pembayaran (hasil action "Catat pembayaran tunai")
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            ids = [int(i) for i in request.GET.get('ids', '').split(',') if i]
+        except ValueError:
+            ids = []
+        pembayaran = list(
+            Pembayaran.objects.filter(id__in=ids, sekolah=request.sekolah)
+            .select_related('tagihan__siswa')
+            .order_by('tagihan__siswa__kelas', 'tagihan__siswa__nama_lengkap', 'id')
+        )
+        context = {
+            'pembayaran_list': pembayaran,
+            'total': sum(p.jumlah_bayar for p in pembayaran),
+        }
+        return render(request, 'pembayaran/kwitansi_gabungan.html', context)
+
 @admin.register(Pembayaran)
-class PembayaranAdmin(admin.ModelAdmin):
+class PembayaranAdmin(PerSekolahMixin, PencarianTerindeksMixin, admin.ModelAdmin):
     list_display = ('tagihan', 'jumlah_bayar', 'metode_pembayaran', 'tanggal_bayar', 'id_transaksi_gateway')
     search_fields = ('tagihan__judul', 'id_transaksi_gateway')
+    fungsi_pencarian = staticmethod(cari_pembayaran)
     fields = ('tagihan', 'jumlah_bayar', 'metode_pembayaran', 'id_transaksi_gateway')
     readonly_fields = ('id_transaksi_gateway', 'tanggal_bayar')
 
@@ -214,9 +458,107 @@ class PembayaranAdmin(admin.ModelAdmin):
         return obj.tagihan.judul
 
 @admin.register(BuatTagihanMassal)
-class BuatTagihanMassalAdmin(admin.ModelAdmin):
+class BuatTagihanMassalAdmin(PerSekolahMixin, admin.ModelAdmin):
     list_display = ('judul_tagihan', 'target_kelas', 'jumlah', 'tanggal_dibuat')
     def response_add(self, request, obj, post_url_continue=None):
         msg = "Proses Berhasil! Tagihan telah dibuatkan untuk semua siswa di kelas tersebut."
         self.message_user(request, msg)
-        return super().response_add(request, obj, post_url_continue)
\ No newline at end of file
+        return super().response_add(request, obj, post_url_continue)
+
+class ArsipReadOnlyMixin:
+    """Data arsip/ledger hanya untuk dibaca (laporan & audit), tidak diubah manual."""
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(TagihanArsip)
+class TagihanArsipAdmin(PerSekolahMixin, ArsipReadOnlyMixin, admin.ModelAdmin):
+    field_sekolah = 'siswa__sekolah'
+    list_display = ('judul', 'siswa', 'jumlah', 'jumlah_terbayar', 'tahun', 'tanggal_diarsipkan')
+    list_filter = ('tahun', 'bulan', 'siswa__kelas')
+    search_fields = ('judul', 'siswa__nis')
+    list_select_related = ('siswa',)
+    actions = [view_laporan_tunggakan]
+
+@admin.register(PembayaranArsip)
+class PembayaranArsipAdmin(PerSekolahMixin, ArsipReadOnlyMixin, admin.ModelAdmin):
+    field_sekolah = 'tagihan__siswa__sekolah'
+    list_display = ('tagihan', 'jumlah_bayar', 'metode_pembayaran', 'tanggal_bayar', 'tombol_cetak')
+    search_fields = ('id_transaksi_gateway',)
+    list_select_related = ('tagihan__siswa',)
+
+    def tombol_cetak(self, obj):
+        url = reverse('lihat_kwitansi', args=[obj.id])
+        return format_html('<a href="{}" target="_blank">🖨️ Kwitansi</a>', url)
+    tombol_cetak.short_description = "Kwitansi"
+
+@admin.register(MutasiSaldo)
+class MutasiSaldoAdmin(PerSekolahMixin, ArsipReadOnlyMixin, admin.ModelAdmin):
+    """Ledger append-only: hanya bisa dilihat, tidak bisa diubah/dihapus."""
+    field_sekolah = 'siswa__sekolah'
+    list_display = ('waktu', 'siswa', 'jenis', 'jumlah', 'tagihan_id', 'pembayaran_id', 'keterangan')
+    list_filter = ('jenis',)
+    search_fields = ('siswa__nis',)
+    list_select_related = ('siswa',)
+    date_hierarchy = 'waktu'
+
+@admin.register(PengingatTerkirim)
+class PengingatTerkirimAdmin(PerSekolahMixin, ArsipReadOnlyMixin, admin.ModelAdmin):
+    field_sekolah = 'siswa__sekolah'
+    list_display = ('periode', 'siswa', 'tujuan', 'total_tunggakan', 'jumlah_tagihan', 'waktu_kirim')
+    list_filter = ('periode',)
+    search_fields = ('siswa__nis', 'tujuan')
+    list_select_related = ('siswa',)
+
+@admin.register(JadwalTagihan)
+class JadwalTagihanAdmin(PerSekolahMixin, admin.ModelAdmin):
+    # Tagihan dibuat oleh `manage.py buat_tagihan_terjadwal` (cron), bukan saat disimpan
+    list_display = ('nama', 'target_kelas', 'jumlah', 'bulan_ditagih', 'tanggal_tagih', 'mulai', 'periode_terakhir', 'aktif')
+    list_filter = ('aktif', 'target_kelas')
+    readonly_fields = ('periode_terakhir',)
+
+@admin.register(WaliKelas)
+class WaliKelasAdmin(PerSekolahMixin, admin.ModelAdmin):
+    list_display = ('user', 'kelas')
+    list_filter = ('kelas',)
+    search_fields = ('user__username', 'user__first_name', 'user__last_name')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+
+@admin.register(TutupTahun)
+class TutupTahunAdmin(PerSekolahMixin, ArsipReadOnlyMixin, admin.ModelAdmin):
+    # Dibuat oleh `manage.py tutup_tahun`, hanya untuk dilihat
+    list_display = ('tahun', 'tagihan_ditutup', 'siswa_menunggak', 'total_tunggakan', 'siswa_naik_kelas', 'waktu')
+
+@admin.register(Sekolah)
+class SekolahAdmin(admin.ModelAdmin):
+    """Daftar tenant; hanya superuser yang boleh mengelola."""
+    list_display = ('nama', 'kode', 'domain', 'folder_aset')
+    search_fields = ('nama', 'kode', 'domain')
+    filter_horizontal = ('staff',)
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if db_field.name == 'staff':
+            kwargs['queryset'] = db_field.related_model.objects.filter(is_staff=True, is_superuser=False)
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+    def has_module_permission(self, request):
+        return request.user.is_superuser
+
+    def has_view_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+    def has_add_permission(self, request):
+        return request.user.is_superuser
+
+    def has_change_permission(self, request, obj=None):
+        return request.user.is_superuser
+
+    def has_delete_permission(self, request, obj=None):
+        return request.user.is_superuser
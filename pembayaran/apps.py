@@ -1,6 +1,31 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, post_save
+
+
+def pasang_indeks_pencarian(sender, using, **kwargs):
+    from django.db import connections
+    from .search import pasang_fts_sqlite
+    pasang_fts_sqlite(connections[using])
+
+
+def reset_cache_sekolah(sender, **kwargs):
+    from .tenancy import hapus_cache_host
+    hapus_cache_host()
 
 
 class PembayaranConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pembayaran'
+
+    def ready(self):
+        # Tabel FTS5 pencarian admin (SQLite) dipasang ulang setiap selesai migrate
+        post_migrate.connect(pasang_indeks_pencarian, sender=self)
+
+        # Domain sekolah berubah -> buang cache host->sekolah di proses ini
+        # (proses lain memperbarui sendiri setelah tenancy.CACHE_HOST_DETIK)
+        Sekolah = self.get_model('Sekolah')
+        post_save.connect(reset_cache_sekolah, sender=Sekolah)
+        post_delete.connect(reset_cache_sekolah, sender=Sekolah)
+
+        # Receiver invalidasi cache laporan
+        from . import reports  # noqa: F401
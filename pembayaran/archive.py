@@ -0,0 +1,109 @@
+# pembayaran/archive.py
+
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+
+from .models import Tagihan, Pembayaran, TagihanArsip, PembayaranArsip, TutupTahun
+
+UKURAN_BATCH = 500
+
+FIELD_TAGIHAN = ('id', 'siswa_id', 'judul', 'jumlah', 'jumlah_terbayar', 'bulan', 'tahun', 'status', 'tanggal_dibuat')
+FIELD_PEMBAYARAN = ('id', 'tagihan_id', 'tanggal_bayar', 'jumlah_bayar', 'id_transaksi_gateway', 'metode_pembayaran')
+
+
+def kandidat_arsip(sampai_tahun):
+    """
+    Tagihan yang boleh diarsipkan: LUNAS/DITUTUP, tahunnya <= `sampai_tahun`,
+    dan sekolahnya sudah tutup tahun (TutupTahun) sampai `sampai_tahun`.
+    Sekolah yang belum tutup tahun dilewati, tagihannya tetap di tabel aktif.
+    """
+    sudah_ditutup = TutupTahun.objects.filter(tahun__gte=sampai_tahun).values('sekolah_id')
+    return Tagihan.objects.filter(
+        tahun__lte=sampai_tahun, status__in=('LUNAS', 'DITUTUP'), sekolah_id__in=sudah_ditutup,
+    )
+
+
+def _arsipkan_batch(sampai_tahun, ukuran_batch):
+    with transaction.atomic():
+        # Kunci baris agar tidak ada pembayaran baru masuk saat dipindahkan
+        ids = list(
+            kandidat_arsip(sampai_tahun)
+            .select_for_update()
+            .order_by('id')
+            .values_list('id', flat=True)[:ukuran_batch]
+        )
+        if not ids:
+            return 0, 0
+
+        # 1. Salin ke tabel arsip (ID dipertahankan)
+        TagihanArsip.objects.bulk_create(
+            [TagihanArsip(**row) for row in Tagihan.objects.filter(id__in=ids).values(*FIELD_TAGIHAN)]
+        )
+        data_pembayaran = list(Pembayaran.objects.filter(tagihan_id__in=ids).values(*FIELD_PEMBAYARAN))
+        PembayaranArsip.objects.bulk_create([PembayaranArsip(**row) for row in data_pembayaran])
+
+        # 2. Hapus dari tabel aktif.
+        # Tagihan dihapus dulu: FK pembayaran di-SET_NULL lewat satu UPDATE,
+        # sehingga sinyal update_saldo_tagihan tidak menyimpan ulang tagihan.
+        Tagihan.objects.filter(id__in=ids).delete()
+        Pembayaran.objects.filter(id__in=[p['id'] for p in data_pembayaran]).delete()
+
+    return len(ids), len(data_pembayaran)
+
+
+def arsipkan(sampai_tahun, ukuran_batch=UKURAN_BATCH, dry_run=False):
+    """
+    Pindahkan tagihan LUNAS/DITUTUP (beserta pembayarannya) sampai
+    `sampai_tahun` dari sekolah yang sudah tutup tahun ke tabel arsip, per batch dalam transaksi terpisah supaya kunci tabel
+    tidak ditahan lama.
+    """
+    if dry_run:
+        kandidat = kandidat_arsip(sampai_tahun)
+        return {
+            'tagihan': kandidat.count(),
+            'pembayaran': Pembayaran.objects.filter(tagihan__in=kandidat).count(),
+        }
+
+    total_tagihan = total_pembayaran = 0
+    while True:
+        jumlah_tagihan, jumlah_pembayaran = _arsipkan_batch(sampai_tahun, ukuran_batch)
+        if not jumlah_tagihan:
+            break
+        total_tagihan += jumlah_tagihan
+        total_pembayaran += jumlah_pembayaran
+
+    return {'tagihan': total_tagihan, 'pembayaran': total_pembayaran}
+
+
+def cari_pembayaran(pembayaran_id):
+    """Ambil pembayaran dari tabel aktif, atau dari arsip jika sudah dipindahkan."""
+    pembayaran = Pembayaran.objects.select_related('tagihan__siswa').filter(id=pembayaran_id).first()
+    if pembayaran is None:
+        pembayaran = PembayaranArsip.objects.select_related('tagihan__siswa').filter(id=pembayaran_id).first()
+    return pembayaran
+
+
+def versi_pembayaran(pembayaran_id):
+    """
+    Penanda versi kwitansi (untuk ETag/Last-Modified) dalam satu query:
+    nominal & saldo tagihan + jumlah, id dan waktu pembayaran terakhir
+    pada tagihan yang sama. Berubah saat ada angsuran baru/dihapus/diedit.
+    Siswa & sekolah pemilik ikut diambil untuk cek hak akses sebelum ETag.
+    Return dict, atau None jika pembayaran tidak ada (aktif maupun arsip).
+    """
+    for model in (Pembayaran, PembayaranArsip):
+        saudara = model.objects.filter(tagihan=OuterRef('tagihan')).order_by().values('tagihan')
+        versi = (
+            model.objects.filter(id=pembayaran_id)
+            .values('tagihan_id', 'tagihan__jumlah', 'tagihan__jumlah_terbayar',
+                    'tagihan__siswa_id', 'tagihan__siswa__sekolah_id')
+            .annotate(
+                jumlah_pembayaran=Subquery(saudara.annotate(n=Count('id')).values('n')),
+                id_terakhir=Subquery(saudara.annotate(m=Max('id')).values('m')),
+                waktu_terakhir=Subquery(saudara.annotate(m=Max('tanggal_bayar')).values('m')),
+            )
+            .first()
+        )
+        if versi is not None:
+            return versi
+    return None
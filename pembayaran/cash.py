@@ -0,0 +1,118 @@
+# pembayaran/cash.py
+
+"""
+Pencatatan pembayaran tunai massal (action admin "Catat pembayaran tunai").
+Jalur biasa (Pembayaran.save -> sinyal -> Tagihan.save) menjalankan beberapa
+query per pembayaran; di sini semuanya dikerjakan per batch:
+- Pembayaran dibuat dengan bulk_create, nomor kwitansi dipesan satu blok per sekolah
+- MutasiSaldo ditulis eksplisit (bulk_create tidak memicu sinyal ledger)
+- saldo & status semua tagihan diperbarui dengan SATU query UPDATE
+"""
+
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Least
+from django.db.models.lookups import LessThanOrEqual
+
+from .events import catat, durasi_ms
+from .models import MutasiSaldo, NomorKwitansi, Pembayaran, Sekolah, Tagihan
+from .reports import hapus_cache_kelas, hapus_cache_matriks
+
+METODE_TUNAI = 'MANUAL/CASH'
+
+
+def catat_pembayaran_tunai(tagihan_qs, nominal=None, metode=METODE_TUNAI):
+    """
+    Bayar tunai setiap tagihan di `tagihan_qs` yang masih punya sisa:
+    `nominal` None = lunasi sisanya, selain itu bayar min(nominal, sisa).
+    Return list Pembayaran yang dibuat (urut id).
+    """
+    mulai = time.perf_counter()
+    if nominal is not None:
+        nominal = Decimal(nominal)
+        if not nominal.is_finite() or nominal != nominal.to_integral_value():
+            raise ValueError("Nominal pembayaran harus bilangan bulat rupiah.")
+        if nominal <= 0:
+            raise ValueError("Nominal pembayaran harus lebih dari 0.")
+        nominal = nominal.quantize(Decimal(1))
+
+    with transaction.atomic():
+        # Kunci baris tagihan agar webhook/kasir lain tidak mengubah saldo di tengah
+        # proses. of=('self',): hanya tagihan, bukan baris siswa yang ikut di-join.
+        tagihan_list = list(
+            tagihan_qs.select_for_update(of=('self',))
+            .exclude(status__in=Tagihan.STATUS_TIDAK_DITAGIH)
+            .filter(jumlah__gt=F('jumlah_terbayar'))
+            .order_by('id')
+            .values('id', 'siswa_id', 'sekolah_id', 'tahun', 'jumlah', 'jumlah_terbayar', kelas=F('siswa__kelas'))
+        )
+        if not tagihan_list:
+            return []
+
+        # Satu blok nomor kwitansi per sekolah untuk seluruh batch (satu UPDATE counter per sekolah)
+        per_sekolah = {}
+        for t in tagihan_list:
+            per_sekolah.setdefault(t['sekolah_id'], []).append(t)
+        sekolah = Sekolah.objects.in_bulk(per_sekolah)
+        nomor = {}
+        for sekolah_id, daftar in per_sekolah.items():
+            blok = NomorKwitansi.ambil(sekolah[sekolah_id], len(daftar))
+            nomor.update(zip((t['id'] for t in daftar), blok))
+
+        pembayaran = []
+        for t in tagihan_list:
+            no_kwitansi = nomor[t['id']]
+            sisa = t['jumlah'] - t['jumlah_terbayar']
+            pembayaran.append(Pembayaran(
+                sekolah_id=t['sekolah_id'], tagihan_id=t['id'],
+                jumlah_bayar=sisa if nominal is None else min(nominal, sisa),
+                metode_pembayaran=metode, id_transaksi_gateway=no_kwitansi,
+            ))
+        pembayaran = Pembayaran.objects.bulk_create(pembayaran)
+        if pembayaran[0].pk is None:
+            # Database tanpa RETURNING: ambil id lewat id_transaksi_gateway yang unik
+            id_per_kode = dict(
+                Pembayaran.objects.filter(id_transaksi_gateway__in=[p.id_transaksi_gateway for p in pembayaran])
+                .values_list('id_transaksi_gateway', 'id')
+            )
+            for p in pembayaran:
+                p.pk = id_per_kode[p.id_transaksi_gateway]
+
+        siswa_per_tagihan = {t['id']: t['siswa_id'] for t in tagihan_list}
+        MutasiSaldo.objects.bulk_create([
+            MutasiSaldo(
+                siswa_id=siswa_per_tagihan[p.tagihan_id], tagihan_id=p.tagihan_id, pembayaran_id=p.id,
+                jenis='PEMBAYARAN', jumlah=-p.jumlah_bayar, keterangan=metode,
+            )
+            for p in pembayaran
+        ])
+
+        # Satu UPDATE untuk semua tagihan. Nilai di sisi kanan memakai nilai LAMA
+        # baris tersebut, sama dengan yang dipakai untuk menghitung jumlah_bayar di atas.
+        diperbarui = Tagihan.objects.filter(id__in=siswa_per_tagihan)
+        if nominal is None:
+            diperbarui.update(jumlah_terbayar=F('jumlah'), status='LUNAS')
+        else:
+            sisa = F('jumlah') - F('jumlah_terbayar')
+            diperbarui.update(
+                jumlah_terbayar=F('jumlah_terbayar') + Least(sisa, Value(nominal)),
+                # Aturan yang sama dengan Tagihan.save()
+                status=Case(
+                    When(LessThanOrEqual(sisa, Value(nominal)), then=Value('LUNAS')),
+                    When(status='PENDING', then=Value('PENDING')),
+                    default=Value('BELUM_LUNAS'),
+                ),
+            )
+
+        # UPDATE massal tidak memicu sinyal Tagihan
+        for sekolah_id, tahun in {(t['sekolah_id'], t['tahun']) for t in tagihan_list}:
+            transaction.on_commit(lambda s=sekolah_id, th=tahun: hapus_cache_matriks(s, th))
+        for sekolah_id, kelas in {(t['sekolah_id'], t['kelas']) for t in tagihan_list}:
+            transaction.on_commit(lambda s=sekolah_id, k=kelas: hapus_cache_kelas(s, k))
+
+    catat('pembayaran_tunai_massal', jumlah_tagihan=len(pembayaran),
+          total=sum(p.jumlah_bayar for p in pembayaran), durasi_ms=durasi_ms(mulai))
+    return pembayaran
@@ -0,0 +1,111 @@
+# pembayaran/events.py
+
+"""
+Log event terstruktur (JSON per baris) untuk jalur yang sering dipanggil
+(webhook, buat_transaksi, sinkron saldo, tagihan massal).
+
+Pemanggil hanya memasukkan record ke antrean (tidak pernah menunggu stdout);
+format JSON dan penulisan dilakukan oleh thread latar belakang.
+Konfigurasinya ada di settings.LOGGING dan settings.LOG_SAMPLING.
+"""
+
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+
+logger = logging.getLogger('pembayaran.events')
+
+UKURAN_ANTREAN = 10000
+
+_lock = threading.Lock()
+
+
+def catat(event, level=logging.INFO, **data):
+    """
+    Catat satu event. Contoh: catat('webhook_midtrans', order_id=..., durasi_ms=...)
+    Event level INFO/DEBUG bisa di-sampling lewat settings.LOG_SAMPLING
+    (misal {'saldo_diperbarui': 0.1} = simpan 10%). WARNING ke atas selalu dicatat.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if level < logging.WARNING:
+        from django.conf import settings
+        rasio = getattr(settings, 'LOG_SAMPLING', {}).get(event, 1.0)
+        if rasio < 1.0 and random.random() >= rasio:
+            return
+    exc_info = data.pop('exc_info', None)
+    logger.log(level, event, extra={'data': data}, exc_info=exc_info)
+
+
+def durasi_ms(mulai):
+    """Lama sejak `mulai` (hasil time.perf_counter()) dalam milidetik."""
+    return round((time.perf_counter() - mulai) * 1000, 2)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        isi = {
+            'waktu': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        isi.update(getattr(record, 'data', None) or {})
+        if record.exc_info:
+            isi['exc'] = self.formatException(record.exc_info)
+        return json.dumps(isi, default=str, ensure_ascii=False)
+
+
+class AntreanHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler + QueueListener dalam satu handler yang bisa dipakai dari
+    settings.LOGGING. Antrean dibatasi: jika penuh, record dibuang (dihitung
+    di `dibuang`) daripada membuat request menunggu.
+    """
+
+    def __init__(self, ukuran=UKURAN_ANTREAN):
+        super().__init__(queue.Queue(maxsize=ukuran))
+        self.ukuran = ukuran
+        self.dibuang = 0
+        self._tujuan = logging.StreamHandler()
+        self._listener = None
+        self._pid = None
+
+    def setFormatter(self, fmt):
+        # Format dikerjakan di thread penulis, bukan di thread request
+        self._tujuan.setFormatter(fmt)
+
+    def _pastikan_listener(self):
+        # Thread tidak ikut tersalin saat gunicorn fork, jadi dibuat per pid.
+        # Dikunci agar dua thread request pertama tidak sama-sama membuat listener.
+        if self._pid == os.getpid():
+            return
+        with _lock:
+            if self._pid != os.getpid():
+                self.queue = queue.Queue(maxsize=self.ukuran)
+                self._listener = logging.handlers.QueueListener(self.queue, self._tujuan)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Tidak memformat pesan di sini (QueueHandler bawaan melakukannya)
+        return record
+
+    def enqueue(self, record):
+        self._pastikan_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dibuang += 1
+
+    def close(self):
+        if self._listener and self._pid == os.getpid():
+            self._listener.stop()  # tulis sisa antrean sebelum proses berhenti
+            self._listener = None
+        super().close()
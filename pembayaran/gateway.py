@@ -0,0 +1,98 @@
+# pembayaran/gateway.py
+
+"""
+Client Midtrans dibuat saat pertama kali dipakai, bukan saat views.py di-import.
+`midtransclient` (dan `requests` di dalamnya) cukup berat untuk di-import,
+padahal sebagian besar request setelah cold start tidak menyentuh Midtrans.
+
+validasi_notifikasi() memeriksa notifikasi webhook (signature, order_id,
+nominal) sebelum database disentuh.
+"""
+
+import functools
+import hashlib
+import hmac
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+
+
+@functools.lru_cache(maxsize=None)
+def snap():
+    import midtransclient
+
+    client = midtransclient.Snap(
+        is_production=True, # Set False untuk Sandbox
+        server_key=settings.MIDTRANS_SERVER_KEY,
+        client_key=settings.MIDTRANS_CLIENT_KEY,
+    )
+    if settings.MIDTRANS_SNAP_BASE_URL:
+        client.api_config.SNAP_PRODUCTION_BASE_URL = settings.MIDTRANS_SNAP_BASE_URL
+    return client
+
+
+@functools.lru_cache(maxsize=None)
+def core_api():
+    # Core API client untuk verifikasi status transaksi
+    import midtransclient
+
+    return midtransclient.CoreApi(
+        is_production=True,
+        server_key=settings.MIDTRANS_SERVER_KEY,
+        client_key=settings.MIDTRANS_CLIENT_KEY,
+    )
+
+
+# Format order_id dari buat_transaksi: "SPP-<id tagihan>-<uuid4>"
+POLA_ORDER_ID = re.compile(r'^SPP-(\d{1,10})-[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$')
+MAKS_NOMINAL = Decimal(10) ** 10  # max_digits=10 pada Pembayaran.jumlah_bayar
+
+
+class NotifikasiTidakValid(ValueError):
+    def __init__(self, pesan, status=400):
+        super().__init__(pesan)
+        self.status = status
+
+
+def signature_notifikasi(order_id, status_code, gross_amount, server_key):
+    # Rumus signature_key notifikasi Midtrans
+    return hashlib.sha512(f"{order_id}{status_code}{gross_amount}{server_key}".encode()).hexdigest()
+
+
+def validasi_notifikasi(body):
+    """
+    Cek notifikasi webhook tanpa menyentuh database: signature_key (dibandingkan
+    dengan waktu konstan), format order_id, dan gross_amount.
+    Return (tagihan_id, gross_amount Decimal) atau raise NotifikasiTidakValid.
+    """
+    if not isinstance(body, dict):
+        raise NotifikasiTidakValid("Body bukan objek JSON.")
+    order_id = body.get('order_id')
+    status_code = body.get('status_code')
+    gross_amount = body.get('gross_amount')
+    signature = body.get('signature_key')
+    if not all(isinstance(v, str) and v for v in (order_id, status_code, gross_amount, signature)):
+        raise NotifikasiTidakValid("Field order_id/status_code/gross_amount/signature_key wajib diisi.")
+
+    # Tanpa server key signature bisa dibuat siapa saja, jadi tolak semuanya
+    server_key = settings.MIDTRANS_SERVER_KEY
+    if not server_key:
+        raise NotifikasiTidakValid("MIDTRANS_SERVER_KEY belum diisi.", status=403)
+    seharusnya = signature_notifikasi(order_id, status_code, gross_amount, server_key)
+    if not hmac.compare_digest(signature.encode(), seharusnya.encode()):
+        raise NotifikasiTidakValid("Signature tidak valid.", status=403)
+
+    cocok = POLA_ORDER_ID.match(order_id)
+    if not cocok:
+        raise NotifikasiTidakValid("Format order_id tidak dikenal.")
+
+    try:
+        nominal = Decimal(gross_amount)
+    except InvalidOperation:
+        raise NotifikasiTidakValid("gross_amount bukan angka.")
+    # Rupiah tanpa sen: "150000.00" boleh, "150000.50" tidak
+    if not nominal.is_finite() or nominal <= 0 or nominal >= MAKS_NOMINAL or nominal % 1:
+        raise NotifikasiTidakValid("gross_amount di luar batas.")
+
+    return int(cocok.group(1)), nominal
@@ -0,0 +1,203 @@
+# pembayaran/importer.py
+
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.db import transaction
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .models import Siswa
+
+# Kolom CSV. 'username', 'password' dan 'email' boleh kosong:
+# username default = NIS. Tanpa password, akun dibuat tanpa password yang bisa
+# dipakai login; siswa membuat password sendiri lewat tautan aktivasi.
+KOLOM_WAJIB = ('nis', 'nama_lengkap', 'kelas')
+KOLOM_OPSIONAL = ('username', 'password', 'email')
+KELAS_VALID = ('7', '8', '9')
+
+UKURAN_BATCH = 500
+
+
+def _hash_password(raw):
+    # Dijalankan di proses anak. Dengan start method 'spawn' Django belum siap.
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    return make_password(raw)
+
+
+def baca_csv(berkas):
+    """
+    Baca CSV (path, file biner dari upload, atau file teks) menjadi list dict.
+    Header tidak peka huruf besar/kecil dan spasi.
+    """
+    if isinstance(berkas, (str, os.PathLike)):
+        with open(berkas, newline='', encoding='utf-8-sig') as f:
+            return baca_csv(f)
+
+    isi = berkas.read()
+    if isinstance(isi, bytes):
+        isi = isi.decode('utf-8-sig')
+    reader = csv.DictReader(io.StringIO(isi))
+    reader.fieldnames = [(h or '').strip().lower() for h in (reader.fieldnames or [])]
+    baris = []
+    for row in reader:
+        baris.append({k: (v or '').strip() for k, v in row.items() if k})
+    return baris
+
+
+def validasi(baris, sekolah):
+    """
+    Cek SEMUA baris dulu sebelum ada yang ditulis ke database. NIS dicocokkan
+    dengan siswa `sekolah` ini saja; username tetap unik di seluruh deployment.
+    Return list pesan error (kosong = aman diimpor).
+    """
+    errors = []
+    if not baris:
+        return ["File CSV kosong."]
+
+    kolom_kurang = [k for k in KOLOM_WAJIB if k not in baris[0]]
+    if kolom_kurang:
+        return [f"Kolom wajib tidak ada: {', '.join(kolom_kurang)}"]
+
+    nis_terlihat = {}
+    username_terlihat = {}
+    for no, row in enumerate(baris, start=2):  # baris 1 = header
+        for k in KOLOM_WAJIB:
+            if not row.get(k):
+                errors.append(f"Baris {no}: kolom '{k}' kosong.")
+        if row.get('kelas') and row['kelas'] not in KELAS_VALID:
+            errors.append(f"Baris {no}: kelas '{row['kelas']}' tidak valid (harus 7, 8 atau 9).")
+
+        nis = row.get('nis')
+        if nis:
+            if nis in nis_terlihat:
+                errors.append(f"Baris {no}: NIS {nis} duplikat dengan baris {nis_terlihat[nis]}.")
+            nis_terlihat.setdefault(nis, no)
+
+        username = row.get('username') or nis
+        if username:
+            if username in username_terlihat:
+                errors.append(f"Baris {no}: username {username} duplikat dengan baris {username_terlihat[username]}.")
+            username_terlihat.setdefault(username, no)
+
+    # Username yang sudah dipakai user lain (bukan milik NIS yang sama)
+    pemilik = dict(
+        Siswa.objects.filter(sekolah=sekolah, nis__in=nis_terlihat).values_list('user__username', 'nis')
+    )
+    bentrok = User.objects.filter(username__in=username_terlihat).values_list('username', flat=True)
+    for username in bentrok:
+        baris_ke = username_terlihat[username]
+        nis = baris[baris_ke - 2]['nis']
+        if pemilik.get(username) != nis:
+            errors.append(f"Baris {baris_ke}: username {username} sudah dipakai akun lain.")
+
+    return errors
+
+
+def impor_siswa(baris, sekolah, workers=None, ukuran_batch=UKURAN_BATCH, dry_run=False, pakai_password_csv=True):
+    """
+    Impor siswa `sekolah` dari baris CSV yang SUDAH divalidasi.
+    - NIS baru      : buat User + Siswa (bulk_create per batch)
+    - NIS yang ada  : perbarui nama & kelas (kenaikan kelas) dengan bulk_update
+    Password dari kolom CSV di-hash paralel di process pool karena PBKDF2
+    sengaja lambat; karena itu `pakai_password_csv=False` untuk impor lewat
+    request web (kolom password diabaikan, tidak ada hashing sama sekali).
+    hasil['akun_baru'] = list (Siswa, User) tanpa password -> lihat tautan_aktivasi().
+    """
+    ada = {s.nis: s for s in Siswa.objects.filter(sekolah=sekolah, nis__in=[r['nis'] for r in baris])}
+    baru = [r for r in baris if r['nis'] not in ada]
+
+    diperbarui = []
+    for row in baris:
+        s = ada.get(row['nis'])
+        if s and (s.kelas != row['kelas'] or s.nama_lengkap != row['nama_lengkap']):
+            s.kelas = row['kelas']
+            s.nama_lengkap = row['nama_lengkap']
+            diperbarui.append(s)
+
+    hasil = {'dibuat': len(baru), 'diperbarui': len(diperbarui), 'akun_baru': []}
+    if dry_run:
+        return hasil
+
+    # 1. Hash password paralel (bagian paling mahal). Tanpa password = tidak bisa
+    # login sampai siswa membuat password lewat tautan aktivasi.
+    password_mentah = [(r.get('password') if pakai_password_csv else '') or None for r in baru]
+    perlu_hash = [p for p in password_mentah if p]
+    if len(perlu_hash) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            hash_csv = iter(pool.map(_hash_password, perlu_hash, chunksize=16))
+    else:
+        hash_csv = iter([make_password(p) for p in perlu_hash])
+    # make_password(None) = password acak yang tidak bisa dipakai login (tanpa PBKDF2)
+    password_hash = [next(hash_csv) if p else make_password(None) for p in password_mentah]
+
+    # 2. Tulis ke database dalam satu transaksi
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=r.get('username') or r['nis'],
+                    email=r.get('email', ''),
+                    first_name=r['nama_lengkap'][:150],
+                    password=pw,
+                )
+                for r, pw in zip(baru, password_hash)
+            ],
+            batch_size=ukuran_batch,
+        )
+        # Beberapa database tidak mengembalikan PK dari bulk_create
+        if users and users[0].pk is None:
+            id_per_username = dict(
+                User.objects.filter(username__in=[u.username for u in users]).values_list('username', 'id')
+            )
+            for u in users:
+                u.pk = id_per_username[u.username]
+
+        siswa_baru = Siswa.objects.bulk_create(
+            [
+                Siswa(sekolah=sekolah, user=u, nis=r['nis'], nama_lengkap=r['nama_lengkap'], kelas=r['kelas'])
+                for r, u in zip(baru, users)
+            ],
+            batch_size=ukuran_batch,
+        )
+        Siswa.objects.bulk_update(diperbarui, ['kelas', 'nama_lengkap'], batch_size=ukuran_batch)
+
+    hasil['akun_baru'] = [(s, u) for s, u in zip(siswa_baru, users) if not u.has_usable_password()]
+    return hasil
+
+
+def tautan_aktivasi(akun_baru, base_url):
+    """
+    Tautan sekali pakai untuk membuat password (token reset password bawaan
+    Django; berlaku PASSWORD_RESET_TIMEOUT dan hangus setelah password dibuat).
+    Return list dict untuk dibagikan ke wali kelas / siswa.
+    """
+    base_url = base_url.rstrip('/')
+    return [
+        {
+            'nis': s.nis,
+            'nama_lengkap': s.nama_lengkap,
+            'kelas': s.kelas,
+            'username': u.username,
+            'tautan': base_url + reverse('aktivasi_akun', kwargs={
+                'uidb64': urlsafe_base64_encode(force_bytes(u.pk)),
+                'token': default_token_generator.make_token(u),
+            }),
+        }
+        for s, u in akun_baru
+    ]
+
+
+def tulis_csv_tautan(daftar, berkas):
+    writer = csv.DictWriter(berkas, fieldnames=['nis', 'nama_lengkap', 'kelas', 'username', 'tautan'])
+    writer.writeheader()
+    writer.writerows(daftar)
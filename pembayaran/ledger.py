@@ -0,0 +1,134 @@
+# pembayaran/ledger.py
+
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import MutasiSaldo, SnapshotSaldo, Tagihan
+
+UKURAN_BATCH = 1000
+
+
+def catat_tagihan_baru(daftar_tagihan):
+    """
+    Catat mutasi TAGIHAN untuk tagihan yang dibuat lewat bulk_create
+    (bulk_create tidak memicu sinyal post_save).
+    """
+    MutasiSaldo.objects.bulk_create(
+        [
+            MutasiSaldo(siswa_id=t.siswa_id, tagihan_id=t.id, jenis='TAGIHAN', jumlah=t.jumlah, keterangan=t.judul)
+            for t in daftar_tagihan
+        ],
+        batch_size=UKURAN_BATCH,
+    )
+
+
+def saldo_pada(siswa, waktu=None):
+    """
+    Saldo tunggakan siswa pada `waktu` (default: sekarang) =
+    snapshot terakhir sebelum `waktu` + mutasi sesudah snapshot tersebut.
+    """
+    waktu = waktu or timezone.now()
+    snapshot = (
+        SnapshotSaldo.objects.filter(siswa=siswa, waktu__lte=waktu)
+        .order_by('-waktu', '-id')
+        .first()
+    )
+    mutasi = MutasiSaldo.objects.filter(siswa=siswa, waktu__lte=waktu)
+    saldo = 0
+    if snapshot:
+        mutasi = mutasi.filter(id__gt=snapshot.mutasi_terakhir)
+        saldo = snapshot.saldo
+    return saldo + (mutasi.aggregate(total=Sum('jumlah'))['total'] or 0)
+
+
+def _kunci_ledger():
+    """
+    Di PostgreSQL id diambil dari sequence saat INSERT, bukan saat COMMIT:
+    transaksi yang belum commit bisa memegang id lebih kecil dari Max(id)
+    yang terlihat, lalu terlewat selamanya oleh snapshot. SHARE MODE menunggu
+    semua transaksi yang sedang menulis ledger selesai dan menahan INSERT
+    baru sampai snapshot commit, jadi Max(id) menjadi batas urutan commit.
+    SQLite hanya mengizinkan satu penulis sekaligus, jadi tidak perlu.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {connection.ops.quote_name(MutasiSaldo._meta.db_table)} IN SHARE MODE')
+
+
+def buat_snapshot():
+    """
+    Buat snapshot saldo untuk semua siswa yang punya mutasi sejak snapshot
+    sebelumnya. Hanya menjumlahkan "ekor" mutasi, bukan seluruh riwayat.
+    Return jumlah snapshot yang dibuat.
+    """
+    with transaction.atomic():
+        _kunci_ledger()
+        batas = MutasiSaldo.objects.aggregate(m=Max('id'))['m']
+        if batas is None:
+            return 0
+        batas_lama = SnapshotSaldo.objects.aggregate(m=Max('mutasi_terakhir'))['m'] or 0
+        if batas <= batas_lama:
+            return 0
+
+        ekor = (
+            MutasiSaldo.objects.filter(id__gt=batas_lama, id__lte=batas)
+            .values('siswa_id')
+            .annotate(total=Sum('jumlah'))
+        )
+        ekor = {row['siswa_id']: row['total'] for row in ekor}
+
+        # Saldo snapshot terakhir per siswa (hanya siswa yang berubah)
+        saldo_lama = {}
+        for row in (
+            SnapshotSaldo.objects.filter(siswa_id__in=ekor.keys())
+            .order_by('siswa_id', '-mutasi_terakhir', '-id')
+            .values('siswa_id', 'saldo')
+        ):
+            saldo_lama.setdefault(row['siswa_id'], row['saldo'])
+
+        sekarang = timezone.now()
+        SnapshotSaldo.objects.bulk_create(
+            [
+                SnapshotSaldo(
+                    siswa_id=siswa_id,
+                    saldo=saldo_lama.get(siswa_id, 0) + total,
+                    mutasi_terakhir=batas,
+                    waktu=sekarang,
+                )
+                for siswa_id, total in ekor.items()
+            ],
+            batch_size=UKURAN_BATCH,
+        )
+    return len(ekor)
+
+
+def verifikasi(ukuran_batch=UKURAN_BATCH):
+    """
+    Bandingkan sisa setiap Tagihan dengan jumlah mutasinya di ledger
+    (tagihan DITUTUP bersaldo 0: sisanya sudah dipindah ke tagihan tunggakan).
+    Tagihan dibaca per batch (keyset berdasarkan id) agar memori tetap kecil.
+    Yield tuple (tagihan_id, sisa_di_tagihan, saldo_di_ledger) untuk yang tidak cocok.
+    """
+    id_terakhir = 0
+    while True:
+        batch = list(
+            Tagihan.objects.filter(id__gt=id_terakhir)
+            .order_by('id')
+            .values_list('id', 'jumlah', 'jumlah_terbayar', 'status')[:ukuran_batch]
+        )
+        if not batch:
+            return
+        id_terakhir = batch[-1][0]
+
+        saldo_ledger = dict(
+            MutasiSaldo.objects.filter(tagihan_id__in=[b[0] for b in batch])
+            .values('tagihan_id')
+            .annotate(total=Sum('jumlah'))
+            .values_list('tagihan_id', 'total')
+        )
+        for tagihan_id, jumlah, terbayar, status in batch:
+            sisa = 0 if status == 'DITUTUP' else (jumlah or 0) - (terbayar or 0)
+            saldo = saldo_ledger.get(tagihan_id, 0)
+            if sisa != saldo:
+                yield tagihan_id, sisa, saldo
@@ -0,0 +1,210 @@
+# pembayaran/loadtest.py
+
+"""
+Perlengkapan uji beban end-to-end (dipakai oleh `manage.py uji_beban`):
+- MidtransPalsu : server HTTP lokal pengganti Snap API yang juga mengirim
+                  webhook settlement (termasuk duplikat & urutan terbalik)
+- sesi_siswa    : satu sesi siswa: login -> dashboard -> bayar
+- Statistik     : throughput dan persentil latensi per langkah
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+
+def persentil(data, p):
+    """Persentil nearest-rank dari list angka (p antara 0-100)."""
+    if not data:
+        return 0.0
+    data = sorted(data)
+    k = max(0, min(len(data) - 1, int(round(p / 100 * len(data) + 0.5)) - 1))
+    return data[k]
+
+
+class Statistik:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latensi = {}
+        self.error = {}
+        self.mulai = time.perf_counter()
+
+    def catat(self, langkah, detik, ok=True):
+        with self._lock:
+            self.latensi.setdefault(langkah, []).append(detik)
+            if not ok:
+                self.error[langkah] = self.error.get(langkah, 0) + 1
+
+    def ringkasan(self):
+        durasi = time.perf_counter() - self.mulai
+        baris = []
+        for langkah, data in sorted(self.latensi.items()):
+            baris.append({
+                'langkah': langkah,
+                'jumlah': len(data),
+                'error': self.error.get(langkah, 0),
+                'per_detik': len(data) / durasi if durasi else 0,
+                'p50_ms': persentil(data, 50) * 1000,
+                'p95_ms': persentil(data, 95) * 1000,
+                'p99_ms': persentil(data, 99) * 1000,
+            })
+        return durasi, baris
+
+
+def signature_key(order_id, status_code, gross_amount, server_key):
+    # Rumus signature notifikasi Midtrans
+    return hashlib.sha512(f"{order_id}{status_code}{gross_amount}{server_key}".encode()).hexdigest()
+
+
+class MidtransPalsu:
+    """
+    Server Snap palsu. Setiap token yang dibuat akan dibalas dengan webhook
+    settlement ke `url_webhook` setelah `jeda_webhook` detik. Sebagian
+    dikirim dobel (`peluang_duplikat`) dan sebagian diikuti/didahului
+    notifikasi 'pending' yang datang terlambat (`peluang_acak_urutan`).
+    Webhook yang dibalas non-2xx dikirim ulang seperti Midtrans asli.
+    """
+
+    def __init__(self, url_webhook, server_key='', latensi_snap=0.0, jeda_webhook=0.2,
+                 peluang_duplikat=0.2, peluang_acak_urutan=0.2, percobaan_ulang=3, statistik=None):
+        self.url_webhook = url_webhook
+        self.server_key = server_key or ''
+        self.latensi_snap = latensi_snap
+        self.jeda_webhook = jeda_webhook
+        self.peluang_duplikat = peluang_duplikat
+        self.peluang_acak_urutan = peluang_acak_urutan
+        self.percobaan_ulang = percobaan_ulang
+        self.statistik = statistik or Statistik()
+
+        self._lock = threading.Lock()
+        self.settlement = {}  # order_id -> (tagihan_id, gross_amount) yang benar-benar dibayar
+        self.gagal_terkirim = 0
+        self._pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='webhook')
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._buat_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/snap/v1"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._pool.shutdown(wait=True)  # tunggu semua webhook terkirim
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _buat_handler(self):
+        palsu = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                panjang = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(panjang) or b'{}')
+                if palsu.latensi_snap:
+                    time.sleep(palsu.latensi_snap)
+                detail = body.get('transaction_details', {})
+                token = str(uuid.uuid4())
+                palsu._jadwalkan(detail.get('order_id'), detail.get('gross_amount'))
+                isi = json.dumps({'token': token, 'redirect_url': f"{palsu.base_url}/{token}"}).encode()
+                self.send_response(201)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(isi)))
+                self.end_headers()
+                self.wfile.write(isi)
+
+            def log_message(self, *args):
+                pass  # jangan kotori output uji beban
+
+        return Handler
+
+    def _notifikasi(self, order_id, transaction_id, status, gross_amount):
+        status_code = '200' if status == 'settlement' else '201'
+        gross = f"{gross_amount}.00"
+        return {
+            'order_id': order_id,
+            'transaction_id': transaction_id,
+            'transaction_status': status,
+            'status_code': status_code,
+            'payment_type': 'qris',
+            'gross_amount': gross,
+            'signature_key': signature_key(order_id, status_code, gross, self.server_key),
+        }
+
+    def _jadwalkan(self, order_id, gross_amount):
+        match = re.match(r'^SPP-(\d+)-', order_id or '')
+        with self._lock:
+            self.settlement[order_id] = (int(match.group(1)) if match else None, gross_amount)
+
+        transaction_id = str(uuid.uuid4())
+        settlement = self._notifikasi(order_id, transaction_id, 'settlement', gross_amount)
+        pending = self._notifikasi(order_id, transaction_id, 'pending', gross_amount)
+
+        urutan = [settlement]
+        if random.random() < self.peluang_duplikat:
+            urutan.append(settlement)
+        if random.random() < self.peluang_acak_urutan:
+            urutan.append(pending)  # 'pending' datang SETELAH 'settlement'
+
+        # Jeda acak: notifikasi susulan bisa saling mendahului
+        for i, notif in enumerate(urutan):
+            self._pool.submit(self._kirim, notif, self.jeda_webhook * (1 + i * random.random()))
+
+    def _kirim(self, notif, jeda):
+        time.sleep(jeda)
+        for _ in range(self.percobaan_ulang):
+            mulai = time.perf_counter()
+            try:
+                r = requests.post(self.url_webhook, json=notif, timeout=10)
+                ok = r.status_code < 300
+            except requests.RequestException:
+                ok = False
+            self.statistik.catat(f"webhook_{notif['transaction_status']}", time.perf_counter() - mulai, ok)
+            if ok:
+                return
+            time.sleep(0.5)
+        with self._lock:
+            self.gagal_terkirim += 1
+
+
+def sesi_siswa(base_url, username, password, statistik):
+    """Satu siswa: buka login, login, dashboard, lalu bayar semua tagihan yang tampil."""
+    s = requests.Session()
+
+    def langkah(nama, fungsi, *args, **kwargs):
+        mulai = time.perf_counter()
+        try:
+            r = fungsi(*args, timeout=30, **kwargs)
+            ok = r.status_code < 400
+        except requests.RequestException:
+            r, ok = None, False
+        statistik.catat(nama, time.perf_counter() - mulai, ok)
+        return r if ok else None
+
+    r = langkah('login_get', s.get, f"{base_url}/login/")
+    if r is None:
+        return
+    r = langkah('login_post', s.post, f"{base_url}/login/", data={
+        'username': username,
+        'password': password,
+        'csrfmiddlewaretoken': s.cookies.get('csrftoken', ''),
+    }, headers={'Referer': f"{base_url}/login/"})
+    if r is None:
+        return
+
+    r = langkah('dashboard_siswa', s.get, f"{base_url}/")
+    if r is None:
+        return
+    for tagihan_id in sorted(set(re.findall(r"bayar\('(\d+)'\)", r.text))):
+        langkah('buat_transaksi', s.get, f"{base_url}/bayar/{tagihan_id}/")
@@ -0,0 +1,31 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from pembayaran.archive import UKURAN_BATCH, arsipkan
+from pembayaran.models import TutupTahun
+
+
+class Command(BaseCommand):
+    help = "Pindahkan tagihan LUNAS/DITUTUP dari tahun yang sudah ditutup (tutup_tahun) beserta pembayarannya ke tabel arsip"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sampai-tahun', type=int, default=None,
+            help="Arsipkan tagihan dengan tahun <= nilai ini (default: 2 tahun sebelum tahun sekarang)",
+        )
+        parser.add_argument('--batch', type=int, default=UKURAN_BATCH, help="Jumlah tagihan per transaksi")
+        parser.add_argument('--dry-run', action='store_true', help="Hanya hitung, tanpa memindahkan data")
+
+    def handle(self, *args, **options):
+        sampai_tahun = options['sampai_tahun'] or datetime.date.today().year - 2
+        hasil = arsipkan(sampai_tahun, ukuran_batch=options['batch'], dry_run=options['dry_run'])
+        awalan = "[DRY RUN] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{awalan}{hasil['tagihan']} tagihan dan {hasil['pembayaran']} pembayaran "
+            f"sampai tahun {sampai_tahun} diarsipkan."
+        ))
+        if not TutupTahun.objects.filter(tahun__gte=sampai_tahun).exists():
+            self.stdout.write(self.style.WARNING(
+                f"Belum ada sekolah yang tutup tahun {sampai_tahun}; jalankan tutup_tahun lebih dulu."
+            ))
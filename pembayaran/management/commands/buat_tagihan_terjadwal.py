@@ -0,0 +1,42 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pembayaran.penagihan import BATAS_PER_RUN, UKURAN_BATCH, jalankan
+from pembayaran.tenancy import sekolah_dari_kode
+
+
+class Command(BaseCommand):
+    help = (
+        "Buat tagihan dari Jadwal Tagihan yang sudah jatuh tempo tapi belum dibuat, termasuk bulan "
+        "yang terlewat. Aman dijalankan berulang dari cron (misal tiap jam)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sekolah', default=None, help="Kode sekolah (default: semua sekolah)")
+        parser.add_argument('--tanggal', type=datetime.date.fromisoformat, default=None,
+                            help="Anggap hari ini tanggal ini (YYYY-MM-DD), untuk uji")
+        parser.add_argument('--batas', type=int, default=BATAS_PER_RUN, help="Maksimal tagihan dibuat dalam satu run")
+        parser.add_argument('--batch', type=int, default=UKURAN_BATCH, help="Jumlah tagihan per transaksi")
+        parser.add_argument('--dry-run', action='store_true', help="Hanya hitung tagihan yang akan dibuat")
+
+    def handle(self, *args, **options):
+        sekolah = None
+        if options['sekolah']:
+            try:
+                sekolah = sekolah_dari_kode(options['sekolah'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        hasil = jalankan(
+            hari_ini=options['tanggal'],
+            sekolah=sekolah,
+            batas=options['batas'],
+            ukuran_batch=options['batch'],
+            dry_run=options['dry_run'],
+        )
+        awalan = "[DRY RUN] " if options['dry_run'] else ""
+        pesan = f"{awalan}{hasil['dibuat']} tagihan dibuat untuk {hasil['periode']} periode."
+        if not hasil['tuntas']:
+            pesan += f" Batas {options['batas']} tercapai, sisanya dilanjutkan pada run berikutnya."
+        self.stdout.write(self.style.SUCCESS(pesan))
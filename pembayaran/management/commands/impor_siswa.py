@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pembayaran.importer import UKURAN_BATCH, baca_csv, impor_siswa, tautan_aktivasi, tulis_csv_tautan, validasi
+from pembayaran.tenancy import sekolah_dari_kode
+
+
+class Command(BaseCommand):
+    help = "Impor siswa baru / kenaikan kelas dari file CSV (kolom: nis, nama_lengkap, kelas, [username, password, email])"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Lokasi file CSV")
+        parser.add_argument('--workers', type=int, default=None, help="Jumlah proses untuk hash password")
+        parser.add_argument('--batch', type=int, default=UKURAN_BATCH, help="Ukuran batch bulk_create")
+        parser.add_argument('--sekolah', default=None, help="Kode sekolah (default settings.SEKOLAH_DEFAULT)")
+        parser.add_argument('--dry-run', action='store_true', help="Hanya validasi & hitung, tanpa menulis")
+        parser.add_argument('--tautan', default=None,
+                            help="Tulis tautan aktivasi akun baru (tanpa kolom password) ke file CSV ini")
+        parser.add_argument('--base-url', default=None,
+                            help="Alamat situs untuk tautan aktivasi (default https://<domain sekolah>)")
+
+    def handle(self, *args, **options):
+        try:
+            sekolah = sekolah_dari_kode(options['sekolah'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        try:
+            baris = baca_csv(options['path'])
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(f"Gagal membaca CSV: {e}")
+
+        errors = validasi(baris, sekolah)
+        if errors:
+            for e in errors:
+                self.stderr.write(e)
+            raise CommandError(f"{len(errors)} error ditemukan, tidak ada data yang diimpor.")
+
+        hasil = impor_siswa(
+            baris,
+            sekolah,
+            workers=options['workers'],
+            ukuran_batch=options['batch'],
+            dry_run=options['dry_run'],
+        )
+        awalan = "[DRY RUN] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{awalan}{hasil['dibuat']} siswa baru dibuat, {hasil['diperbarui']} siswa diperbarui."
+        ))
+
+        if not hasil['akun_baru']:
+            return
+        base_url = options['base_url'] or f"https://{sekolah.domain}"
+        daftar = tautan_aktivasi(hasil['akun_baru'], base_url)
+        if options['tautan']:
+            with open(options['tautan'], 'w', newline='', encoding='utf-8') as f:
+                tulis_csv_tautan(daftar, f)
+            self.stdout.write(f"{len(daftar)} tautan aktivasi ditulis ke {options['tautan']}.")
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"{len(daftar)} akun baru belum punya password. Bagikan tautan aktivasi berikut:"
+            ))
+            tulis_csv_tautan(daftar, self.stdout)
@@ -0,0 +1,52 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pembayaran.reminders import JEDA_BATCH, UKURAN_BATCH, kirim_pengingat
+from pembayaran.tenancy import sekolah_dari_kode
+
+
+class Command(BaseCommand):
+    help = "Kirim pengingat tunggakan ke siswa yang masih punya tagihan belum lunas (sekali per periode)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--periode', default=None, help="Kunci periode, default bulan ini (YYYY-MM)")
+        parser.add_argument('--sekolah', default=None, help="Kode sekolah (default: semua sekolah)")
+        parser.add_argument('--batch', type=int, default=UKURAN_BATCH, help="Jumlah pesan per batch")
+        parser.add_argument('--jeda', type=float, default=JEDA_BATCH, help="Jeda antar batch (detik)")
+        parser.add_argument('--backend', default=None, help="Path email backend Django")
+        parser.add_argument('--console', action='store_true', help="Tampilkan pesan di konsol (uji lokal)")
+        parser.add_argument('--folder', default=None, help="Simpan pesan sebagai file di folder ini (uji lokal)")
+        parser.add_argument('--dry-run', action='store_true', help="Hanya hitung penerima")
+
+    def handle(self, *args, **options):
+        periode = options['periode'] or datetime.date.today().strftime('%Y-%m')
+        sekolah = None
+        if options['sekolah']:
+            try:
+                sekolah = sekolah_dari_kode(options['sekolah'])
+            except ValueError as e:
+                raise CommandError(str(e))
+        backend = options['backend']
+        opsi_backend = {}
+        if options['console']:
+            backend = 'django.core.mail.backends.console.EmailBackend'
+            opsi_backend['stream'] = self.stdout
+        elif options['folder']:
+            backend = 'django.core.mail.backends.filebased.EmailBackend'
+            opsi_backend['file_path'] = options['folder']
+
+        hasil = kirim_pengingat(
+            periode,
+            sekolah=sekolah,
+            backend=backend,
+            ukuran_batch=options['batch'],
+            jeda=options['jeda'],
+            dry_run=options['dry_run'],
+            **opsi_backend,
+        )
+        awalan = "[DRY RUN] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{awalan}Periode {periode}: {hasil['terkirim']} pengingat terkirim, "
+            f"{hasil['tanpa_email']} siswa tanpa email, {hasil['gagal']} gagal."
+        ))
@@ -0,0 +1,90 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Dijalankan di proses baru agar benar-benar "dingin" (belum ada modul/template/koneksi)
+SKRIP_IMPOR = (
+    "import django; django.setup(); import spp_sekolah.urls"
+)
+
+SKRIP_REQUEST = """
+import json, time
+mulai = time.perf_counter()
+import django; django.setup()
+from django.test import Client
+hasil = {{'setup_ms': (time.perf_counter() - mulai) * 1000}}
+c = Client(HTTP_HOST={host!r})
+if {panaskan!r}:
+    t = time.perf_counter(); c.get('/sehat/'); hasil['sehat_ms'] = (time.perf_counter() - t) * 1000
+for url in {urls!r}:
+    t = time.perf_counter(); r = c.get(url); hasil['pertama ' + url] = (time.perf_counter() - t) * 1000
+    assert r.status_code < 400, (url, r.status_code)
+    t = time.perf_counter(); c.get(url); hasil['kedua ' + url] = (time.perf_counter() - t) * 1000
+print(json.dumps(hasil))
+"""
+
+URL_DIUKUR = ['/login/', '/admin/login/']
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark cold start: profil waktu import (python -X importtime) dan durasi "
+        "request pertama di proses baru, dengan & tanpa pemanasan /sehat/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ulang', type=int, default=3, help="Jumlah proses baru per skenario (diambil median)")
+        parser.add_argument('--top', type=int, default=15, help="Jumlah modul terlambat yang ditampilkan")
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--simpan', help="Simpan hasil ke file JSON (untuk dibandingkan antar versi)")
+
+    def _jalankan(self, *args):
+        proses = subprocess.run([sys.executable, *args], cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if proses.returncode != 0:
+            raise CommandError(proses.stderr.strip().splitlines()[-1] if proses.stderr else "Proses gagal.")
+        return proses
+
+    def profil_impor(self, ulang):
+        """Return (total_ms median, {modul: kumulatif_ms} dari percobaan terakhir)."""
+        total = []
+        for _ in range(ulang):
+            stderr = self._jalankan('-X', 'importtime', '-c', SKRIP_IMPOR).stderr
+            kumulatif = {}
+            for baris in stderr.splitlines():
+                if not baris.startswith('import time:') or 'self [us]' in baris:
+                    continue
+                _, sendiri, kum, nama = baris.replace('import time:', '|').split('|')
+                # Nama diindentasi sesuai kedalaman; modul top-level tidak berindentasi
+                kumulatif[nama[1:].rstrip()] = int(kum) / 1000
+            total.append(sum(v for k, v in kumulatif.items() if not k.startswith(' ')) if kumulatif else 0)
+        return statistics.median(total), {k.strip(): v for k, v in kumulatif.items()}
+
+    def profil_request(self, ulang, host, panaskan):
+        skrip = SKRIP_REQUEST.format(host=host, panaskan=panaskan, urls=URL_DIUKUR)
+        percobaan = [json.loads(self._jalankan('-c', skrip).stdout.strip().splitlines()[-1]) for _ in range(ulang)]
+        return {k: round(statistics.median(p[k] for p in percobaan), 2) for k in percobaan[0]}
+
+    def handle(self, *args, **options):
+        ulang = options['ulang']
+
+        total_impor, per_modul = self.profil_impor(ulang)
+        self.stdout.write(f"Import django.setup() + URLconf: {total_impor:.1f} ms (median {ulang}x)\n")
+        self.stdout.write(f"{'Modul':<50}{'Kumulatif ms':>14}")
+        for nama, ms in sorted(per_modul.items(), key=lambda x: -x[1])[:options['top']]:
+            self.stdout.write(f"{nama:<50}{ms:>14.1f}")
+
+        hasil = {'impor_ms': round(total_impor, 2), 'modul_ms': per_modul}
+        for label, panaskan in (('tanpa_pemanasan', False), ('dengan_pemanasan', True)):
+            hasil[label] = self.profil_request(ulang, options['host'], panaskan)
+            self.stdout.write(f"\nRequest di proses baru ({label.replace('_', ' ')}):")
+            for langkah, ms in hasil[label].items():
+                self.stdout.write(f"  {langkah:<30}{ms:>10.1f} ms")
+
+        if options['simpan']:
+            with open(options['simpan'], 'w') as f:
+                json.dump(hasil, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"\nHasil disimpan ke {options['simpan']}"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from pembayaran.ledger import buat_snapshot
+
+
+class Command(BaseCommand):
+    help = "Buat snapshot saldo tunggakan per siswa dari ledger MutasiSaldo (jalankan berkala lewat cron)"
+
+    def handle(self, *args, **options):
+        jumlah = buat_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"{jumlah} snapshot saldo dibuat."))
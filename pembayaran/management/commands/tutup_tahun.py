@@ -0,0 +1,40 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pembayaran.tenancy import pakai_sekolah, sekolah_dari_kode
+from pembayaran.tutup_tahun import SudahDitutup, tahun_ajaran_terakhir, tutup_tahun
+
+
+class Command(BaseCommand):
+    help = (
+        "Tutup tahun ajaran: pindahkan sisa tagihan sampai akhir tahun ajaran ke tagihan tunggakan, "
+        "tutup tagihan lama dan naikkan kelas siswa (7 -> 8 -> 9 -> LULUS), dalam satu transaksi"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tahun', type=int, default=None,
+            help="Tahun ajaran yang ditutup, 2025 = Juli 2025 s/d Juni 2026 "
+                 "(default: tahun ajaran terakhir yang sudah selesai)",
+        )
+        parser.add_argument('--sekolah', default=None, help="Kode sekolah (default settings.SEKOLAH_DEFAULT)")
+        parser.add_argument('--dry-run', action='store_true', help="Hanya hitung total, tanpa menulis")
+
+    def handle(self, *args, **options):
+        tahun = options['tahun'] or tahun_ajaran_terakhir(datetime.date.today())
+        try:
+            sekolah = sekolah_dari_kode(options['sekolah'])
+            # Kunci cache (laporan) diberi awalan sekolah aktif
+            with pakai_sekolah(sekolah):
+                hasil = tutup_tahun(sekolah, tahun, dry_run=options['dry_run'])
+        except (ValueError, SudahDitutup) as e:
+            raise CommandError(str(e))
+
+        awalan = "[DRY RUN] " if options['dry_run'] else ""
+        naik = ", ".join(f"kelas {k}: {n}" for k, n in hasil['naik_kelas'].items())
+        self.stdout.write(self.style.SUCCESS(
+            f"{awalan}{sekolah.nama} tahun ajaran {tahun}/{tahun + 1}: {hasil['tagihan_ditutup']} tagihan ditutup, "
+            f"{hasil['siswa_menunggak']} siswa membawa tunggakan Rp {hasil['total_tunggakan']:,}. "
+            f"Naik kelas ({naik})."
+        ))
@@ -0,0 +1,177 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from django.utils.crypto import get_random_string
+
+from pembayaran.ledger import verifikasi
+from pembayaran.loadtest import MidtransPalsu, Statistik, sesi_siswa
+from pembayaran.models import MutasiSaldo, Pembayaran, Siswa, Tagihan
+from pembayaran.tenancy import sekolah_dari_kode
+
+PREFIX_USER = 'loadtest-'
+JUDUL_TAGIHAN = 'LOADTEST SPP'
+
+
+class Command(BaseCommand):
+    help = (
+        "Uji beban end-to-end (login -> dashboard -> bayar -> webhook) dengan server Midtrans palsu. "
+        "Jalankan di database uji, bukan production: perintah ini membuat siswa & tagihan 'loadtest-*' "
+        "(dihapus lagi setelah selesai). Tanpa DEBUG=True wajib --saya-yakin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--siswa', type=int, default=20, help="Jumlah siswa virtual")
+        parser.add_argument('--konkurensi', type=int, default=10, help="Jumlah sesi yang berjalan bersamaan")
+        parser.add_argument('--latensi-snap', type=float, default=0.1, help="Latensi Snap palsu (detik)")
+        parser.add_argument('--jeda-webhook', type=float, default=0.2, help="Jeda sebelum webhook dikirim (detik)")
+        parser.add_argument('--peluang-duplikat', type=float, default=0.2)
+        parser.add_argument('--peluang-acak-urutan', type=float, default=0.2)
+        parser.add_argument('--port', type=int, default=8765, help="Port server aplikasi yang dijalankan")
+        parser.add_argument('--workers', type=int, default=2, help="Worker gunicorn (jika terpasang)")
+        parser.add_argument('--saya-yakin', action='store_true',
+                            help="Izinkan berjalan walau DEBUG=False (database ini BUKAN production)")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['saya_yakin']:
+            raise CommandError(
+                "DEBUG=False: database ini mungkin production. Uji beban membuat & menghapus data "
+                "'loadtest-*'; tambahkan --saya-yakin jika memang database uji."
+            )
+        # Password acak per run: akun uji tidak bisa dipakai login dari luar
+        password = get_random_string(32)
+        try:
+            tagihan_ids = self._siapkan_data(options['siswa'], password)
+            self._uji(options, password, tagihan_ids)
+        finally:
+            self._bersihkan()
+
+    def _uji(self, options, password, tagihan_ids):
+        statistik = Statistik()
+        base_url = f"http://127.0.0.1:{options['port']}"
+        # Webhook tanpa signature yang valid ditolak, jadi server & Midtrans palsu harus memakai key yang sama
+        server_key = settings.MIDTRANS_SERVER_KEY or f"loadtest-{uuid.uuid4().hex}"
+
+        palsu = MidtransPalsu(
+            url_webhook=f"{base_url}/webhook/midtrans/",
+            server_key=server_key,
+            latensi_snap=options['latensi_snap'],
+            jeda_webhook=options['jeda_webhook'],
+            peluang_duplikat=options['peluang_duplikat'],
+            peluang_acak_urutan=options['peluang_acak_urutan'],
+            statistik=statistik,
+        ).start()
+        server = self._jalankan_server(options['port'], options['workers'], palsu.base_url, server_key)
+        try:
+            self._tunggu_siap(base_url)
+            statistik.mulai = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['konkurensi']) as pool:
+                for i in range(options['siswa']):
+                    pool.submit(sesi_siswa, base_url, f"{PREFIX_USER}{i}", password, statistik)
+            palsu.stop()  # menunggu semua webhook selesai terkirim
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+        self._laporan(statistik, palsu, tagihan_ids)
+
+    def _siapkan_data(self, jumlah, password):
+        """Buat (atau pakai ulang sisa run yang terputus) siswa loadtest dan satu tagihan baru per siswa."""
+        password_hash = make_password(password)  # sekali saja, PBKDF2 lambat
+        # Server uji diakses lewat 127.0.0.1, jadi siswa dibuat di sekolah default
+        sekolah = sekolah_dari_kode()
+        for i in range(jumlah):
+            user, _ = User.objects.get_or_create(username=f"{PREFIX_USER}{i}")
+            user.password = password_hash
+            user.save(update_fields=['password'])
+            Siswa.objects.get_or_create(
+                user=user, defaults={'sekolah': sekolah, 'nis': f"LT{i:05d}", 'nama_lengkap': f"Siswa Uji {i}", 'kelas': '7'}
+            )
+
+        siswa_list = Siswa.objects.filter(user__username__startswith=PREFIX_USER)[:jumlah]
+        # Tagihan uji sebelumnya yang belum lunas dihapus agar tidak ikut dibayar
+        Tagihan.objects.filter(siswa__in=siswa_list, judul=JUDUL_TAGIHAN).exclude(status='LUNAS').delete()
+        return [
+            Tagihan.objects.create(siswa=s, judul=JUDUL_TAGIHAN, jumlah=150000, bulan='Uji', tahun=2000).id
+            for s in siswa_list
+        ]
+
+    @transaction.atomic
+    def _bersihkan(self):
+        """Hapus semua data 'loadtest-*' beserta baris ledger-nya (khusus data uji)."""
+        siswa = Siswa.objects.filter(user__username__startswith=PREFIX_USER)
+        tagihan = Tagihan.objects.filter(siswa__in=siswa)
+        pembayaran = list(Pembayaran.objects.filter(tagihan__in=tagihan).values_list('id', flat=True))
+        # Tagihan dulu: FK pembayaran di-SET_NULL, jadi sinyal saldo tidak menyimpan ulang tagihan
+        tagihan.delete()
+        Pembayaran.objects.filter(id__in=pembayaran).delete()
+        # MutasiSaldo.siswa PROTECT: ledger data uji dihapus eksplisit sebelum siswanya
+        MutasiSaldo.objects.filter(siswa__in=siswa).delete()
+        jumlah, _ = User.objects.filter(username__startswith=PREFIX_USER).delete()
+        self.stdout.write(f"Data uji beban dibersihkan ({jumlah} baris).")
+
+    def _jalankan_server(self, port, workers, snap_base_url, server_key):
+        # Semua siswa virtual datang dari 127.0.0.1, jadi rate limit per IP dimatikan
+        env = {**os.environ, 'MIDTRANS_SNAP_BASE_URL': snap_base_url,
+               'MIDTRANS_SERVER_KEY': server_key, 'RATE_LIMIT_AKTIF': 'False'}
+        if importlib.util.find_spec('gunicorn'):
+            cmd = [sys.executable, '-m', 'gunicorn', 'spp_sekolah.wsgi', '-b', f"127.0.0.1:{port}", '-w', str(workers)]
+        else:
+            cmd = [sys.executable, 'manage.py', 'runserver', '--noreload', f"127.0.0.1:{port}"]
+        self.stdout.write(f"Menjalankan server: {' '.join(cmd)}")
+        return subprocess.Popen(cmd, cwd=settings.BASE_DIR, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _tunggu_siap(self, base_url, batas=30):
+        akhir = time.monotonic() + batas
+        while time.monotonic() < akhir:
+            try:
+                if requests.get(f"{base_url}/login/", timeout=2).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.3)
+        raise CommandError("Server aplikasi tidak siap dalam 30 detik.")
+
+    def _laporan(self, statistik, palsu, tagihan_ids):
+        durasi, baris = statistik.ringkasan()
+        self.stdout.write(f"\nDurasi: {durasi:.1f} detik\n")
+        self.stdout.write(f"{'Langkah':<20}{'Jumlah':>8}{'Error':>7}{'Req/dtk':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for b in baris:
+            self.stdout.write(
+                f"{b['langkah']:<20}{b['jumlah']:>8}{b['error']:>7}{b['per_detik']:>9.1f}"
+                f"{b['p50_ms']:>9.1f}{b['p95_ms']:>9.1f}{b['p99_ms']:>9.1f}"
+            )
+
+        # Bandingkan saldo di database dengan pembayaran yang benar-benar dikirim Midtrans palsu
+        seharusnya = {}
+        for tagihan_id, gross in palsu.settlement.values():
+            seharusnya[tagihan_id] = seharusnya.get(tagihan_id, 0) + int(gross)
+
+        selisih = []
+        for t in Tagihan.objects.filter(id__in=tagihan_ids).annotate(total_bayar=Sum('pembayaran__jumlah_bayar')):
+            harapan = seharusnya.get(t.id, 0)
+            if t.jumlah_terbayar != harapan or (t.total_bayar or 0) != harapan:
+                selisih.append((t.id, harapan, t.jumlah_terbayar, t.total_bayar or 0))
+
+        self.stdout.write(f"\nWebhook gagal terkirim setelah dicoba ulang: {palsu.gagal_terkirim}")
+        ledger = [v for v in verifikasi() if v[0] in set(tagihan_ids)]
+        self.stdout.write(f"Tagihan tidak cocok dengan ledger: {len(ledger)}")
+        if selisih:
+            self.stdout.write(self.style.ERROR(f"{len(selisih)} saldo tagihan TIDAK sesuai:"))
+            for tagihan_id, harapan, terbayar, total in selisih:
+                self.stdout.write(f"  Tagihan #{tagihan_id}: harusnya Rp {harapan}, "
+                                  f"jumlah_terbayar Rp {terbayar}, total pembayaran Rp {total}")
+        else:
+            self.stdout.write(self.style.SUCCESS("Semua saldo tagihan sesuai dengan pembayaran yang dikirim."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pembayaran.ledger import UKURAN_BATCH, verifikasi
+
+
+class Command(BaseCommand):
+    help = "Cocokkan sisa setiap Tagihan dengan ledger MutasiSaldo"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=UKURAN_BATCH, help="Jumlah tagihan per batch")
+
+    def handle(self, *args, **options):
+        selisih = 0
+        for tagihan_id, sisa, saldo in verifikasi(ukuran_batch=options['batch']):
+            selisih += 1
+            self.stderr.write(f"Tagihan #{tagihan_id}: sisa di tagihan Rp {sisa}, di ledger Rp {saldo}")
+
+        if selisih:
+            raise CommandError(f"{selisih} tagihan tidak cocok dengan ledger.")
+        self.stdout.write(self.style.SUCCESS("Semua tagihan cocok dengan ledger."))
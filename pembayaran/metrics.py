@@ -0,0 +1,295 @@
+# pembayaran/metrics.py
+
+"""
+Registry metrik sederhana (counter, histogram, gauge) dengan output format
+teks Prometheus di endpoint /metrics/.
+
+Gunicorn menjalankan beberapa proses worker, masing-masing dengan memorinya
+sendiri. Jika settings.METRICS_MULTIPROC_DIR diisi, setiap proses menulis
+nilainya ke file `<pid>.json` di folder tersebut (lewat thread latar belakang,
+maksimal sekali per detik) dan endpoint menjumlahkan semua file, sehingga
+angka semua worker ikut terhitung. Hook di gunicorn.conf.py mengosongkan folder
+saat master mulai dan menggabungkan file worker yang berhenti ke `selesai.json`,
+jadi file lama tidak menumpuk dan counter tidak turun saat PID dipakai ulang.
+"""
+
+import atexit
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+INTERVAL_SIMPAN = 1.0  # detik
+BUCKET_DEFAULT = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_registry = {}
+_kotor = False
+_penulis_pid = None
+
+
+class _Metrik:
+    tipe = None
+
+    def __init__(self, nama, bantuan, label=()):
+        self.nama = nama
+        self.bantuan = bantuan
+        self.label = tuple(label)
+        self._nilai = {}
+        _registry[nama] = self
+
+    def _kunci(self, labels):
+        return tuple(str(labels.get(l, '')) for l in self.label)
+
+
+class Counter(_Metrik):
+    tipe = 'counter'
+
+    def inc(self, jumlah=1, **labels):
+        kunci = self._kunci(labels)
+        with _lock:
+            self._nilai[kunci] = self._nilai.get(kunci, 0) + jumlah
+        _simpan_berkala()
+
+
+class Histogram(_Metrik):
+    tipe = 'histogram'
+
+    def __init__(self, nama, bantuan, label=(), bucket=BUCKET_DEFAULT):
+        super().__init__(nama, bantuan, label)
+        self.bucket = tuple(bucket)
+
+    def observe(self, nilai, **labels):
+        kunci = self._kunci(labels)
+        with _lock:
+            # Format: [jumlah per bucket..., jumlah +Inf, sum]
+            data = self._nilai.setdefault(kunci, [0] * (len(self.bucket) + 1) + [0.0])
+            for i, batas in enumerate(self.bucket):
+                if nilai <= batas:
+                    data[i] += 1
+                    break
+            else:
+                data[len(self.bucket)] += 1
+            data[-1] += nilai
+        _simpan_berkala()
+
+    @contextmanager
+    def waktu(self, **labels):
+        mulai = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - mulai, **labels)
+
+
+class Gauge(_Metrik):
+    """Gauge yang nilainya dihitung saat endpoint dibaca (misal dari database)."""
+    tipe = 'gauge'
+
+    def __init__(self, nama, bantuan, fungsi):
+        super().__init__(nama, bantuan)
+        self.fungsi = fungsi
+
+
+# ----------------------------------------------------------------
+# --- PENYIMPANAN MULTI-PROSES
+# ----------------------------------------------------------------
+def _folder():
+    # Master gunicorn meng-import modul ini (gunicorn.conf.py) tanpa memuat settings Django
+    if not settings.configured:
+        return None
+    return getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+
+
+def _dump():
+    with _lock:
+        return {
+            m.nama: [[list(k), v] for k, v in m._nilai.items()]
+            for m in _registry.values() if m._nilai
+        }
+
+
+def simpan():
+    folder = _folder()
+    if not folder:
+        return
+    # File tmp per thread (writer thread & scrape bisa bersamaan), lalu os.replace
+    # yang atomic: pembaca tidak pernah melihat file setengah jadi
+    _tulis(os.path.join(folder, f"{os.getpid()}.json"), _dump())
+
+
+def _penulis():
+    global _kotor
+    while True:
+        time.sleep(INTERVAL_SIMPAN)
+        if _kotor:
+            _kotor = False
+            simpan()
+
+
+def _simpan_berkala():
+    """Tandai ada perubahan. Penulisan file dilakukan thread latar belakang per proses."""
+    global _kotor, _penulis_pid
+    if not _folder():
+        return
+    _kotor = True
+    if _penulis_pid != os.getpid():
+        # Thread tidak ikut tersalin saat gunicorn fork, jadi dibuat per pid
+        _penulis_pid = os.getpid()
+        threading.Thread(target=_penulis, daemon=True, name='metrics-writer').start()
+
+
+atexit.register(simpan)
+
+
+FILE_SELESAI = 'selesai.json'
+
+
+def _baca(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _tulis(path, isi):
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(isi, f)
+    os.replace(tmp, path)
+
+
+def bersihkan_folder(folder):
+    """Hapus file metrik lama (dipanggil hook gunicorn on_starting, sebelum worker dibuat)."""
+    os.makedirs(folder, exist_ok=True)
+    for path in glob.glob(os.path.join(folder, '*.json')) + glob.glob(os.path.join(folder, '*.tmp')):
+        os.remove(path)
+
+
+def tutup_proses(folder, pid):
+    """
+    Worker `pid` sudah berhenti (hook gunicorn child_exit, di proses master):
+    tambahkan nilainya ke `selesai.json` lalu hapus `<pid>.json`, agar counter
+    tetap naik dan PID yang dipakai ulang mulai dari file kosong.
+    """
+    path = os.path.join(folder, f"{pid}.json")
+    isi = _baca(path)
+    if isi:
+        path_selesai = os.path.join(folder, FILE_SELESAI)
+        total = {nama: {tuple(k): v for k, v in data} for nama, data in (_baca(path_selesai) or {}).items()}
+        for nama, data in isi.items():
+            _gabung(total.setdefault(nama, {}), data)
+        _tulis(path_selesai, {nama: [[list(k), v] for k, v in data.items()] for nama, data in total.items()})
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _gabung(total, data):
+    for kunci, nilai in data:
+        kunci = tuple(kunci)
+        if isinstance(nilai, list):  # histogram: [bucket..., +Inf, sum]
+            lama = total.setdefault(kunci, [0] * len(nilai))
+            total[kunci] = [a + b for a, b in zip(lama, nilai)]
+        else:
+            total[kunci] = total.get(kunci, 0) + nilai
+
+
+def _kumpulkan():
+    """Nilai semua metrik, dijumlahkan dari semua proses worker."""
+    folder = _folder()
+    if not folder:
+        with _lock:
+            return {nama: dict(m._nilai) for nama, m in _registry.items()}
+
+    simpan()  # pastikan data proses ini yang terbaru
+    total = {nama: {} for nama in _registry}
+    for path in glob.glob(os.path.join(folder, '*.json')):
+        isi = _baca(path)
+        if not isi:
+            continue
+        for nama, data in isi.items():
+            if nama in _registry:
+                _gabung(total[nama], data)
+    return total
+
+
+# ----------------------------------------------------------------
+# --- FORMAT TEKS PROMETHEUS
+# ----------------------------------------------------------------
+def _format_label(nama_label, nilai_label, tambahan=None):
+    pasangan = list(zip(nama_label, nilai_label)) + list(tambahan or [])
+    if not pasangan:
+        return ''
+    isi = ','.join(
+        '%s="%s"' % (k, str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for k, v in pasangan
+    )
+    return '{' + isi + '}'
+
+
+def render():
+    baris = []
+    semua = _kumpulkan()
+    for nama, m in sorted(_registry.items()):
+        baris.append(f"# HELP {nama} {m.bantuan}")
+        baris.append(f"# TYPE {nama} {m.tipe}")
+
+        if isinstance(m, Gauge):
+            baris.append(f"{nama} {m.fungsi()}")
+            continue
+
+        for kunci, nilai in sorted(semua.get(nama, {}).items()):
+            if isinstance(m, Histogram):
+                kumulatif = 0
+                for batas, jumlah in zip(m.bucket + ('+Inf',), nilai[:-1]):
+                    kumulatif += jumlah
+                    baris.append(f"{nama}_bucket{_format_label(m.label, kunci, [('le', batas)])} {kumulatif}")
+                baris.append(f"{nama}_sum{_format_label(m.label, kunci)} {nilai[-1]}")
+                baris.append(f"{nama}_count{_format_label(m.label, kunci)} {kumulatif}")
+            else:
+                baris.append(f"{nama}{_format_label(m.label, kunci)} {nilai}")
+    return '\n'.join(baris) + '\n'
+
+
+# ----------------------------------------------------------------
+# --- DEFINISI METRIK APLIKASI
+# ----------------------------------------------------------------
+WEBHOOK_TOTAL = Counter(
+    'spp_webhook_midtrans_total', "Jumlah notifikasi webhook Midtrans",
+    label=('transaction_status', 'http_status'),
+)
+WEBHOOK_DURASI = Histogram(
+    'spp_webhook_midtrans_durasi_detik', "Lama proses webhook Midtrans",
+    label=('transaction_status',),
+)
+SNAP_DURASI = Histogram('spp_snap_token_durasi_detik', "Lama pembuatan Snap token di buat_transaksi")
+SNAP_ERROR = Counter('spp_snap_token_error_total', "Jumlah kegagalan pembuatan Snap token")
+TAGIHAN_MASSAL_DIBUAT = Counter('spp_tagihan_massal_dibuat_total', "Jumlah tagihan yang dibuat lewat tagihan massal")
+TAGIHAN_MASSAL_DURASI = Histogram('spp_tagihan_massal_durasi_detik', "Lama satu proses tagihan massal")
+CACHE_TOTAL = Counter('spp_cache_total', "Jumlah akses cache aplikasi", label=('cache', 'hasil'))
+
+
+def catat_cache(nama, hit):
+    CACHE_TOTAL.inc(cache=nama, hasil='hit' if hit else 'miss')
+
+
+def ukur_webhook(view):
+    """
+    Decorator untuk webhook: catat jumlah & durasi per transaction_status.
+    View mengisi `request.transaction_status` setelah body berhasil dibaca.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        mulai = time.perf_counter()
+        response = view(request, *args, **kwargs)
+        status = getattr(request, 'transaction_status', None) or 'tidak_diketahui'
+        WEBHOOK_DURASI.observe(time.perf_counter() - mulai, transaction_status=status)
+        WEBHOOK_TOTAL.inc(transaction_status=status, http_status=response.status_code)
+        return response
+    return wrapper
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0007_buattagihanmassal_alter_tagihan_jumlah'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='buattagihanmassal',
+            name='target_kelas',
+            field=models.CharField(choices=[('7', '7'), ('8', '8'), ('9', '9'), ('SEMUA', 'Semua Kelas')], max_length=10),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:42
+
+from django.db import migrations
+
+# Index GIN trigram untuk pencarian admin di PostgreSQL.
+# Ekspresi UPPER(...::text) disamakan dengan SQL lookup `icontains` Django.
+INDEX_TRIGRAM = [
+    ('pembayaran_siswa_nama_trgm', 'pembayaran_siswa', 'nama_lengkap'),
+    ('pembayaran_tagihan_judul_trgm', 'pembayaran_tagihan', 'judul'),
+]
+
+
+def buat_index_trigram(apps, schema_editor):
+    # SQLite memakai tabel FTS5 (dibuat oleh sinyal post_migrate di apps.py)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for nama, tabel, kolom in INDEX_TRIGRAM:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nama} ON {tabel} '
+            f'USING gin ((UPPER("{kolom}"::text)) gin_trgm_ops)'
+        )
+
+
+def hapus_index_trigram(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nama, tabel, kolom in INDEX_TRIGRAM:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nama}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0008_alter_buattagihanmassal_target_kelas'),
+    ]
+
+    operations = [
+        migrations.RunPython(buat_index_trigram, hapus_index_trigram),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0009_indeks_pencarian'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagihanArsip',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('judul', models.CharField(max_length=200)),
+                ('jumlah', models.DecimalField(decimal_places=0, max_digits=10)),
+                ('jumlah_terbayar', models.DecimalField(decimal_places=0, default=0, max_digits=10)),
+                ('bulan', models.CharField(max_length=20)),
+                ('tahun', models.IntegerField(db_index=True)),
+                ('status', models.CharField(choices=[('BELUM_LUNAS', 'Belum Lunas'), ('PENDING', 'Menunggu Pembayaran'), ('LUNAS', 'Lunas'), ('KADALUARSA', 'Kadaluarsa / Batal')], default='LUNAS', max_length=20)),
+                ('tanggal_dibuat', models.DateTimeField()),
+                ('tanggal_diarsipkan', models.DateTimeField(auto_now_add=True)),
+                ('siswa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pembayaran.siswa')),
+            ],
+            options={
+                'verbose_name': 'Arsip Tagihan',
+                'verbose_name_plural': 'Arsip Tagihan',
+            },
+        ),
+        migrations.CreateModel(
+            name='PembayaranArsip',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tanggal_bayar', models.DateTimeField()),
+                ('jumlah_bayar', models.DecimalField(decimal_places=0, max_digits=10)),
+                ('id_transaksi_gateway', models.CharField(max_length=100, unique=True)),
+                ('metode_pembayaran', models.CharField(default='MANUAL/CASH', max_length=50)),
+                ('tagihan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pembayaran_set', to='pembayaran.tagihanarsip')),
+            ],
+            options={
+                'verbose_name': 'Arsip Pembayaran',
+                'verbose_name_plural': 'Arsip Pembayaran',
+            },
+        ),
+    ]
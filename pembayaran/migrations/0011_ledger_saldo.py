@@ -0,0 +1,92 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Sum
+
+UKURAN_BATCH = 1000
+
+
+def isi_ledger_awal(apps, schema_editor):
+    # Saldo pembuka ledger dari data yang sudah ada sebelum ledger dibuat
+    Tagihan = apps.get_model('pembayaran', 'Tagihan')
+    Pembayaran = apps.get_model('pembayaran', 'Pembayaran')
+    MutasiSaldo = apps.get_model('pembayaran', 'MutasiSaldo')
+
+    total_bayar = dict(
+        Pembayaran.objects.filter(tagihan__isnull=False)
+        .values('tagihan_id').annotate(total=Sum('jumlah_bayar'))
+        .values_list('tagihan_id', 'total')
+    )
+    mutasi = []
+    for t in Tagihan.objects.order_by('id').iterator(chunk_size=UKURAN_BATCH):
+        mutasi.append(MutasiSaldo(
+            siswa_id=t.siswa_id, tagihan_id=t.id, jenis='TAGIHAN',
+            jumlah=t.jumlah, keterangan=t.judul, waktu=t.tanggal_dibuat,
+        ))
+        selisih = (t.jumlah_terbayar or 0) - (total_bayar.get(t.id) or 0)
+        if selisih:
+            mutasi.append(MutasiSaldo(
+                siswa_id=t.siswa_id, tagihan_id=t.id, jenis='PENYESUAIAN',
+                jumlah=-selisih, keterangan="Saldo awal ledger", waktu=t.tanggal_dibuat,
+            ))
+        if len(mutasi) >= UKURAN_BATCH:
+            MutasiSaldo.objects.bulk_create(mutasi)
+            mutasi = []
+    MutasiSaldo.objects.bulk_create(mutasi)
+
+    mutasi = []
+    for p in Pembayaran.objects.filter(tagihan__isnull=False).select_related('tagihan').order_by('id').iterator(chunk_size=UKURAN_BATCH):
+        mutasi.append(MutasiSaldo(
+            siswa_id=p.tagihan.siswa_id, tagihan_id=p.tagihan_id, pembayaran_id=p.id, jenis='PEMBAYARAN',
+            jumlah=-p.jumlah_bayar, keterangan=p.metode_pembayaran, waktu=p.tanggal_bayar,
+        ))
+        if len(mutasi) >= UKURAN_BATCH:
+            MutasiSaldo.objects.bulk_create(mutasi)
+            mutasi = []
+    MutasiSaldo.objects.bulk_create(mutasi)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0010_arsip'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MutasiSaldo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tagihan_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('pembayaran_id', models.BigIntegerField(blank=True, null=True)),
+                ('jenis', models.CharField(choices=[('TAGIHAN', 'Tagihan Baru'), ('PEMBAYARAN', 'Pembayaran'), ('PEMBATALAN', 'Pembatalan Pembayaran'), ('PENYESUAIAN', 'Penyesuaian')], max_length=20)),
+                ('jumlah', models.DecimalField(decimal_places=0, max_digits=12)),
+                ('keterangan', models.CharField(blank=True, max_length=200)),
+                ('waktu', models.DateTimeField(default=django.utils.timezone.now)),
+                ('siswa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pembayaran.siswa')),
+            ],
+            options={
+                'verbose_name': 'Mutasi Saldo',
+                'verbose_name_plural': 'Mutasi Saldo',
+                'indexes': [models.Index(fields=['siswa', 'waktu'], name='mutasi_siswa_waktu_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotSaldo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('saldo', models.DecimalField(decimal_places=0, max_digits=12)),
+                ('mutasi_terakhir', models.BigIntegerField()),
+                ('waktu', models.DateTimeField(default=django.utils.timezone.now)),
+                ('siswa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pembayaran.siswa')),
+            ],
+            options={
+                'verbose_name': 'Snapshot Saldo',
+                'verbose_name_plural': 'Snapshot Saldo',
+                'indexes': [models.Index(fields=['siswa', 'waktu'], name='snapshot_siswa_waktu_idx')],
+            },
+        ),
+        migrations.RunPython(isi_ledger_awal, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0011_ledger_saldo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PengingatTerkirim',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periode', models.CharField(help_text='Contoh: 2026-10', max_length=20)),
+                ('tujuan', models.CharField(max_length=254)),
+                ('total_tunggakan', models.DecimalField(decimal_places=0, max_digits=12)),
+                ('jumlah_tagihan', models.IntegerField()),
+                ('waktu_kirim', models.DateTimeField(auto_now_add=True)),
+                ('siswa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pembayaran.siswa')),
+            ],
+            options={
+                'verbose_name': 'Pengingat Terkirim',
+                'verbose_name_plural': 'Pengingat Terkirim',
+                'constraints': [models.UniqueConstraint(fields=('periode', 'siswa'), name='pengingat_unik_per_periode')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0012_pengingat_terkirim'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pembayaran',
+            index=models.Index(fields=['tagihan', 'tanggal_bayar', 'id'], name='pembayaran_tagihan_tgl_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tagihan',
+            index=models.Index(fields=['siswa', 'status', '-tanggal_dibuat', '-id'], name='tagihan_riwayat_idx'),
+        ),
+    ]
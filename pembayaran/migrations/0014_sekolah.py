@@ -0,0 +1,106 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Semua data yang sudah ada milik sekolah pertama
+SEKOLAH_AWAL = {
+    'kode': 'darus-sholihin',
+    'nama': 'SMP-IT Darus Sholihin',
+    'domain': 'spp-smp-it-darus-sholihin.onrender.com',
+    'folder_aset': 'pembayaran/images',
+}
+
+
+def isi_sekolah_awal(apps, schema_editor):
+    Sekolah = apps.get_model('pembayaran', 'Sekolah')
+    sekolah, _ = Sekolah.objects.get_or_create(kode=SEKOLAH_AWAL['kode'], defaults=SEKOLAH_AWAL)
+    for nama_model in ('Siswa', 'Tagihan', 'Pembayaran', 'BuatTagihanMassal'):
+        apps.get_model('pembayaran', nama_model).objects.filter(sekolah__isnull=True).update(sekolah=sekolah)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0013_indeks_riwayat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sekolah',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kode', models.SlugField(unique=True)),
+                ('nama', models.CharField(help_text='Contoh: SMP-IT Darus Sholihin', max_length=100)),
+                ('domain', models.CharField(help_text="Host tanpa 'www.', misal spp.sekolah.sch.id", max_length=255, unique=True)),
+                ('folder_aset', models.CharField(default='pembayaran/images', help_text='Folder static berisi logo.png, kop.jpg, cap.png dan ttd-kepsek.png', max_length=200)),
+            ],
+            options={
+                'verbose_name': 'Sekolah',
+                'verbose_name_plural': 'Sekolah',
+            },
+        ),
+        # 1. Tambah kolom sekolah (sementara boleh kosong) lalu isi data lama
+        migrations.AddField(
+            model_name='siswa',
+            name='sekolah',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='pembayaran.sekolah'),
+        ),
+        migrations.AddField(
+            model_name='tagihan',
+            name='sekolah',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='pembayaran.sekolah'),
+        ),
+        migrations.AddField(
+            model_name='pembayaran',
+            name='sekolah',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='pembayaran.sekolah'),
+        ),
+        migrations.AddField(
+            model_name='buattagihanmassal',
+            name='sekolah',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='pembayaran.sekolah'),
+        ),
+        migrations.RunPython(isi_sekolah_awal, migrations.RunPython.noop),
+        # 2. Setelah terisi, kolom wajib diisi
+        migrations.AlterField(
+            model_name='siswa',
+            name='sekolah',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.PROTECT, to='pembayaran.sekolah'),
+        ),
+        migrations.AlterField(
+            model_name='tagihan',
+            name='sekolah',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.PROTECT, to='pembayaran.sekolah'),
+        ),
+        migrations.AlterField(
+            model_name='pembayaran',
+            name='sekolah',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.PROTECT, to='pembayaran.sekolah'),
+        ),
+        migrations.AlterField(
+            model_name='buattagihanmassal',
+            name='sekolah',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, to='pembayaran.sekolah'),
+        ),
+        # 3. NIS unik per sekolah, indeks diawali sekolah
+        migrations.AlterField(
+            model_name='siswa',
+            name='nis',
+            field=models.CharField(max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='siswa',
+            constraint=models.UniqueConstraint(fields=('sekolah', 'nis'), name='siswa_sekolah_nis_unik', violation_error_message='NIS sudah terdaftar di sekolah ini.'),
+        ),
+        migrations.AddIndex(
+            model_name='siswa',
+            index=models.Index(fields=['sekolah', 'kelas'], name='siswa_sekolah_kelas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tagihan',
+            index=models.Index(fields=['sekolah', 'status', 'tanggal_dibuat'], name='tagihan_sekolah_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pembayaran',
+            index=models.Index(fields=['sekolah', 'tanggal_bayar'], name='pembayaran_sekolah_tgl_idx'),
+        ),
+    ]
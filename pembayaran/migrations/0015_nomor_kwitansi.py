@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0014_sekolah'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NomorKwitansi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tahun', models.PositiveIntegerField(unique=True)),
+                ('terakhir', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Nomor Kwitansi',
+                'verbose_name_plural': 'Nomor Kwitansi',
+            },
+        ),
+    ]
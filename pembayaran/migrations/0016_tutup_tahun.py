@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0015_nomor_kwitansi'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tagihan',
+            name='status',
+            field=models.CharField(choices=[('BELUM_LUNAS', 'Belum Lunas'), ('PENDING', 'Menunggu Pembayaran'), ('LUNAS', 'Lunas'), ('KADALUARSA', 'Kadaluarsa / Batal'), ('DITUTUP', 'Ditutup (Dipindah ke Tunggakan)')], default='BELUM_LUNAS', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='tagihanarsip',
+            name='status',
+            field=models.CharField(choices=[('BELUM_LUNAS', 'Belum Lunas'), ('PENDING', 'Menunggu Pembayaran'), ('LUNAS', 'Lunas'), ('KADALUARSA', 'Kadaluarsa / Batal'), ('DITUTUP', 'Ditutup (Dipindah ke Tunggakan)')], default='LUNAS', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='TutupTahun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tahun', models.IntegerField(help_text='Tahun tagihan yang ditutup')),
+                ('tagihan_ditutup', models.PositiveIntegerField(default=0)),
+                ('siswa_menunggak', models.PositiveIntegerField(default=0)),
+                ('total_tunggakan', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('siswa_naik_kelas', models.PositiveIntegerField(default=0)),
+                ('waktu', models.DateTimeField(auto_now_add=True)),
+                ('sekolah', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, to='pembayaran.sekolah')),
+            ],
+            options={
+                'verbose_name': 'Tutup Tahun',
+                'verbose_name_plural': 'Tutup Tahun',
+                'constraints': [models.UniqueConstraint(fields=('sekolah', 'tahun'), name='tutup_tahun_sekolah_tahun_unik')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0016_tutup_tahun'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaliKelas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kelas', models.CharField(max_length=10)),
+                ('sekolah', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, to='pembayaran.sekolah')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Wali Kelas',
+                'verbose_name_plural': 'Wali Kelas',
+            },
+        ),
+    ]
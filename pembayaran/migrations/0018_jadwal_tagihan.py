@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:11
+
+import django.core.validators
+import django.db.models.deletion
+import pembayaran.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0017_wali_kelas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JadwalTagihan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nama', models.CharField(default='SPP', help_text="Judul tagihan menjadi '<nama> Bulan <bulan> <tahun>'", max_length=100)),
+                ('target_kelas', models.CharField(choices=[('7', '7'), ('8', '8'), ('9', '9'), ('SEMUA', 'Semua Kelas')], max_length=10)),
+                ('jumlah', models.DecimalField(decimal_places=0, max_digits=10)),
+                ('bulan_ditagih', models.CharField(default='7,8,9,10,11,12,1,2,3,4,5,6', help_text='Nomor bulan dalam tahun ajaran yang ditagih, dipisah koma', max_length=40, validators=[pembayaran.models.validasi_daftar_bulan])),
+                ('tanggal_tagih', models.PositiveSmallIntegerField(default=1, help_text='Tagihan bulan tersebut dibuat mulai tanggal ini', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(28)])),
+                ('mulai', models.DateField(help_text='Bulan pertama yang ditagih (tanggalnya diabaikan)')),
+                ('aktif', models.BooleanField(default=True)),
+                ('periode_terakhir', models.DateField(blank=True, editable=False, null=True)),
+                ('sekolah', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, to='pembayaran.sekolah')),
+            ],
+            options={
+                'verbose_name': 'Jadwal Tagihan',
+                'verbose_name_plural': 'Jadwal Tagihan',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0018_jadwal_tagihan'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mutasisaldo',
+            name='siswa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='pembayaran.siswa'),
+        ),
+    ]
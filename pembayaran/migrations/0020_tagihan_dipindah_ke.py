@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0019_mutasi_siswa_protect'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tagihan',
+            name='dipindah_ke',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='asal_tunggakan', to='pembayaran.tagihan'),
+        ),
+        migrations.AlterField(
+            model_name='tutuptahun',
+            name='tahun',
+            field=models.IntegerField(help_text='Tahun ajaran yang ditutup: 2025 = Juli 2025 s/d Juni 2026'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def tautkan_staff_lama(apps, schema_editor):
+    # Akun staff yang sudah ada dibuat saat aplikasi masih untuk satu sekolah:
+    # tautkan ke sekolah pertama (lihat 0014). Staff sekolah lain ditautkan manual.
+    Sekolah = apps.get_model('pembayaran', 'Sekolah')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    sekolah = Sekolah.objects.filter(kode='darus-sholihin').first()
+    if sekolah is not None:
+        sekolah.staff.add(*User.objects.filter(is_staff=True, is_superuser=False))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0020_tagihan_dipindah_ke'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sekolah',
+            name='staff',
+            field=models.ManyToManyField(blank=True, help_text='Akun staff yang boleh membuka admin, kwitansi & dashboard kelas sekolah ini', related_name='sekolah_dikelola', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(tautkan_staff_lama, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def isi_sekolah_counter(apps, schema_editor):
+    # Counter lama (satu urutan untuk semua sekolah) dilanjutkan oleh sekolah pertama
+    # (lihat 0014). Nomor baru memuat kode sekolah, jadi tidak bentrok dengan nomor lama.
+    Sekolah = apps.get_model('pembayaran', 'Sekolah')
+    NomorKwitansi = apps.get_model('pembayaran', 'NomorKwitansi')
+    sekolah = Sekolah.objects.filter(kode='darus-sholihin').first() or Sekolah.objects.order_by('id').first()
+    if sekolah is None:
+        NomorKwitansi.objects.all().delete()
+    else:
+        NomorKwitansi.objects.filter(sekolah__isnull=True).update(sekolah=sekolah)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0021_sekolah_staff'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nomorkwitansi',
+            name='sekolah',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='pembayaran.sekolah'),
+        ),
+        migrations.RunPython(isi_sekolah_counter, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='nomorkwitansi',
+            name='sekolah',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.PROTECT, to='pembayaran.sekolah'),
+        ),
+        migrations.AlterField(
+            model_name='nomorkwitansi',
+            name='tahun',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AddConstraint(
+            model_name='nomorkwitansi',
+            constraint=models.UniqueConstraint(fields=('sekolah', 'tahun'), name='nomor_kwitansi_sekolah_tahun_unik'),
+        ),
+    ]
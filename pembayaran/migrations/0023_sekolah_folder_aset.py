@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0022_nomor_kwitansi_per_sekolah'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sekolah',
+            name='folder_aset',
+            field=models.CharField(default='pembayaran/images', help_text='Folder static berisi logo.png, kop.jpg, cap.png dan ttd-kepsek.png (folder baru dipakai setelah deploy/collectstatic berikutnya)', max_length=200),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:50
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pembayaran', '0023_sekolah_folder_aset'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pembayaran',
+            index=models.Index(django.db.models.functions.text.Upper('id_transaksi_gateway'), name='pembayaran_idtrx_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='siswa',
+            index=models.Index(django.db.models.functions.text.Upper('nis'), name='siswa_nis_upper_idx'),
+        ),
+    ]
@@ -1,33 +1,134 @@
 # pembayaran/models.py
 
-import uuid
-from django.db import models
+import time
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db.models import Sum
+from django.db.models.functions import Upper
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver 
+from django.utils import timezone
+from . import metrics
+from .events import catat, durasi_ms
+
+FOLDER_ASET_DEFAULT = 'pembayaran/images'
+FILE_ASET = ('logo.png', 'kop.jpg', 'cap.png', 'ttd-kepsek.png')
+
+class Sekolah(models.Model):
+    """
+    Satu tenant. Sekolah aktif ditentukan dari host request (lihat tenancy.py),
+    jadi menambah sekolah cukup dengan menambah baris ini + domainnya.
+    """
+    kode = models.SlugField(max_length=50, unique=True)
+    nama = models.CharField(max_length=100, help_text="Contoh: SMP-IT Darus Sholihin")
+    domain = models.CharField(max_length=255, unique=True, help_text="Host tanpa 'www.', misal spp.sekolah.sch.id")
+    folder_aset = models.CharField(
+        max_length=200, default=FOLDER_ASET_DEFAULT,
+        help_text="Folder static berisi logo.png, kop.jpg, cap.png dan ttd-kepsek.png "
+                  "(folder baru dipakai setelah deploy/collectstatic berikutnya)",
+    )
+    # Akun staff (admin TU/keuangan) yang boleh mengelola data sekolah ini.
+    # Superuser boleh mengelola semua sekolah (lihat tenancy.staff_sekolah).
+    staff = models.ManyToManyField(
+        User, blank=True, related_name='sekolah_dikelola',
+        help_text="Akun staff yang boleh membuka admin, kwitansi & dashboard kelas sekolah ini",
+    )
+
+    class Meta:
+        verbose_name = "Sekolah"
+        verbose_name_plural = "Sekolah"
+
+    def __str__(self):
+        return self.nama
+
+    def clean(self):
+        hilang = [nama for nama in FILE_ASET if not finders.find(f"{self.folder_aset}/{nama}")]
+        if hilang:
+            raise ValidationError({'folder_aset': f"File static tidak ditemukan di folder ini: {', '.join(hilang)}."})
+
+    def _aset(self, nama):
+        # Folder yang belum ikut collectstatic terakhir tidak ada di manifest, dan
+        # {% static %} akan raise ValueError (kwitansi 500). Pakai aset default dulu
+        # sampai deploy berikutnya.
+        path = f"{self.folder_aset}/{nama}"
+        if self.folder_aset != FOLDER_ASET_DEFAULT:
+            try:
+                staticfiles_storage.url(path)
+            except ValueError:
+                return f"{FOLDER_ASET_DEFAULT}/{nama}"
+        return path
+
+    @property
+    def logo(self):
+        return self._aset('logo.png')
+
+    @property
+    def kop(self):
+        return self._aset('kop.jpg')
+
+    @property
+    def cap(self):
+        return self._aset('cap.png')
+
+    @property
+    def ttd_kepsek(self):
+        return self._aset('ttd-kepsek.png')
 
 class Siswa(models.Model):
+    sekolah = models.ForeignKey(Sekolah, on_delete=models.PROTECT, db_index=False, editable=False)
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    nis = models.CharField(max_length=20, unique=True)
+    nis = models.CharField(max_length=20)
     nama_lengkap = models.CharField(max_length=100)
     kelas = models.CharField(max_length=10)
 
     class Meta:
         verbose_name = "Siswa"
         verbose_name_plural = "Siswa"
+        constraints = [
+            # NIS hanya unik di dalam satu sekolah; indeks ini juga diawali sekolah
+            models.UniqueConstraint(
+                fields=['sekolah', 'nis'], name='siswa_sekolah_nis_unik',
+                violation_error_message="NIS sudah terdaftar di sekolah ini.",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['sekolah', 'kelas'], name='siswa_sekolah_kelas_idx'),
+            # Pencarian awalan NIS tanpa peduli huruf besar/kecil (search._cocok_prefix)
+            models.Index(Upper('nis'), name='siswa_nis_upper_idx'),
+        ]
 
     def __str__(self):
         return self.nama_lengkap
 
+class WaliKelas(models.Model):
+    """Akun guru wali kelas: bisa melihat dashboard ringkasan kelasnya sendiri."""
+    sekolah = models.ForeignKey(Sekolah, on_delete=models.PROTECT, editable=False)
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    kelas = models.CharField(max_length=10)
+
+    class Meta:
+        verbose_name = "Wali Kelas"
+        verbose_name_plural = "Wali Kelas"
+
+    def __str__(self):
+        return f"{self.user.get_full_name() or self.user.username} (Kelas {self.kelas})"
+
 class Tagihan(models.Model):
     STATUS_CHOICES = [
         ('BELUM_LUNAS', 'Belum Lunas'),
         ('PENDING', 'Menunggu Pembayaran'),
         ('LUNAS', 'Lunas'),
         ('KADALUARSA', 'Kadaluarsa / Batal'),
+        ('DITUTUP', 'Ditutup (Dipindah ke Tunggakan)'),
     ]
+    # Tagihan berstatus ini tidak dihitung sebagai tunggakan
+    STATUS_TIDAK_DITAGIH = ('LUNAS', 'KADALUARSA', 'DITUTUP')
     
+    sekolah = models.ForeignKey(Sekolah, on_delete=models.PROTECT, db_index=False, editable=False)
     siswa = models.ForeignKey(Siswa, on_delete=models.CASCADE)
     judul = models.CharField(max_length=200)
     jumlah = models.DecimalField(max_digits=10, decimal_places=0)
@@ -36,20 +137,42 @@ class Tagihan(models.Model):
     tahun = models.IntegerField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='BELUM_LUNAS')
     tanggal_dibuat = models.DateTimeField(auto_now_add=True)
+    # Diisi tutup tahun: tagihan tunggakan yang menampung sisa tagihan DITUTUP ini
+    dipindah_ke = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                                    related_name='asal_tunggakan')
 
     class Meta:
         verbose_name = "Tagihan"
         verbose_name_plural = "Tagihan"
+        indexes = [
+            # Laporan & daftar admin per sekolah
+            models.Index(fields=['sekolah', 'status', 'tanggal_dibuat'], name='tagihan_sekolah_status_idx'),
+            # Riwayat di dashboard siswa: keyset (tanggal_dibuat, id) per siswa & status
+            models.Index(fields=['siswa', 'status', '-tanggal_dibuat', '-id'], name='tagihan_riwayat_idx'),
+        ]
 
     def __str__(self):
         return f"{self.judul} - {self.siswa.nama_lengkap}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Simpan nilai awal untuk menghitung selisih di ledger (MutasiSaldo)
+        instance._awal = (instance.__dict__.get('jumlah'), instance.__dict__.get('jumlah_terbayar'))
+        return instance
+
     def save(self, *args, **kwargs):
+        # Sekolah tagihan selalu mengikuti sekolah siswanya
+        if self.sekolah_id is None and self.siswa_id is not None:
+            self.sekolah_id = self.siswa.sekolah_id
+
         # Logika Status Otomatis
         val_jumlah = self.jumlah or 0
         val_terbayar = self.jumlah_terbayar or 0
 
-        if val_terbayar >= val_jumlah:
+        if self.status == 'DITUTUP':
+            pass # Sisanya sudah dipindah saat tutup tahun (lihat tutup_tahun.py)
+        elif val_terbayar >= val_jumlah:
             self.status = 'LUNAS'
         elif self.status == 'PENDING' or self.status == 'KADALUARSA':
             pass
@@ -64,7 +187,57 @@ class Tagihan(models.Model):
         val_terbayar = self.jumlah_terbayar or 0
         return val_jumlah - val_terbayar
 
+    @property
+    def sisa_ditagih(self):
+        """Sisa yang masih ditagih di tagihan ini (= saldonya di ledger). DITUTUP: 0, sisanya ada di `dipindah_ke`."""
+        return 0 if self.status == 'DITUTUP' else self.sisa_tagihan
+
+class NomorKwitansi(models.Model):
+    """
+    Counter nomor kwitansi pembayaran tunai/manual per sekolah per tahun:
+    KW-DARUS-SHOLIHIN-2026-000123. Setiap sekolah punya urutan sendiri
+    tanpa celah; kode sekolah di nomor menjaga id_transaksi_gateway tetap unik.
+    Nomor diambil di dalam transaksi pemanggil, jadi jika transaksi gagal
+    counter ikut di-rollback dan tidak ada nomor yang terlewat.
+    """
+    sekolah = models.ForeignKey(Sekolah, on_delete=models.PROTECT, db_index=False, editable=False)
+    tahun = models.PositiveIntegerField()
+    terakhir = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Nomor Kwitansi"
+        verbose_name_plural = "Nomor Kwitansi"
+        constraints = [
+            models.UniqueConstraint(fields=['sekolah', 'tahun'], name='nomor_kwitansi_sekolah_tahun_unik'),
+        ]
+
+    def __str__(self):
+        return f"{self.sekolah_id}/{self.tahun}: {self.terakhir}"
+
+    @staticmethod
+    def format(sekolah, tahun, nomor):
+        return f"KW-{sekolah.kode.upper()}-{tahun}-{nomor:06d}"
+
+    @classmethod
+    def ambil(cls, sekolah, jumlah=1, tahun=None):
+        """
+        Pesan `jumlah` nomor berurutan milik `sekolah` sekaligus (satu UPDATE
+        untuk satu blok, misal seluruh batch pembayaran tunai) dan return list nomornya.
+        UPDATE mengunci baris counter sampai transaksi pemanggil selesai,
+        sehingga dua kasir tidak pernah mendapat nomor yang sama.
+        """
+        tahun = tahun or timezone.localdate().year
+        counter = cls.objects.filter(sekolah=sekolah, tahun=tahun)
+        with transaction.atomic():
+            if not counter.update(terakhir=models.F('terakhir') + jumlah):
+                # Pembayaran pertama tahun ini; get_or_create aman jika dua proses membuat bersamaan
+                cls.objects.get_or_create(sekolah=sekolah, tahun=tahun)
+                counter.update(terakhir=models.F('terakhir') + jumlah)
+            terakhir = counter.values_list('terakhir', flat=True).get()
+        return [cls.format(sekolah, tahun, n) for n in range(terakhir - jumlah + 1, terakhir + 1)]
+
 class Pembayaran(models.Model):
+    sekolah = models.ForeignKey(Sekolah, on_delete=models.PROTECT, db_index=False, editable=False)
     tagihan = models.ForeignKey(Tagihan, on_delete=models.SET_NULL, null=True, blank=True)
     tanggal_bayar = models.DateTimeField(auto_now_add=True)
     jumlah_bayar = models.DecimalField(max_digits=10, decimal_places=0)
@@ -74,15 +247,35 @@ class Pembayaran(models.Model):
     class Meta:
         verbose_name = "Pembayaran"
         verbose_name_plural = "Pembayaran"
+        indexes = [
+            models.Index(fields=['sekolah', 'tanggal_bayar'], name='pembayaran_sekolah_tgl_idx'),
+            # Pembayaran pertama per tagihan (subquery di riwayat dashboard)
+            models.Index(fields=['tagihan', 'tanggal_bayar', 'id'], name='pembayaran_tagihan_tgl_idx'),
+            # Pencarian awalan nomor kwitansi / ID transaksi (search._cocok_prefix)
+            models.Index(Upper('id_transaksi_gateway'), name='pembayaran_idtrx_upper_idx'),
+        ]
 
     def __str__(self):
         return f"Bayar {self.tagihan.judul if self.tagihan else 'Tanpa Tagihan'}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Simpan nilai awal untuk menghitung selisih di ledger (MutasiSaldo)
+        instance._awal = (instance.__dict__.get('tagihan_id'), instance.__dict__.get('jumlah_bayar'))
+        return instance
+
     def save(self, *args, **kwargs):
+        if self.sekolah_id is None and self.tagihan_id is not None:
+            self.sekolah_id = self.tagihan.sekolah_id
+
         if not self.id_transaksi_gateway:
-            random_code = uuid.uuid4().hex[:8].upper()
-            self.id_transaksi_gateway = f"MANUAL-{random_code}"
-        
+            # Nomor & baris pembayaran satu transaksi: jika INSERT gagal, nomornya tidak hilang
+            with transaction.atomic():
+                self.id_transaksi_gateway = NomorKwitansi.ambil(self.sekolah)[0]
+                super(Pembayaran, self).save(*args, **kwargs)
+            return
+
         super(Pembayaran, self).save(*args, **kwargs)
 
 class BuatTagihanMassal(models.Model):
@@ -93,6 +286,7 @@ class BuatTagihanMassal(models.Model):
         ('SEMUA', 'Semua Kelas'),
     ]
 
+    sekolah = models.ForeignKey(Sekolah, on_delete=models.PROTECT, editable=False)
     target_kelas = models.CharField(max_length=10, choices=KELAS_CHOICES)
     judul_tagihan = models.CharField(max_length=200, help_text="Contoh: SPP Bulan Agustus 2025")
     jumlah = models.DecimalField(max_digits=10, decimal_places=0)
@@ -108,32 +302,325 @@ class BuatTagihanMassal(models.Model):
     def __str__(self):
         return f"Batch: {self.judul_tagihan} ({self.target_kelas})"
     def save(self, *args, **kwargs):
-        super(BuatTagihanMassal, self).save(*args, **kwargs)
-        if self.target_kelas == 'SEMUA':
-            siswa_list = Siswa.objects.all()
-        else:
-            siswa_list = Siswa.objects.filter(kelas=self.target_kelas)
-        jumlah_dibuat = 0
-        for s in siswa_list:
-            cek_ada = Tagihan.objects.filter(
-                siswa=s, 
-                judul=self.judul_tagihan, 
-                bulan=self.bulan, 
-                tahun=self.tahun
-            ).exists()
+        mulai = time.perf_counter()
+        # Satu transaksi: invalidasi cache laporan dikumpulkan dan dikirim sekali setelah commit
+        with transaction.atomic():
+            super(BuatTagihanMassal, self).save(*args, **kwargs)
+            # Alumni (LULUS) tidak ditagih lagi walau target 'SEMUA'
+            siswa_list = Siswa.objects.filter(sekolah_id=self.sekolah_id).exclude(kelas='LULUS')
+            if self.target_kelas != 'SEMUA':
+                siswa_list = siswa_list.filter(kelas=self.target_kelas)
+            jumlah_dibuat = 0
+            for s in siswa_list:
+                cek_ada = Tagihan.objects.filter(
+                    siswa=s, 
+                    judul=self.judul_tagihan, 
+                    bulan=self.bulan, 
+                    tahun=self.tahun
+                ).exists()
             
-            if not cek_ada:
-                Tagihan.objects.create(
-                    siswa=s,
-                    judul=self.judul_tagihan,
-                    jumlah=self.jumlah,
-                    bulan=self.bulan,
-                    tahun=self.tahun,
-                    status='BELUM_LUNAS'
-                )
-                jumlah_dibuat += 1
+                if not cek_ada:
+                    Tagihan.objects.create(
+                        sekolah_id=self.sekolah_id,
+                        siswa=s,
+                        judul=self.judul_tagihan,
+                        jumlah=self.jumlah,
+                        bulan=self.bulan,
+                        tahun=self.tahun,
+                        status='BELUM_LUNAS'
+                    )
+                    jumlah_dibuat += 1
         
-        print(f"SUKSES: {jumlah_dibuat} tagihan berhasil dibuat untuk kelas {self.target_kelas}")
+        metrics.TAGIHAN_MASSAL_DIBUAT.inc(jumlah_dibuat)
+        metrics.TAGIHAN_MASSAL_DURASI.observe(time.perf_counter() - mulai)
+        catat('tagihan_massal', batch_id=self.id, sekolah=self.sekolah_id, kelas=self.target_kelas, judul=self.judul_tagihan,
+              jumlah_dibuat=jumlah_dibuat, durasi_ms=durasi_ms(mulai))
+
+def validasi_daftar_bulan(nilai):
+    try:
+        bulan = [int(b) for b in nilai.split(',') if b.strip()]
+    except ValueError:
+        raise ValidationError("Isi dengan nomor bulan dipisah koma, misal 7,8,9,10,11,12,1,2,3,4,5,6.")
+    if not bulan or any(b < 1 or b > 12 for b in bulan):
+        raise ValidationError("Nomor bulan harus antara 1 dan 12.")
+
+class JadwalTagihan(models.Model):
+    """
+    Kalender tagihan rutin: tagihan `nama` sebesar `jumlah` untuk siswa
+    `target_kelas` setiap bulan di `bulan_ditagih`, dibuat otomatis oleh
+    `manage.py buat_tagihan_terjadwal` (lihat penagihan.py) mulai tanggal `mulai`.
+    """
+    sekolah = models.ForeignKey(Sekolah, on_delete=models.PROTECT, editable=False)
+    nama = models.CharField(max_length=100, default='SPP', help_text="Judul tagihan menjadi '<nama> Bulan <bulan> <tahun>'")
+    target_kelas = models.CharField(max_length=10, choices=BuatTagihanMassal.KELAS_CHOICES)
+    jumlah = models.DecimalField(max_digits=10, decimal_places=0)
+    bulan_ditagih = models.CharField(
+        max_length=40, default='7,8,9,10,11,12,1,2,3,4,5,6', validators=[validasi_daftar_bulan],
+        help_text="Nomor bulan dalam tahun ajaran yang ditagih, dipisah koma",
+    )
+    tanggal_tagih = models.PositiveSmallIntegerField(
+        default=1, validators=[MinValueValidator(1), MaxValueValidator(28)],
+        help_text="Tagihan bulan tersebut dibuat mulai tanggal ini",
+    )
+    mulai = models.DateField(help_text="Bulan pertama yang ditagih (tanggalnya diabaikan)")
+    aktif = models.BooleanField(default=True)
+    # Periode terakhir yang tagihannya sudah dibuat untuk semua siswa; diisi oleh penjadwal
+    periode_terakhir = models.DateField(null=True, blank=True, editable=False)
+
+    class Meta:
+        verbose_name = "Jadwal Tagihan"
+        verbose_name_plural = "Jadwal Tagihan"
+
+    def __str__(self):
+        return f"{self.nama} kelas {self.get_target_kelas_display()} (Rp {self.jumlah:,})"
+
+    def daftar_bulan(self):
+        return {int(b) for b in self.bulan_ditagih.split(',') if b.strip()}
+
+class TutupTahun(models.Model):
+    """
+    Riwayat tutup tahun per sekolah (lihat tutup_tahun.py). Satu tahun hanya
+    bisa ditutup sekali, supaya siswa tidak naik kelas dua kali.
+    """
+    sekolah = models.ForeignKey(Sekolah, on_delete=models.PROTECT, editable=False)
+    tahun = models.IntegerField(help_text="Tahun ajaran yang ditutup: 2025 = Juli 2025 s/d Juni 2026")
+    tagihan_ditutup = models.PositiveIntegerField(default=0)
+    siswa_menunggak = models.PositiveIntegerField(default=0)
+    total_tunggakan = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    siswa_naik_kelas = models.PositiveIntegerField(default=0)
+    waktu = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Tutup Tahun"
+        verbose_name_plural = "Tutup Tahun"
+        constraints = [
+            models.UniqueConstraint(fields=['sekolah', 'tahun'], name='tutup_tahun_sekolah_tahun_unik'),
+        ]
+
+    def __str__(self):
+        return f"Tutup tahun {self.tahun}"
+
+class TagihanArsip(models.Model):
+    """
+    Tagihan LUNAS/DITUTUP dari tahun yang sudah ditutup (TutupTahun),
+    dipindahkan dari tabel Tagihan oleh perintah `arsipkan_tagihan` agar
+    tabel aktif tetap kecil.
+    ID sama dengan ID Tagihan aslinya.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    siswa = models.ForeignKey(Siswa, on_delete=models.CASCADE)
+    judul = models.CharField(max_length=200)
+    jumlah = models.DecimalField(max_digits=10, decimal_places=0)
+    jumlah_terbayar = models.DecimalField(max_digits=10, decimal_places=0, default=0)
+    bulan = models.CharField(max_length=20)
+    tahun = models.IntegerField(db_index=True)
+    status = models.CharField(max_length=20, choices=Tagihan.STATUS_CHOICES, default='LUNAS')
+    tanggal_dibuat = models.DateTimeField()
+    tanggal_diarsipkan = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Arsip Tagihan"
+        verbose_name_plural = "Arsip Tagihan"
+
+    def __str__(self):
+        return f"{self.judul} - {self.siswa.nama_lengkap}"
+
+    @property
+    def sisa_tagihan(self):
+        val_jumlah = self.jumlah or 0
+        val_terbayar = self.jumlah_terbayar or 0
+        return val_jumlah - val_terbayar
+
+class PembayaranArsip(models.Model):
+    """
+    Pembayaran milik TagihanArsip. ID sama dengan ID Pembayaran aslinya,
+    jadi URL kwitansi lama tetap berlaku.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    # related_name disamakan dengan Tagihan agar template kwitansi tetap jalan
+    tagihan = models.ForeignKey(TagihanArsip, on_delete=models.CASCADE, related_name='pembayaran_set')
+    tanggal_bayar = models.DateTimeField()
+    jumlah_bayar = models.DecimalField(max_digits=10, decimal_places=0)
+    id_transaksi_gateway = models.CharField(max_length=100, unique=True)
+    metode_pembayaran = models.CharField(max_length=50, default='MANUAL/CASH')
+
+    class Meta:
+        verbose_name = "Arsip Pembayaran"
+        verbose_name_plural = "Arsip Pembayaran"
+
+    def __str__(self):
+        return f"Bayar {self.tagihan.judul}"
+
+class MutasiSaldo(models.Model):
+    """
+    Ledger append-only: setiap perubahan saldo tunggakan dicatat sebagai
+    satu baris dan TIDAK pernah diubah/dihapus.
+    `jumlah` bertanda: positif = menambah tunggakan, negatif = mengurangi.
+    Jadi sisa tagihan = SUM(jumlah) per tagihan.
+    """
+    JENIS_CHOICES = [
+        ('TAGIHAN', 'Tagihan Baru'),
+        ('PEMBAYARAN', 'Pembayaran'),
+        ('PEMBATALAN', 'Pembatalan Pembayaran'),
+        ('PENYESUAIAN', 'Penyesuaian'),
+    ]
+
+    # PROTECT: ledger tidak boleh ikut terhapus bersama siswa (append-only)
+    siswa = models.ForeignKey(Siswa, on_delete=models.PROTECT)
+    # Bukan ForeignKey: baris ledger tetap utuh walau tagihan/pembayaran diarsipkan atau dihapus
+    tagihan_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    pembayaran_id = models.BigIntegerField(null=True, blank=True)
+    jenis = models.CharField(max_length=20, choices=JENIS_CHOICES)
+    jumlah = models.DecimalField(max_digits=12, decimal_places=0)
+    keterangan = models.CharField(max_length=200, blank=True)
+    waktu = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Mutasi Saldo"
+        verbose_name_plural = "Mutasi Saldo"
+        indexes = [
+            models.Index(fields=['siswa', 'waktu'], name='mutasi_siswa_waktu_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_jenis_display()} Rp {self.jumlah} - {self.siswa}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("MutasiSaldo bersifat append-only, catat penyesuaian baru sebagai gantinya.")
+        super(MutasiSaldo, self).save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("MutasiSaldo bersifat append-only dan tidak boleh dihapus.")
+
+class SnapshotSaldo(models.Model):
+    """
+    Saldo tunggakan seorang siswa yang sudah dijumlahkan sampai mutasi
+    dengan id `mutasi_terakhir`. Saldo di suatu waktu = snapshot + mutasi sesudahnya.
+    """
+    siswa = models.ForeignKey(Siswa, on_delete=models.CASCADE)
+    saldo = models.DecimalField(max_digits=12, decimal_places=0)
+    mutasi_terakhir = models.BigIntegerField()
+    waktu = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Snapshot Saldo"
+        verbose_name_plural = "Snapshot Saldo"
+        indexes = [
+            models.Index(fields=['siswa', 'waktu'], name='snapshot_siswa_waktu_idx'),
+        ]
+
+    def __str__(self):
+        return f"Saldo {self.siswa} per {self.waktu:%d-%m-%Y}: Rp {self.saldo}"
+
+class PengingatTerkirim(models.Model):
+    """
+    Catatan pengingat tunggakan yang sudah dikirim. Satu siswa hanya
+    dikirimi satu pengingat per `periode`, jadi menjalankan ulang
+    `kirim_pengingat` tidak mengirim dobel.
+    """
+    siswa = models.ForeignKey(Siswa, on_delete=models.CASCADE)
+    periode = models.CharField(max_length=20, help_text="Contoh: 2026-10")
+    tujuan = models.CharField(max_length=254)
+    total_tunggakan = models.DecimalField(max_digits=12, decimal_places=0)
+    jumlah_tagihan = models.IntegerField()
+    waktu_kirim = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Pengingat Terkirim"
+        verbose_name_plural = "Pengingat Terkirim"
+        constraints = [
+            models.UniqueConstraint(fields=['periode', 'siswa'], name='pengingat_unik_per_periode'),
+        ]
+
+    def __str__(self):
+        return f"Pengingat {self.periode} - {self.siswa}"
+
+# ----------------------------------------------------------------
+# --- PENCATATAN LEDGER (MutasiSaldo)
+# Receiver Pembayaran di sini HARUS terdaftar sebelum update_saldo_tagihan,
+# supaya mutasi pembayaran sudah tercatat saat tagihan disinkronkan.
+# ----------------------------------------------------------------
+@receiver(post_save, sender=Tagihan)
+def catat_mutasi_tagihan(sender, instance, created, **kwargs):
+    jumlah_awal, terbayar_awal = getattr(instance, '_awal', (None, None))
+    if created:
+        jumlah_awal, terbayar_awal = 0, 0
+        MutasiSaldo.objects.create(
+            siswa_id=instance.siswa_id, tagihan_id=instance.id,
+            jenis='TAGIHAN', jumlah=instance.jumlah, keterangan=instance.judul,
+        )
+    elif jumlah_awal is not None and instance.jumlah != jumlah_awal and instance.status != 'DITUTUP':
+        MutasiSaldo.objects.create(
+            siswa_id=instance.siswa_id, tagihan_id=instance.id,
+            jenis='PENYESUAIAN', jumlah=instance.jumlah - jumlah_awal, keterangan="Perubahan nominal tagihan",
+        )
+
+    if getattr(instance, '_sinkron_pembayaran', False):
+        # Disinkronkan dari total Pembayaran (mutasinya sudah tercatat). Sinkron ulang
+        # bisa membatalkan penyesuaian manual sebelumnya, jadi cocokkan dengan ledger.
+        saldo_ledger = MutasiSaldo.objects.filter(tagihan_id=instance.id).aggregate(
+            total=Sum('jumlah')
+        )['total'] or 0
+        selisih = instance.sisa_ditagih - saldo_ledger
+        if selisih:
+            MutasiSaldo.objects.create(
+                siswa_id=instance.siswa_id, tagihan_id=instance.id,
+                jenis='PENYESUAIAN', jumlah=selisih, keterangan="Sinkron ulang jumlah terbayar",
+            )
+    elif terbayar_awal is not None and instance.jumlah_terbayar != terbayar_awal and instance.status != 'DITUTUP':
+        # Diedit langsung (misal lewat list_editable admin)
+        MutasiSaldo.objects.create(
+            siswa_id=instance.siswa_id, tagihan_id=instance.id,
+            jenis='PENYESUAIAN', jumlah=terbayar_awal - instance.jumlah_terbayar,
+            keterangan="Perubahan jumlah terbayar manual",
+        )
+    instance._awal = (instance.jumlah, instance.jumlah_terbayar)
+    instance._sinkron_pembayaran = False
+
+@receiver(post_delete, sender=Tagihan)
+def catat_mutasi_hapus_tagihan(sender, instance, **kwargs):
+    # Tagihan yang diarsipkan sudah LUNAS/DITUTUP (saldo 0), jadi tidak tercatat di sini
+    if instance.sisa_ditagih:
+        MutasiSaldo.objects.create(
+            siswa_id=instance.siswa_id, tagihan_id=instance.id,
+            jenis='PENYESUAIAN', jumlah=-instance.sisa_ditagih, keterangan="Tagihan dihapus",
+        )
+
+@receiver(post_save, sender=Pembayaran)
+def catat_mutasi_pembayaran(sender, instance, created, **kwargs):
+    tagihan_awal, jumlah_awal = getattr(instance, '_awal', (None, None))
+    if created:
+        tagihan_awal = jumlah_awal = None
+
+    if tagihan_awal and tagihan_awal != instance.tagihan_id:
+        # Pembayaran dipindah ke tagihan lain: batalkan di tagihan lama
+        _catat_pembayaran(tagihan_awal, instance.id, 'PEMBATALAN', jumlah_awal, "Pembayaran dipindah")
+        jumlah_awal = None
+
+    if instance.tagihan_id:
+        if jumlah_awal is None:
+            _catat_pembayaran(instance.tagihan_id, instance.id, 'PEMBAYARAN', -instance.jumlah_bayar,
+                              instance.metode_pembayaran, siswa_id=instance.tagihan.siswa_id)
+        elif jumlah_awal != instance.jumlah_bayar:
+            _catat_pembayaran(instance.tagihan_id, instance.id, 'PENYESUAIAN', jumlah_awal - instance.jumlah_bayar,
+                              "Perubahan nominal pembayaran", siswa_id=instance.tagihan.siswa_id)
+    instance._awal = (instance.tagihan_id, instance.jumlah_bayar)
+
+@receiver(post_delete, sender=Pembayaran)
+def catat_mutasi_hapus_pembayaran(sender, instance, **kwargs):
+    if instance.tagihan_id:
+        _catat_pembayaran(instance.tagihan_id, instance.id, 'PEMBATALAN', instance.jumlah_bayar, "Pembayaran dihapus")
+
+def _catat_pembayaran(tagihan_id, pembayaran_id, jenis, jumlah, keterangan, siswa_id=None):
+    if siswa_id is None:
+        siswa_id = Tagihan.objects.filter(id=tagihan_id).values_list('siswa_id', flat=True).first()
+    if siswa_id is None:
+        return
+    MutasiSaldo.objects.create(
+        siswa_id=siswa_id, tagihan_id=tagihan_id, pembayaran_id=pembayaran_id,
+        jenis=jenis, jumlah=jumlah, keterangan=keterangan or '',
+    )
 
 @receiver(post_save, sender=Pembayaran)
 @receiver(post_delete, sender=Pembayaran)
@@ -142,9 +629,12 @@ def update_saldo_tagihan(sender, instance, **kwargs):
     tagihan = instance.tagihan
     
     if tagihan:
+        mulai = time.perf_counter()
         total_masuk = tagihan.pembayaran_set.aggregate(
             total=Sum('jumlah_bayar')
         )['total'] or 0
         tagihan.jumlah_terbayar = total_masuk
+        tagihan._sinkron_pembayaran = True  # lihat catat_mutasi_tagihan
         tagihan.save()
-        print(f"Saldo Tagihan diperbarui: Rp {total_masuk}")
\ No newline at end of file
+        catat('saldo_diperbarui', tagihan_id=tagihan.id, pembayaran_id=instance.id,
+              jumlah_terbayar=total_masuk, status=tagihan.status, durasi_ms=durasi_ms(mulai))
@@ -0,0 +1,133 @@
+# pembayaran/penagihan.py
+
+"""
+Penjadwal tagihan rutin (dipanggil `manage.py buat_tagihan_terjadwal` dari cron).
+Untuk setiap JadwalTagihan aktif, periode (bulan) yang sudah jatuh tempo tapi
+belum selesai dibuat berurutan dari yang tertua, jadi bulan yang terlewat
+karena server mati ikut dibuat pada run berikutnya.
+
+- Idempoten: siswa yang sudah punya tagihan periode itu (judul, bulan, tahun)
+  dilewati, dan periode yang selesai dicatat di JadwalTagihan.periode_terakhir.
+  Tagihan yang sengaja dihapus admin tidak dibuat ulang.
+- Terbatas: tagihan dibuat per batch dalam transaksi pendek (baris jadwal
+  dikunci agar dua run tidak membuat dobel), dan satu run berhenti setelah
+  `batas` tagihan; sisanya dilanjutkan run berikutnya.
+"""
+
+import datetime
+import time
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import metrics
+from .events import catat, durasi_ms
+from .ledger import catat_tagihan_baru
+from .models import JadwalTagihan, Siswa, Tagihan
+from .reports import BULAN, hapus_cache_kelas, hapus_cache_matriks
+from .tenancy import pakai_sekolah
+
+UKURAN_BATCH = 500
+BATAS_PER_RUN = 5000
+
+
+def _bulan_berikutnya(tanggal):
+    return datetime.date(tanggal.year + tanggal.month // 12, tanggal.month % 12 + 1, 1)
+
+
+def periode_jatuh_tempo(jadwal, hari_ini):
+    """Periode (tanggal 1 tiap bulan) yang sudah jatuh tempo tapi belum selesai, urut dari yang tertua."""
+    bulan = jadwal.daftar_bulan()
+    periode = jadwal.mulai.replace(day=1)
+    if jadwal.periode_terakhir and jadwal.periode_terakhir >= periode:
+        periode = _bulan_berikutnya(jadwal.periode_terakhir)
+    hasil = []
+    while periode.replace(day=jadwal.tanggal_tagih) <= hari_ini:
+        if periode.month in bulan:
+            hasil.append(periode)
+        periode = _bulan_berikutnya(periode)
+    return hasil
+
+
+def judul_tagihan(jadwal, periode):
+    return f"{jadwal.nama} Bulan {BULAN[periode.month - 1]} {periode.year}"
+
+
+def siswa_belum_ditagih(jadwal, periode):
+    siswa = Siswa.objects.filter(sekolah_id=jadwal.sekolah_id).exclude(kelas='LULUS')
+    if jadwal.target_kelas != 'SEMUA':
+        siswa = siswa.filter(kelas=jadwal.target_kelas)
+    sudah_ada = Tagihan.objects.filter(
+        siswa=OuterRef('pk'), judul=judul_tagihan(jadwal, periode),
+        bulan=BULAN[periode.month - 1], tahun=periode.year,
+    )
+    return siswa.exclude(Exists(sudah_ada))
+
+
+def _buat_batch(jadwal_id, periode, ukuran):
+    """Satu transaksi pendek. Return (jumlah tagihan dibuat, periode selesai?)."""
+    mulai = time.perf_counter()
+    with transaction.atomic():
+        jadwal = JadwalTagihan.objects.select_for_update().get(id=jadwal_id)
+        if jadwal.periode_terakhir and jadwal.periode_terakhir >= periode:
+            return 0, True  # sudah diselesaikan run lain
+
+        siswa = list(siswa_belum_ditagih(jadwal, periode).order_by('id').values_list('id', 'kelas')[:ukuran])
+        judul, bulan = judul_tagihan(jadwal, periode), BULAN[periode.month - 1]
+        baru = Tagihan.objects.bulk_create([
+            Tagihan(sekolah_id=jadwal.sekolah_id, siswa_id=siswa_id, judul=judul, jumlah=jadwal.jumlah,
+                    bulan=bulan, tahun=periode.year, status='BELUM_LUNAS')
+            for siswa_id, _kelas in siswa
+        ])
+        # bulk_create tidak memicu sinyal ledger & cache
+        catat_tagihan_baru(baru)
+
+        selesai = len(siswa) < ukuran
+        if selesai:
+            jadwal.periode_terakhir = periode
+            jadwal.save(update_fields=['periode_terakhir'])
+
+        if baru:
+            transaction.on_commit(lambda: hapus_cache_matriks(jadwal.sekolah_id, periode.year))
+            for kelas in {k for _, k in siswa}:
+                transaction.on_commit(lambda k=kelas: hapus_cache_kelas(jadwal.sekolah_id, k))
+
+    metrics.TAGIHAN_MASSAL_DIBUAT.inc(len(baru))
+    catat('tagihan_terjadwal', jadwal_id=jadwal_id, periode=periode.isoformat(), jumlah_dibuat=len(baru),
+          selesai=selesai, durasi_ms=durasi_ms(mulai))
+    return len(baru), selesai
+
+
+def jalankan(hari_ini=None, sekolah=None, batas=BATAS_PER_RUN, ukuran_batch=UKURAN_BATCH, dry_run=False):
+    """
+    Buat semua tagihan terjadwal yang jatuh tempo sampai `hari_ini`, maksimal
+    `batas` tagihan. Return dict: dibuat, periode (yang selesai), tuntas
+    (False jika berhenti karena batas dan masih ada sisa).
+    """
+    hari_ini = hari_ini or timezone.localdate()
+    hasil = {'dibuat': 0, 'periode': 0, 'tuntas': True}
+
+    jadwal_list = JadwalTagihan.objects.filter(aktif=True).select_related('sekolah').order_by('id')
+    if sekolah is not None:
+        jadwal_list = jadwal_list.filter(sekolah=sekolah)
+
+    for jadwal in jadwal_list:
+        # Kunci cache (laporan) diberi awalan sekolah aktif
+        with pakai_sekolah(jadwal.sekolah):
+            for periode in periode_jatuh_tempo(jadwal, hari_ini):
+                if dry_run:
+                    hasil['dibuat'] += siswa_belum_ditagih(jadwal, periode).count()
+                    hasil['periode'] += 1
+                    continue
+                while True:
+                    sisa = batas - hasil['dibuat']
+                    if sisa <= 0:
+                        hasil['tuntas'] = False
+                        return hasil
+                    jumlah, selesai = _buat_batch(jadwal.id, periode, min(ukuran_batch, sisa))
+                    hasil['dibuat'] += jumlah
+                    if selesai:
+                        hasil['periode'] += 1
+                        break
+    return hasil
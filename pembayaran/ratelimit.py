@@ -0,0 +1,80 @@
+# pembayaran/ratelimit.py
+
+"""
+Pembatas laju (rate limit) per alamat IP dengan counter di cache Django.
+Jendela tetap: kunci `rl:<nama>:<ip>:<nomor jendela>` dinaikkan dengan
+cache.incr (atomik) dan kedaluwarsa sendiri setelah jendela lewat.
+Request yang melebihi batas langsung dijawab 429 tanpa menyentuh database.
+
+Batas per endpoint diatur di settings.RATE_LIMIT: {nama: (jumlah, detik)}.
+Catatan: dengan LocMemCache counter dihitung per proses worker; pakai cache
+bersama (Redis/Memcached) jika butuh batas yang tepat untuk semua worker.
+"""
+
+import functools
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from . import metrics
+from .events import catat
+
+DITOLAK = metrics.Counter('spp_rate_limit_ditolak_total', "Jumlah request yang ditolak rate limit", label=('nama',))
+
+
+def alamat_klien(request):
+    # Entri X-Forwarded-For paling kiri dikirim klien sendiri (bisa dipalsukan
+    # untuk lolos dari batas). Yang bisa dipercaya hanya entri paling kanan,
+    # yang ditambahkan proxy kita (Render) = alamat yang terhubung ke proxy.
+    if settings.RATE_LIMIT_PERCAYA_PROXY:
+        diteruskan = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if diteruskan:
+            return diteruskan.split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def lewat_batas(nama, kunci, batas, jendela):
+    """
+    Naikkan counter `kunci` untuk endpoint `nama`.
+    Return 0 jika masih boleh, atau sisa detik sampai jendela berikutnya.
+    """
+    sekarang = time.time()
+    nomor = int(sekarang // jendela)
+    kunci_cache = f"rl:{nama}:{kunci}:{nomor}"
+    # add() hanya mengisi jika belum ada; incr() atomik di semua backend bawaan
+    cache.add(kunci_cache, 0, jendela + 1)
+    try:
+        jumlah = cache.incr(kunci_cache)
+    except ValueError:
+        # Kunci kedaluwarsa di antara add() dan incr()
+        cache.set(kunci_cache, 1, jendela + 1)
+        jumlah = 1
+    if jumlah <= batas:
+        return 0
+    return max(1, int((nomor + 1) * jendela - sekarang))
+
+
+def batasi(nama, metode=None):
+    """
+    Decorator view: batasi request per IP sesuai settings.RATE_LIMIT[nama].
+    `metode` (misal ('POST',)) = hanya hitung method tersebut.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            aturan = settings.RATE_LIMIT.get(nama)
+            if settings.RATE_LIMIT_AKTIF and aturan and (metode is None or request.method in metode):
+                batas, jendela = aturan
+                ip = alamat_klien(request)
+                tunggu = lewat_batas(nama, ip, batas, jendela)
+                if tunggu:
+                    DITOLAK.inc(nama=nama)
+                    catat('rate_limit', nama=nama, ip=ip, path=request.path)
+                    response = HttpResponse("Terlalu banyak request. Coba lagi nanti.", status=429)
+                    response['Retry-After'] = str(tunggu)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
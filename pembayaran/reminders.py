@@ -0,0 +1,125 @@
+# pembayaran/reminders.py
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Count, F, Q, Sum
+from django.template.loader import render_to_string
+
+from .events import catat
+from .models import PengingatTerkirim, Sekolah, Siswa, Tagihan
+
+STATUS_TIDAK_DITAGIH = Tagihan.STATUS_TIDAK_DITAGIH
+
+UKURAN_BATCH = 50
+JEDA_BATCH = 1.0  # detik, agar server email tidak dibanjiri
+
+
+def siswa_menunggak(periode, sekolah):
+    """
+    Satu query agregat: siswa `sekolah` yang masih punya tunggakan, total &
+    jumlah tagihannya, dan belum dikirimi pengingat pada `periode` ini.
+    """
+    belum_lunas = ~Q(tagihan__status__in=STATUS_TIDAK_DITAGIH)
+    return (
+        Siswa.objects.filter(sekolah=sekolah).annotate(
+            total_tunggakan=Sum(F('tagihan__jumlah') - F('tagihan__jumlah_terbayar'), filter=belum_lunas),
+            jumlah_tagihan=Count('tagihan', filter=belum_lunas),
+        )
+        .filter(total_tunggakan__gt=0)
+        .exclude(pengingatterkirim__periode=periode)
+        .select_related('user')
+        .order_by('id')
+    )
+
+
+def _buat_pesan(sekolah, siswa, daftar_tagihan):
+    context = {
+        'sekolah': sekolah,
+        'siswa': siswa,
+        'total_tunggakan': siswa.total_tunggakan,
+        'jumlah_tagihan': siswa.jumlah_tagihan,
+        'daftar_tagihan': daftar_tagihan,
+        'url_dashboard': f"https://{sekolah.domain}/",
+    }
+    subjek = render_to_string('pembayaran/email/pengingat_tunggakan_subjek.txt', context).strip()
+    isi = render_to_string('pembayaran/email/pengingat_tunggakan.txt', context)
+    return EmailMessage(subjek, isi, to=[siswa.user.email])
+
+
+def kirim_pengingat(periode, sekolah=None, backend=None, ukuran_batch=UKURAN_BATCH, jeda=JEDA_BATCH, dry_run=False,
+                    **opsi_backend):
+    """
+    Kirim pengingat per sekolah (default: semua sekolah), per batch lewat
+    satu koneksi email yang dipakai ulang. Nama sekolah & tautan dashboard di
+    email diambil dari Sekolah penerimanya.
+    `backend` = path email backend Django (default settings.PENGINGAT_EMAIL_BACKEND),
+    misal 'django.core.mail.backends.console.EmailBackend' untuk uji lokal.
+    `opsi_backend` diteruskan ke backend (misal file_path untuk filebased backend).
+    """
+    hasil = {'terkirim': 0, 'tanpa_email': 0, 'gagal': 0}
+    daftar_sekolah = [sekolah] if sekolah is not None else list(Sekolah.objects.order_by('id'))
+    if dry_run:
+        for sk in daftar_sekolah:
+            kandidat = siswa_menunggak(periode, sk)
+            hasil['terkirim'] += kandidat.exclude(user__email='').count()
+            hasil['tanpa_email'] += kandidat.filter(user__email='').count()
+        return hasil
+
+    backend = backend or getattr(settings, 'PENGINGAT_EMAIL_BACKEND', None)
+    with get_connection(backend, **opsi_backend) as koneksi:
+        for sk in daftar_sekolah:
+            _kirim_sekolah(koneksi, sk, periode, ukuran_batch, jeda, hasil)
+    return hasil
+
+
+def _kirim_sekolah(koneksi, sekolah, periode, ukuran_batch, jeda, hasil):
+    kandidat = siswa_menunggak(periode, sekolah)
+    id_terakhir = 0
+    while True:
+        batch = list(kandidat.filter(id__gt=id_terakhir)[:ukuran_batch])
+        if not batch:
+            break
+        id_terakhir = batch[-1].id
+
+        dengan_email = [s for s in batch if s.user.email]
+        hasil['tanpa_email'] += len(batch) - len(dengan_email)
+
+        # Rincian tagihan untuk seluruh batch dalam satu query
+        rincian = {}
+        for t in (
+            Tagihan.objects.filter(siswa__in=dengan_email)
+            .exclude(status__in=STATUS_TIDAK_DITAGIH)
+            .order_by('tanggal_dibuat')
+        ):
+            rincian.setdefault(t.siswa_id, []).append(t)
+
+        terkirim = []
+        for s in dengan_email:
+            try:
+                if koneksi.send_messages([_buat_pesan(sekolah, s, rincian.get(s.id, []))]):
+                    terkirim.append(s)
+                else:
+                    hasil['gagal'] += 1
+            except Exception as e:
+                hasil['gagal'] += 1
+                catat('pengingat_gagal', level=logging.WARNING, siswa_id=s.id, periode=periode, error=str(e))
+
+        PengingatTerkirim.objects.bulk_create(
+            [
+                PengingatTerkirim(
+                    siswa=s, periode=periode, tujuan=s.user.email,
+                    total_tunggakan=s.total_tunggakan, jumlah_tagihan=s.jumlah_tagihan,
+                )
+                for s in terkirim
+            ],
+            ignore_conflicts=True,
+        )
+        hasil['terkirim'] += len(terkirim)
+        catat('pengingat_batch', sekolah=sekolah.kode, periode=periode, terkirim=len(terkirim), id_terakhir=id_terakhir)
+
+        if len(batch) == ukuran_batch and jeda:
+            time.sleep(jeda)
+
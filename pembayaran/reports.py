@@ -0,0 +1,313 @@
+# pembayaran/reports.py
+
+import datetime
+import logging
+import secrets
+
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import metrics
+from .events import catat
+from .models import Pembayaran, Siswa, Tagihan
+
+CACHE_TIMEOUT_LAPORAN = 300  # detik
+CACHE_TIMEOUT_MATRIKS = 3600  # detik; dibuang lebih awal saat ada pembayaran
+# Juga dibuang saat ada pembayaran; batas waktu ini hanya untuk perubahan
+# anggota kelas (edit/impor siswa) yang tidak memicu invalidasi
+CACHE_TIMEOUT_KELAS = 600  # detik
+JUMLAH_PEMBAYARAN_TERAKHIR = 10
+
+BULAN = [
+    'Januari', 'Februari', 'Maret', 'April', 'Mei', 'Juni',
+    'Juli', 'Agustus', 'September', 'Oktober', 'November', 'Desember',
+]
+
+# (kunci, label, batas bawah hari, batas atas hari) berdasarkan umur tanggal_dibuat
+KELOMPOK_UMUR = [
+    ('umur_0_30', '0–30 hari', None, 30),
+    ('umur_31_60', '31–60 hari', 30, 60),
+    ('umur_61_90', '61–90 hari', 60, 90),
+    ('umur_90_plus', '> 90 hari', 90, None),
+]
+
+
+def _sisa():
+    return F('jumlah') - F('jumlah_terbayar')
+
+
+def _jumlah(filter_q=None):
+    # Coalesce agar kelompok kosong bernilai 0, bukan NULL
+    return Coalesce(
+        Sum(_sisa(), filter=filter_q),
+        Value(0),
+        output_field=DecimalField(max_digits=14, decimal_places=0),
+    )
+
+
+def _kolom_umur(sekarang):
+    kolom = {}
+    for kunci, _label, bawah, atas in KELOMPOK_UMUR:
+        q = Q()
+        if bawah is not None:
+            q &= Q(tanggal_dibuat__lt=sekarang - datetime.timedelta(days=bawah))
+        if atas is not None:
+            q &= Q(tanggal_dibuat__gte=sekarang - datetime.timedelta(days=atas))
+        kolom[kunci] = _jumlah(q)
+    kolom['total'] = _jumlah()
+    return kolom
+
+
+def _dari_cache(kunci, hitung, timeout=CACHE_TIMEOUT_LAPORAN):
+    hasil = cache.get(kunci)
+    metrics.catat_cache('laporan', hasil is not None)
+    if hasil is None:
+        hasil = hitung()
+        cache.set(kunci, hasil, timeout)
+    return hasil
+
+
+def umur_tunggakan_per_kelas(sekolah):
+    """
+    Tunggakan per kelas dikelompokkan berdasarkan umur, dihitung dalam SATU
+    query GROUP BY dengan SUM(... FILTER ...); tidak ada baris Tagihan yang dimuat ke Python.
+    """
+    def hitung():
+        return list(
+            Tagihan.objects.filter(sekolah=sekolah)
+            .exclude(status__in=Tagihan.STATUS_TIDAK_DITAGIH)
+            .values(kelas=F('siswa__kelas'))
+            .annotate(**_kolom_umur(timezone.now()))
+            .order_by('kelas')
+        )
+    return _dari_cache(f'laporan:umur_tunggakan:{sekolah.kode}:kelas', hitung)
+
+
+def umur_tunggakan_per_siswa(sekolah, kelas):
+    """Rincian satu kelas per siswa (drill-down), juga satu query agregat."""
+    def hitung():
+        return list(
+            Tagihan.objects.filter(sekolah=sekolah, siswa__kelas=kelas)
+            .exclude(status__in=Tagihan.STATUS_TIDAK_DITAGIH)
+            .values('siswa_id', nis=F('siswa__nis'), nama=F('siswa__nama_lengkap'))
+            .annotate(**_kolom_umur(timezone.now()))
+            .filter(total__gt=0)
+            .order_by('nama')
+        )
+    return _dari_cache(f'laporan:umur_tunggakan:{sekolah.kode}:siswa:{kelas}', hitung)
+
+
+def total_baris(baris):
+    """Jumlahkan kolom umur dari hasil per kelas/per siswa (baris grand total)."""
+    kunci = [k for k, *_ in KELOMPOK_UMUR] + ['total']
+    return {k: sum(b[k] for b in baris) for k in kunci}
+
+
+# ----------------------------------------------------------------
+# --- MATRIKS STATUS PEMBAYARAN (siswa x bulan)
+# ----------------------------------------------------------------
+def _status_sel(jumlah, terbayar):
+    if not jumlah:
+        return None  # tidak ada tagihan di bulan ini
+    if terbayar >= jumlah:
+        return 'LUNAS'
+    return 'CICILAN' if terbayar > 0 else 'BELUM'
+
+
+# Nomor versi cache disimpan di cache 'bersama' (database/Redis), bukan di cache
+# lokal per proses: invalidasi dari satu worker atau perintah cron harus
+# terlihat oleh semua worker. Datanya sendiri tetap di cache lokal, dengan
+# nomor versi sebagai bagian dari kuncinya.
+def _versi(kunci):
+    return caches['bersama'].get(kunci, 0)
+
+
+def _ganti_versi(kunci):
+    # Token acak, bukan incr(): incr DatabaseCache tidak atomik dan bisa
+    # kehilangan kenaikan; penulis terakhir selalu menghasilkan versi baru.
+    # Dipanggil setelah data ter-commit, jadi cache bersama yang mati (atau tabelnya
+    # belum dibuat) tidak boleh menggagalkan request: cukup tunggu timeout cache.
+    try:
+        caches['bersama'].set(kunci, secrets.token_hex(6), None)
+    except Exception as e:
+        catat('cache_versi_gagal', level=logging.WARNING, kunci=kunci, error=str(e))
+
+
+class _GantiVersiSetelahCommit:
+    """
+    Satu callback on_commit per transaksi yang mengganti semua versi yang
+    terkumpul. Kelas siswa yang belum dimuat dicari sekaligus saat commit
+    (satu query), bukan satu query per Tagihan.save.
+    """
+
+    def __init__(self):
+        self.kunci = set()
+        self.siswa = set()
+
+    def __call__(self):
+        kunci = set(self.kunci)
+        if self.siswa:
+            kelas = Siswa.objects.filter(id__in=self.siswa).values_list('sekolah_id', 'kelas').distinct()
+            kunci.update(_kunci_versi_kelas(sekolah_id, k) for sekolah_id, k in kelas)
+        for k in kunci:
+            _ganti_versi(k)
+
+
+def _versi_setelah_commit():
+    """
+    Kumpulan versi yang diganti setelah transaksi yang sedang berjalan commit,
+    atau None di luar transaksi. Satu transaksi = satu kumpulan, jadi
+    BuatTagihanMassal untuk 300 siswa menulis cache bersama sekali per kunci.
+    """
+    koneksi = transaction.get_connection()
+    if not koneksi.in_atomic_block:
+        return None
+    # Pakai callback yang didaftarkan di blok atomic ini (atau blok di dalamnya);
+    # callback hilang dari daftar jika savepoint-nya di-rollback
+    blok_ini = set(koneksi.savepoint_ids[-1:])
+    for sids, fungsi, _robust in koneksi.run_on_commit:
+        if isinstance(fungsi, _GantiVersiSetelahCommit) and blok_ini <= sids:
+            return fungsi
+    kumpulan = _GantiVersiSetelahCommit()
+    transaction.on_commit(kumpulan, robust=True)
+    return kumpulan
+
+
+def _kunci_versi_matriks(sekolah_id, tahun):
+    return f'laporan:matriks:versi:{sekolah_id}:{tahun}'
+
+
+def hapus_cache_matriks(sekolah_id, tahun):
+    """
+    Buang cache matriks semua kelas pada (sekolah, tahun) dengan mengganti
+    nomor versinya, jadi tidak perlu tahu kelas siswa yang membayar.
+    """
+    _ganti_versi(_kunci_versi_matriks(sekolah_id, tahun))
+
+
+def matriks_pembayaran(sekolah, kelas, tahun):
+    """
+    Status tagihan per siswa per bulan untuk satu kelas & tahun, dari SATU
+    query pivot: Siswa LEFT JOIN Tagihan, GROUP BY siswa, dengan dua
+    SUM(... FILTER bulan=...) per bulan. Nama bulan dicocokkan tanpa
+    peduli huruf besar/kecil. Tagihan KADALUARSA & DITUTUP tidak dihitung.
+    Return list dict {'id', 'nis', 'nama', 'status': [12 status]}.
+    """
+    def hitung():
+        kolom = {}
+        aktif = Q(tagihan__tahun=tahun) & ~Q(tagihan__status__in=('KADALUARSA', 'DITUTUP'))
+        for i, nama in enumerate(BULAN):
+            per_bulan = aktif & Q(tagihan__bulan__iexact=nama)
+            kolom[f'j{i}'] = Sum('tagihan__jumlah', filter=per_bulan)
+            kolom[f't{i}'] = Sum('tagihan__jumlah_terbayar', filter=per_bulan)
+
+        baris = (
+            Siswa.objects.filter(sekolah=sekolah, kelas=kelas)
+            .values('id', 'nis', nama=F('nama_lengkap'))
+            .annotate(**kolom)
+            .order_by('nama_lengkap', 'id')
+        )
+        return [
+            {
+                'id': b['id'], 'nis': b['nis'], 'nama': b['nama'],
+                'status': [_status_sel(b[f'j{i}'], b[f't{i}'] or 0) for i in range(len(BULAN))],
+            }
+            for b in baris
+        ]
+
+    versi = _versi(_kunci_versi_matriks(sekolah.id, tahun))
+    return _dari_cache(f'laporan:matriks:{sekolah.kode}:{kelas}:{tahun}:v{versi}', hitung, CACHE_TIMEOUT_MATRIKS)
+
+
+# ----------------------------------------------------------------
+# --- RINGKASAN PER KELAS (dashboard wali kelas)
+# ----------------------------------------------------------------
+def _kunci_versi_kelas(sekolah_id, kelas):
+    return f'laporan:kelas:versi:{sekolah_id}:{kelas}'
+
+
+def hapus_cache_kelas(sekolah_id, kelas):
+    """Buang ringkasan satu kelas (ganti nomor versinya)."""
+    _ganti_versi(_kunci_versi_kelas(sekolah_id, kelas))
+
+
+def ringkasan_kelas(sekolah, kelas, hari_ini=None):
+    """
+    Data dashboard wali kelas, semuanya agregat SQL (4 query saat cache kosong):
+    - tingkat penagihan tagihan bulan ini (nominal ditagih vs terbayar)
+    - siswa yang menunggak (total sisa, jumlah tagihan, tagihan tertua)
+    - pembayaran terakhir di kelas ini
+    Hasil di-cache per (sekolah, kelas) sampai ada perubahan Tagihan di kelas itu
+    (nomor versinya di cache bersama, jadi berlaku untuk semua worker).
+    """
+    hari_ini = hari_ini or timezone.localdate()
+    bulan = BULAN[hari_ini.month - 1]
+
+    def hitung():
+        bulan_ini = (
+            Tagihan.objects.filter(sekolah=sekolah, siswa__kelas=kelas, tahun=hari_ini.year, bulan__iexact=bulan)
+            .exclude(status__in=('KADALUARSA', 'DITUTUP'))
+            .aggregate(
+                ditagih=Coalesce(Sum('jumlah'), Value(0), output_field=DecimalField(max_digits=14, decimal_places=0)),
+                terbayar=Coalesce(Sum('jumlah_terbayar'), Value(0), output_field=DecimalField(max_digits=14, decimal_places=0)),
+                tagihan=Count('id'),
+                lunas=Count('id', filter=Q(status='LUNAS')),
+            )
+        )
+        ditagih = bulan_ini['ditagih']
+        bulan_ini['persen'] = round(bulan_ini['terbayar'] * 100 / ditagih, 1) if ditagih else None
+
+        menunggak = list(
+            Tagihan.objects.filter(sekolah=sekolah, siswa__kelas=kelas, jumlah__gt=F('jumlah_terbayar'))
+            .exclude(status__in=Tagihan.STATUS_TIDAK_DITAGIH)
+            .values('siswa_id', nis=F('siswa__nis'), nama=F('siswa__nama_lengkap'))
+            .annotate(total=_jumlah(), tagihan=Count('id'), tertua=Min('tanggal_dibuat'))
+            .order_by('-total', 'nama')
+        )
+        terakhir = list(
+            Pembayaran.objects.filter(sekolah=sekolah, tagihan__siswa__kelas=kelas)
+            .order_by('-tanggal_bayar', '-id')
+            .values('id', 'tanggal_bayar', 'jumlah_bayar', 'metode_pembayaran',
+                    judul=F('tagihan__judul'), nama=F('tagihan__siswa__nama_lengkap'))[:JUMLAH_PEMBAYARAN_TERAKHIR]
+        )
+        return {
+            'bulan': f"{bulan} {hari_ini.year}",
+            'jumlah_siswa': Siswa.objects.filter(sekolah=sekolah, kelas=kelas).count(),
+            'bulan_ini': bulan_ini,
+            'menunggak': menunggak,
+            'total_tunggakan': sum(b['total'] for b in menunggak),
+            'pembayaran_terakhir': terakhir,
+        }
+
+    versi = _versi(_kunci_versi_kelas(sekolah.id, kelas))
+    kunci = f'laporan:kelas:{sekolah.kode}:{kelas}:{hari_ini:%Y-%m}:v{versi}'
+    return _dari_cache(kunci, hitung, CACHE_TIMEOUT_KELAS)
+
+
+# Setiap pembayaran (webhook, admin, cicilan) berakhir dengan Tagihan.save()
+# lewat update_saldo_tagihan, jadi cukup dengarkan Tagihan. Jalur bulk
+# (cash.catat_pembayaran_tunai, tutup_tahun) memanggil hapus_cache_* sendiri.
+@receiver(post_save, sender=Tagihan)
+@receiver(post_delete, sender=Tagihan)
+def buang_cache_matriks(sender, instance, **kwargs):
+    # Setelah commit, agar request lain tidak sempat menyimpan ulang data lama
+    kumpulan = _versi_setelah_commit()
+    langsung = kumpulan is None
+    if langsung:
+        kumpulan = _GantiVersiSetelahCommit()
+
+    kumpulan.kunci.add(_kunci_versi_matriks(instance.sekolah_id, instance.tahun))
+    # Siswa biasanya sudah dimuat (update_saldo_tagihan, admin); jika belum, kelasnya dicari saat commit
+    siswa = instance._state.fields_cache.get('siswa')
+    if siswa is not None:
+        kumpulan.kunci.add(_kunci_versi_kelas(siswa.sekolah_id, siswa.kelas))
+    else:
+        kumpulan.siswa.add(instance.siswa_id)
+
+    if langsung:
+        kumpulan()
@@ -0,0 +1,140 @@
+# pembayaran/search.py
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Upper
+from django.db.models.lookups import GreaterThanOrEqual, LessThan
+from django.utils.text import smart_split, unescape_string_literal
+
+# Tabel FTS5 (khusus SQLite) yang menjadi "bayangan" tabel asli.
+# Format: nama tabel fts -> (tabel asli, kolom yang diindeks)
+FTS_SQLITE = {
+    'pembayaran_siswa_fts': ('pembayaran_siswa', 'nama_lengkap'),
+    'pembayaran_tagihan_fts': ('pembayaran_tagihan', 'judul'),
+}
+
+# Di PostgreSQL pencarian teks memakai index GIN trigram (migrasi 0009),
+# jadi cukup lookup `icontains` biasa.
+
+# Tokenizer trigram FTS5 butuh minimal 3 karakter per kata kunci
+PANJANG_MIN_TRIGRAM = 3
+
+
+def pasang_fts_sqlite(conn=None):
+    """
+    Buat tabel FTS5 + trigger sinkronisasi lalu isi ulang indeksnya.
+    Aman dipanggil berkali-kali (dipanggil setiap selesai migrate), karena
+    SQLite membuang trigger setiap kali Django membangun ulang tabel asli.
+    """
+    conn = conn or connection
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        for fts, (tabel, kolom) in FTS_SQLITE.items():
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"{kolom}, content='{tabel}', content_rowid='id', tokenize='trigram')"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabel} BEGIN "
+                f"INSERT INTO {fts}(rowid, {kolom}) VALUES (new.id, new.{kolom}); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabel} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {kolom}) VALUES ('delete', old.id, old.{kolom}); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {kolom} ON {tabel} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {kolom}) VALUES ('delete', old.id, old.{kolom}); "
+                f"INSERT INTO {fts}(rowid, {kolom}) VALUES (new.id, new.{kolom}); END"
+            )
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def _fts_aktif():
+    return connection.vendor == 'sqlite'
+
+
+def _cocok_teks(tabel_fts, field, kata):
+    """
+    Q untuk pencarian "mengandung kata" pada kolom teks.
+    - SQLite   : lewat tabel FTS5 trigram (MATCH), bukan LIKE '%..%'
+    - Postgres : icontains biasa, yang ditangani index GIN trigram
+    """
+    if _fts_aktif() and len(kata) >= PANJANG_MIN_TRIGRAM:
+        # Kutip sebagai frasa FTS5 agar karakter khusus tidak dianggap operator
+        frasa = '"%s"' % kata.replace('"', '""')
+        return Q(**{
+            'id__in': RawSQL(f"SELECT rowid FROM {tabel_fts} WHERE {tabel_fts} MATCH %s", [frasa])
+        })
+    return Q(**{f'{field}__icontains': kata})
+
+
+def _cocok_prefix(field, kata):
+    """
+    Pencarian awalan tanpa peduli huruf besar/kecil (NIS, ID transaksi;
+    "kw-2026" menemukan "KW-..."), sebagai rentang >= / < pada UPPER(kolom)
+    agar memakai index ekspresi UPPER(...) (Meta.indexes Siswa & Pembayaran)
+    di semua database.
+    """
+    kolom, kata = Upper(field), kata.upper()
+    return Q(GreaterThanOrEqual(kolom, kata), LessThan(kolom, kata + '\uffff'))
+
+
+def _pecah_kata(search_term):
+    # Sama dengan cara admin Django memecah kata kunci (mendukung "tanda kutip")
+    for bit in smart_split(search_term):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        if bit:
+            yield bit
+
+
+def _siswa_cocok(kata):
+    return _cocok_teks('pembayaran_siswa_fts', 'nama_lengkap', kata)
+
+
+def cari_siswa(queryset, search_term):
+    for kata in _pecah_kata(search_term):
+        queryset = queryset.filter(_siswa_cocok(kata) | _cocok_prefix('nis', kata))
+    return queryset
+
+
+def cari_tagihan(queryset, search_term):
+    from .models import Siswa
+
+    for kata in _pecah_kata(search_term):
+        siswa_ids = Siswa.objects.filter(_siswa_cocok(kata)).values('id')
+        queryset = queryset.filter(
+            _cocok_teks('pembayaran_tagihan_fts', 'judul', kata) | Q(siswa_id__in=siswa_ids)
+        )
+    return queryset
+
+
+def cari_pembayaran(queryset, search_term):
+    from .models import Tagihan
+
+    for kata in _pecah_kata(search_term):
+        tagihan_ids = Tagihan.objects.filter(
+            _cocok_teks('pembayaran_tagihan_fts', 'judul', kata)
+        ).values('id')
+        queryset = queryset.filter(
+            Q(tagihan_id__in=tagihan_ids) | _cocok_prefix('id_transaksi_gateway', kata)
+        )
+    return queryset
+
+
+class PencarianTerindeksMixin:
+    """
+    Mixin ModelAdmin: ganti pencarian `icontains` bawaan dengan fungsi
+    pencarian terindeks di atas. Atur `fungsi_pencarian` di tiap admin,
+    contoh: `fungsi_pencarian = staticmethod(cari_siswa)`.
+    """
+    fungsi_pencarian = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or self.fungsi_pencarian is None:
+            return super().get_search_results(request, queryset, search_term)
+        # Semua filter berupa subquery id, jadi tidak ada duplikasi baris
+        return self.fungsi_pencarian(queryset, search_term), False
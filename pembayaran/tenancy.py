@@ -0,0 +1,133 @@
+# pembayaran/tenancy.py
+
+"""
+Multi-sekolah dalam satu deployment. Sekolah aktif ditentukan dari host
+request oleh SekolahMiddleware lalu disimpan di:
+- request.sekolah             : untuk view dan admin
+- sekolah_aktif() (contextvar) : untuk kode yang tidak memegang request
+                                 (kunci cache, branding jazzmin)
+
+Modul ini dibaca oleh settings.py, jadi model hanya di-import di dalam fungsi.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import Http404
+
+_sekolah_aktif = contextvars.ContextVar('sekolah_aktif', default=None)
+
+CACHE_HOST_DETIK = 60
+_cache_host = {}  # host -> (Sekolah atau None, waktu_kadaluarsa), per proses
+
+
+def sekolah_aktif():
+    return _sekolah_aktif.get()
+
+
+@contextmanager
+def pakai_sekolah(sekolah):
+    """Jalankan blok kode sebagai `sekolah` (dipakai management command)."""
+    token = _sekolah_aktif.set(sekolah)
+    try:
+        yield sekolah
+    finally:
+        _sekolah_aktif.reset(token)
+
+
+def _normalisasi_host(host):
+    host = host.split(':')[0].lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def cari_sekolah(host):
+    """Sekolah untuk `host`, di-cache per proses agar tiap request tidak menambah query."""
+    from .models import Sekolah
+
+    host = _normalisasi_host(host)
+    sekarang = time.monotonic()
+    tersimpan = _cache_host.get(host)
+    if tersimpan and tersimpan[1] > sekarang:
+        return tersimpan[0]
+
+    sekolah = Sekolah.objects.filter(domain=host).first()
+    if sekolah is None and getattr(settings, 'SEKOLAH_DEFAULT', ''):
+        # Host tak dikenal (localhost, IP server, dsb.) jatuh ke sekolah default
+        sekolah = Sekolah.objects.filter(kode=settings.SEKOLAH_DEFAULT).first()
+    _cache_host[host] = (sekolah, sekarang + CACHE_HOST_DETIK)
+    return sekolah
+
+
+def sekolah_dari_kode(kode=None):
+    """Sekolah berdasarkan kode (default settings.SEKOLAH_DEFAULT), untuk management command."""
+    from .models import Sekolah
+
+    kode = kode or getattr(settings, 'SEKOLAH_DEFAULT', '')
+    try:
+        return Sekolah.objects.get(kode=kode)
+    except Sekolah.DoesNotExist:
+        raise ValueError(f"Sekolah dengan kode '{kode}' tidak ditemukan.")
+
+
+def boleh_kelola(user, sekolah):
+    """Superuser: semua sekolah. Staff lain: hanya sekolah yang menautkan akunnya (Sekolah.staff)."""
+    if not (user.is_active and user.is_staff):
+        return False
+    return user.is_superuser or sekolah.staff.filter(pk=user.pk).exists()
+
+
+def staff_sekolah(request):
+    """Apakah user request ini staff sekolah domain ini (dihitung sekali per request)."""
+    if not hasattr(request, '_staff_sekolah'):
+        request._staff_sekolah = boleh_kelola(request.user, request.sekolah)
+    return request._staff_sekolah
+
+
+def hapus_cache_host():
+    _cache_host.clear()
+
+
+class SekolahMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sekolah = cari_sekolah(request.get_host())
+        if sekolah is None:
+            raise Http404("Sekolah untuk domain ini belum terdaftar.")
+        request.sekolah = sekolah
+        token = _sekolah_aktif.set(sekolah)
+        try:
+            return self.get_response(request)
+        finally:
+            _sekolah_aktif.reset(token)
+
+
+def context_processor(request):
+    return {'sekolah': getattr(request, 'sekolah', None)}
+
+
+def buat_kunci_cache(key, key_prefix, version):
+    """KEY_FUNCTION di settings.CACHES: setiap kunci cache diberi awalan kode sekolah."""
+    sekolah = _sekolah_aktif.get()
+    return f"{key_prefix}:{version}:{sekolah.kode if sekolah else '-'}:{key}"
+
+
+class JazzminPerSekolah(dict):
+    """
+    settings.JAZZMIN_SETTINGS yang branding-nya mengikuti sekolah aktif.
+    Jazzmin membaca setting ini lewat .items() di setiap request.
+    """
+
+    def items(self):
+        isi = dict(super().items())
+        sekolah = _sekolah_aktif.get()
+        if sekolah is not None:
+            isi.update({
+                'site_title': f"SPP {sekolah.nama}",
+                'copyright': sekolah.nama,
+                'site_logo': sekolah.logo,
+            })
+        return isi.items()
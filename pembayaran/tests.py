@@ -1,3 +1,763 @@
-from django.test import TestCase
+# pembayaran/tests.py
 
-# Create your tests here.
+import datetime
+import json
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.core import mail
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache, caches
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import ProtectedError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import gateway, ledger, metrics, penagihan, reports, search, warmup
+from .archive import arsipkan
+from .cash import catat_pembayaran_tunai
+from .importer import impor_siswa, tautan_aktivasi
+from .reminders import kirim_pengingat
+from .models import BuatTagihanMassal, JadwalTagihan, MutasiSaldo, NomorKwitansi, Pembayaran, PembayaranArsip, Sekolah, Siswa, Tagihan, TagihanArsip, TutupTahun
+from .tenancy import hapus_cache_host, pakai_sekolah
+from .tutup_tahun import SudahDitutup, tahun_ajaran_terakhir, tutup_tahun
+
+
+# Event JSON (pembayaran.events) tidak perlu memenuhi output test
+logging.getLogger('pembayaran').setLevel(logging.ERROR)
+
+
+# Manifest staticfiles baru ada setelah collectstatic
+@override_settings(STORAGES={
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class DasarTest(TestCase):
+    """Sekolah default (dari migrasi 0014) + pembuat data kecil untuk semua test."""
+
+    def setUp(self):
+        cache.clear()
+        caches['bersama'].clear()
+        hapus_cache_host()
+        self.sekolah = Sekolah.objects.get(kode=settings.SEKOLAH_DEFAULT)
+
+    def buat_siswa(self, nis, kelas='7'):
+        user = User.objects.create_user(username=f"siswa-{nis}", password='rahasia-123')
+        return Siswa.objects.create(sekolah=self.sekolah, user=user, nis=nis, nama_lengkap=f"Siswa {nis}", kelas=kelas)
+
+    def login_siswa(self, siswa):
+        self.client.force_login(siswa.user)
+
+    def kirim_webhook(self, tagihan_id, gross_amount='150000.00', server_key='server-key-uji', palsukan=None):
+        """Notifikasi settlement Midtrans bertanda tangan (override MIDTRANS_SERVER_KEY='server-key-uji')."""
+        body = {
+            'order_id': f"SPP-{tagihan_id}-{uuid.uuid4()}", 'status_code': '200', 'gross_amount': gross_amount,
+            'transaction_status': 'settlement', 'transaction_id': str(uuid.uuid4()), 'payment_type': 'qris',
+        }
+        body['signature_key'] = gateway.signature_notifikasi(
+            body['order_id'], body['status_code'], body['gross_amount'], server_key,
+        )
+        body.update(palsukan or {})  # diubah SETELAH ditandatangani
+        return self.client.post('/webhook/midtrans/', json.dumps(body), content_type='application/json')
+
+    def buat_tagihan(self, siswa, jumlah=100000, bulan='Juli', tahun=2025, **kwargs):
+        return Tagihan.objects.create(sekolah=self.sekolah, siswa=siswa, judul=f"SPP {bulan} {tahun}",
+                                      jumlah=jumlah, bulan=bulan, tahun=tahun, **kwargs)
+
+
+class MetrikTest(SimpleTestCase):
+    def test_render_format_prometheus(self):
+        # Label unik per test: registry metrik global untuk seluruh proses
+        metrics.CACHE_TOTAL.inc(cache='uji-render', hasil='hit')
+        metrics.CACHE_TOTAL.inc(2, cache='uji-render', hasil='hit')
+        metrics.WEBHOOK_DURASI.observe(0.02, transaction_status='uji-render')
+        metrics.WEBHOOK_DURASI.observe(3.0, transaction_status='uji-render')
+
+        baris = metrics.render().splitlines()
+        self.assertIn('# TYPE spp_cache_total counter', baris)
+        self.assertIn('spp_cache_total{cache="uji-render",hasil="hit"} 3', baris)
+        self.assertIn('spp_webhook_midtrans_durasi_detik_bucket{transaction_status="uji-render",le="0.01"} 0', baris)
+        self.assertIn('spp_webhook_midtrans_durasi_detik_bucket{transaction_status="uji-render",le="0.025"} 1', baris)
+        self.assertIn('spp_webhook_midtrans_durasi_detik_bucket{transaction_status="uji-render",le="+Inf"} 2', baris)
+        self.assertIn('spp_webhook_midtrans_durasi_detik_count{transaction_status="uji-render"} 2', baris)
+        self.assertIn('spp_webhook_midtrans_durasi_detik_sum{transaction_status="uji-render"} 3.02', baris)
+
+    def test_jumlah_semua_worker_tidak_turun_saat_worker_berhenti(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        baris = 'spp_cache_total{cache="uji-multi",hasil="miss"} %d'
+
+        with override_settings(METRICS_MULTIPROC_DIR=folder):
+            # Worker lain (pid 999999) sudah menyimpan 5
+            with open(os.path.join(folder, '999999.json'), 'w') as f:
+                json.dump({'spp_cache_total': [[['uji-multi', 'miss'], 5]]}, f)
+            metrics.CACHE_TOTAL.inc(2, cache='uji-multi', hasil='miss')
+            self.assertIn(baris % 7, metrics.render().splitlines())
+
+            # Worker berhenti: nilainya pindah ke selesai.json, total tetap
+            metrics.tutup_proses(folder, 999999)
+            self.assertFalse(os.path.exists(os.path.join(folder, '999999.json')))
+            self.assertIn(baris % 7, metrics.render().splitlines())
+
+            # Master baru mulai: file lama dibuang
+            metrics.bersihkan_folder(folder)
+            self.assertEqual(os.listdir(folder), [])
+
+
+class ImporSiswaTest(DasarTest):
+    def test_akun_baru_tanpa_password_diaktifkan_lewat_tautan(self):
+        baris = [{'nis': '1001', 'nama_lengkap': 'Ahmad', 'kelas': '7', 'username': '', 'password': '', 'email': ''}]
+        hasil = impor_siswa(baris, self.sekolah)
+
+        self.assertEqual(hasil['dibuat'], 1)
+        user = User.objects.get(username='1001')
+        self.assertFalse(user.has_usable_password())
+        self.assertFalse(self.client.login(username='1001', password='1001'))
+
+        tautan = tautan_aktivasi(hasil['akun_baru'], 'http://testserver')[0]['tautan']
+        response = self.client.get(tautan, follow=True)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(response.redirect_chain[-1][0], {
+            'new_password1': 'Bismillah-2025!', 'new_password2': 'Bismillah-2025!',
+        })
+        self.assertRedirects(response, '/aktivasi/selesai/', fetch_redirect_response=False)
+        self.assertTrue(self.client.login(username='1001', password='Bismillah-2025!'))
+
+    def test_password_csv_diabaikan_untuk_impor_web(self):
+        baris = [{'nis': '1002', 'nama_lengkap': 'Budi', 'kelas': '8', 'username': '', 'password': 'ganti-saya', 'email': ''}]
+        hasil = impor_siswa(baris, self.sekolah, pakai_password_csv=False)
+        self.assertEqual(len(hasil['akun_baru']), 1)
+        self.assertFalse(User.objects.get(username='1002').has_usable_password())
+
+
+class PencarianTest(DasarTest):
+    def setUp(self):
+        super().setUp()
+        self.ahmad = self.buat_siswa('2024007')
+        Siswa.objects.filter(id=self.ahmad.id).update(nama_lengkap='Ahmad Fauzan')
+        self.budi = self.buat_siswa('2025001')
+        self.tagihan = self.buat_tagihan(self.ahmad, bulan='Agustus')
+        self.tunai = Pembayaran.objects.create(tagihan=self.tagihan, jumlah_bayar=10000)
+        self.midtrans = Pembayaran.objects.create(tagihan=self.buat_tagihan(self.budi), jumlah_bayar=10000,
+                                                  id_transaksi_gateway='a1b2c3-midtrans')
+
+    def cek_semua(self):
+        ids = lambda qs: sorted(qs.values_list('id', flat=True))
+        self.assertEqual(ids(search.cari_siswa(Siswa.objects.all(), 'fauz')), [self.ahmad.id])
+        self.assertEqual(ids(search.cari_siswa(Siswa.objects.all(), '2024')), [self.ahmad.id])
+        self.assertEqual(ids(search.cari_tagihan(Tagihan.objects.all(), 'agustus')), [self.tagihan.id])
+        self.assertEqual(ids(search.cari_tagihan(Tagihan.objects.all(), 'ahmad')), [self.tagihan.id])
+        # Nomor kwitansi & ID transaksi: awalan tanpa peduli huruf besar/kecil
+        kwitansi = self.tunai.id_transaksi_gateway
+        for kata in (kwitansi[:8].lower(), kwitansi.lower(), kwitansi):
+            self.assertEqual(ids(search.cari_pembayaran(Pembayaran.objects.all(), kata)), [self.tunai.id])
+        self.assertEqual(ids(search.cari_pembayaran(Pembayaran.objects.all(), 'A1B2')), [self.midtrans.id])
+        self.assertEqual(ids(search.cari_pembayaran(Pembayaran.objects.all(), 'midtrans')), [])
+
+    def test_sqlite_fts5(self):
+        self.assertTrue(search._fts_aktif())
+        self.cek_semua()
+
+    def test_tanpa_fts(self):
+        with mock.patch.object(search, '_fts_aktif', return_value=False):
+            self.cek_semua()
+
+
+class ArsipTest(DasarTest):
+    def setUp(self):
+        super().setUp()
+        self.siswa = self.buat_siswa('2001')
+        self.lunas = self.buat_tagihan(self.siswa, bulan='Juli', tahun=2023)
+        Pembayaran.objects.create(tagihan=self.lunas, jumlah_bayar=100000)
+        self.belum = self.buat_tagihan(self.siswa, bulan='Agustus', tahun=2023)
+
+    def test_belum_tutup_tahun_tidak_diarsipkan(self):
+        self.assertEqual(arsipkan(2023)['tagihan'], 0)
+        self.assertTrue(Tagihan.objects.filter(id=self.lunas.id).exists())
+
+    def test_ledger_tetap_cocok_dan_riwayat_tetap_tampil(self):
+        TutupTahun.objects.create(sekolah=self.sekolah, tahun=2023)
+        hasil = arsipkan(2023)
+
+        self.assertEqual(hasil, {'tagihan': 1, 'pembayaran': 1})
+        self.assertTrue(TagihanArsip.objects.filter(id=self.lunas.id).exists())
+        self.assertTrue(Tagihan.objects.filter(id=self.belum.id).exists())
+        self.assertEqual(list(ledger.verifikasi()), [])
+        self.assertEqual(ledger.saldo_pada(self.siswa), 100000)
+
+        self.login_siswa(self.siswa)
+        response = self.client.get('/')
+        self.assertEqual([t['id'] for t in response.context['tagihan_lunas']], [self.lunas.id])
+        kwitansi = PembayaranArsip.objects.get(tagihan_id=self.lunas.id)
+        self.assertContains(response, f"/kwitansi/{kwitansi.id}/")
+
+    def test_halaman_riwayat_berlanjut_dari_aktif_ke_arsip(self):
+        from .views import _riwayat_lunas
+
+        TutupTahun.objects.create(sekolah=self.sekolah, tahun=2023)
+        arsipkan(2023)
+        baru = self.buat_tagihan(self.siswa, bulan='Juli', tahun=2024)
+        Pembayaran.objects.create(tagihan=baru, jumlah_bayar=100000)
+
+        halaman1, berikutnya = _riwayat_lunas(self.siswa, jumlah=1)
+        self.assertEqual([t['id'] for t in halaman1], [baru.id])
+        halaman2, berikutnya = _riwayat_lunas(self.siswa, sebelum=berikutnya, jumlah=1)
+        self.assertEqual([t['id'] for t in halaman2], [self.lunas.id])
+        self.assertIsNone(berikutnya)
+
+
+class RiwayatLunasTest(DasarTest):
+    def setUp(self):
+        super().setUp()
+        self.siswa = self.buat_siswa('2101')
+        for tahun, bulan in [(2023, 'Juli'), (2023, 'Agustus'), (2023, 'September'), (2024, 'Juli'), (2024, 'Agustus')]:
+            tagihan = self.buat_tagihan(self.siswa, bulan=bulan, tahun=tahun)
+            Pembayaran.objects.create(tagihan=tagihan, jumlah_bayar=100000)
+        self.buat_tagihan(self.siswa, bulan='September', tahun=2024)  # belum lunas, tidak ikut riwayat
+        TutupTahun.objects.create(sekolah=self.sekolah, tahun=2023)
+        arsipkan(2023)
+        self.urutan = sorted(
+            list(Tagihan.objects.filter(status='LUNAS').values_list('id', flat=True))
+            + list(TagihanArsip.objects.values_list('id', flat=True)),
+            reverse=True,
+        )
+
+    def test_keyset_dengan_tanggal_kembar_di_aktif_dan_arsip(self):
+        from .views import _riwayat_lunas
+
+        # Semua tanggal sama: urutan hanya ditentukan id, melintasi tabel aktif dan arsip
+        kembar = timezone.now()
+        Tagihan.objects.update(tanggal_dibuat=kembar)
+        TagihanArsip.objects.update(tanggal_dibuat=kembar)
+
+        terlihat, berikutnya = [], None
+        while True:
+            halaman, berikutnya = _riwayat_lunas(self.siswa, sebelum=berikutnya, jumlah=2)
+            terlihat += [t['id'] for t in halaman]
+            if berikutnya is None:
+                break
+        self.assertEqual(TagihanArsip.objects.count(), 3)
+        self.assertEqual(terlihat, self.urutan)
+
+    def test_endpoint_melanjutkan_dari_tagihan_sebelum(self):
+        self.login_siswa(self.siswa)
+        response = self.client.get('/riwayat/', {'sebelum': self.urutan[1]})
+        self.assertEqual([t['id'] for t in response.context['tagihan_lunas']], self.urutan[2:])
+        self.assertIsNone(response.context['riwayat_berikutnya'])
+        self.assertEqual(self.client.get('/riwayat/').status_code, 400)
+
+
+class LedgerTest(DasarTest):
+    def test_siswa_dengan_ledger_tidak_bisa_dihapus(self):
+        siswa = self.buat_siswa('3001')
+        self.buat_tagihan(siswa)
+        with self.assertRaises(ProtectedError):
+            siswa.delete()
+
+    def test_snapshot_hanya_menjumlahkan_ekor(self):
+        siswa = self.buat_siswa('3002')
+        self.buat_tagihan(siswa, jumlah=100000)
+        self.assertEqual(ledger.buat_snapshot(), 1)
+        tagihan = self.buat_tagihan(siswa, jumlah=50000, bulan='Agustus')
+        Pembayaran.objects.create(tagihan=tagihan, jumlah_bayar=20000)
+
+        self.assertEqual(ledger.buat_snapshot(), 1)
+        self.assertEqual(ledger.buat_snapshot(), 0)
+        self.assertEqual(ledger.saldo_pada(siswa), 130000)
+
+
+class PengingatTest(DasarTest):
+    def test_pengingat_per_sekolah(self):
+        lain = Sekolah.objects.create(kode='smp-lain', nama='SMP Lain', domain='spp.smplain.sch.id')
+        a = self.buat_siswa('4001')
+        b = Siswa.objects.create(sekolah=lain, user=User.objects.create_user('siswa-4002', 'b@contoh.id'),
+                                 nis='4002', nama_lengkap='Siswa 4002', kelas='7')
+        a.user.email = 'a@contoh.id'
+        a.user.save()
+        self.buat_tagihan(a)
+        Tagihan.objects.create(sekolah=lain, siswa=b, judul='SPP Lain', jumlah=75000, bulan='Juli', tahun=2025)
+
+        self.assertEqual(kirim_pengingat('2025-07', jeda=0)['terkirim'], 2)
+        pesan = {m.to[0]: m for m in mail.outbox}
+        self.assertIn(f"Bagian Keuangan {self.sekolah.nama}", pesan['a@contoh.id'].body)
+        self.assertIn(f"https://{self.sekolah.domain}/", pesan['a@contoh.id'].body)
+        self.assertIn("Bagian Keuangan SMP Lain", pesan['b@contoh.id'].body)
+        self.assertIn("https://spp.smplain.sch.id/", pesan['b@contoh.id'].body)
+        self.assertNotIn("SPP Lain", pesan['a@contoh.id'].body)
+
+        self.assertEqual(kirim_pengingat('2025-07', sekolah=lain, jeda=0)['terkirim'], 0)
+
+    def test_email_teks_tidak_di_escape(self):
+        self.sekolah.nama = 'SMP "Al-Ikhlas" & Putri'
+        self.sekolah.save()
+        siswa = self.buat_siswa('4003')
+        siswa.nama_lengkap = "Ma'ruf Amin"
+        siswa.save()
+        siswa.user.email = 'c@contoh.id'
+        siswa.user.save()
+        self.buat_tagihan(siswa)
+
+        kirim_pengingat('2025-07', sekolah=self.sekolah, jeda=0)
+        [pesan] = mail.outbox
+        for teks in (pesan.subject, pesan.body):
+            self.assertIn("Ma'ruf Amin", teks)
+            self.assertIn('SMP "Al-Ikhlas" & Putri', teks)
+            self.assertNotIn('&#x27;', teks)
+            self.assertNotIn('&amp;', teks)
+
+
+class BayarTunaiTest(DasarTest):
+    def setUp(self):
+        super().setUp()
+        self.siswa = self.buat_siswa('5001')
+        self.tagihan = self.buat_tagihan(self.siswa, jumlah=100000)
+
+    def test_bayar_sebagian_lalu_lunas(self):
+        qs = Tagihan.objects.filter(id=self.tagihan.id)
+        [p1] = catat_pembayaran_tunai(qs, 30000)
+        self.tagihan.refresh_from_db()
+        self.assertEqual((p1.jumlah_bayar, self.tagihan.jumlah_terbayar, self.tagihan.status), (30000, 30000, 'BELUM_LUNAS'))
+
+        # Nominal melebihi sisa hanya membayar sisanya
+        [p2] = catat_pembayaran_tunai(qs, 500000)
+        self.tagihan.refresh_from_db()
+        self.assertEqual((p2.jumlah_bayar, self.tagihan.jumlah_terbayar, self.tagihan.status), (70000, 100000, 'LUNAS'))
+        self.assertEqual(catat_pembayaran_tunai(qs), [])
+
+        self.assertEqual(list(ledger.verifikasi()), [])
+        self.assertEqual(MutasiSaldo.objects.filter(tagihan_id=self.tagihan.id, jenis='PEMBAYARAN').count(), 2)
+        self.assertNotEqual(p1.id_transaksi_gateway, p2.id_transaksi_gateway)
+
+    def test_nominal_pecahan_ditolak(self):
+        for nominal in ('1.5', 'NaN', 0, -5):
+            with self.assertRaises(ValueError):
+                catat_pembayaran_tunai(Tagihan.objects.filter(id=self.tagihan.id), nominal)
+        self.assertFalse(Pembayaran.objects.exists())
+
+    def test_action_admin_memakai_form(self):
+        admin = User.objects.create_superuser('admin', 'admin@contoh.id', 'rahasia-123')
+        self.client.force_login(admin)
+        url = '/admin/pembayaran/tagihan/'
+        data = {'action': 'catat_bayar_tunai', '_selected_action': [self.tagihan.id]}
+
+        self.client.post(url, {**data, 'nominal': '2500.5'})
+        self.assertFalse(Pembayaran.objects.exists())
+
+        self.client.post(url, {**data, 'nominal': '25000'})
+        self.tagihan.refresh_from_db()
+        self.assertEqual(self.tagihan.jumlah_terbayar, 25000)
+
+    def test_action_butuh_izin_menambah_pembayaran(self):
+        staff = User.objects.create_user('staff-lihat', password='rahasia-123', is_staff=True)
+        staff.user_permissions.set(Permission.objects.filter(codename__in=('view_tagihan', 'change_tagihan')))
+        self.sekolah.staff.add(staff)
+        self.client.force_login(staff)
+        data = {'action': 'catat_bayar_tunai', '_selected_action': [self.tagihan.id], 'nominal': '25000'}
+
+        self.client.post('/admin/pembayaran/tagihan/', data)
+        self.assertFalse(Pembayaran.objects.exists())
+
+        staff.user_permissions.add(Permission.objects.get(codename='add_pembayaran'))
+        self.client.post('/admin/pembayaran/tagihan/', data)
+        self.assertEqual(Pembayaran.objects.get().jumlah_bayar, 25000)
+
+
+class CacheLaporanTest(DasarTest):
+    def setUp(self):
+        super().setUp()
+        self.siswa = self.buat_siswa('6001')
+        self.tagihan = self.buat_tagihan(self.siswa, jumlah=100000)
+
+    def test_pembayaran_membuang_ringkasan_kelas_dan_matriks(self):
+        self.assertEqual(reports.ringkasan_kelas(self.sekolah, '7')['total_tunggakan'], 100000)
+        self.assertEqual(reports.matriks_pembayaran(self.sekolah, '7', 2025)[0]['status'][6], 'BELUM')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Pembayaran.objects.create(tagihan=self.tagihan, jumlah_bayar=100000)
+
+        self.assertEqual(reports.ringkasan_kelas(self.sekolah, '7')['total_tunggakan'], 0)
+        self.assertEqual(reports.matriks_pembayaran(self.sekolah, '7', 2025)[0]['status'][6], 'LUNAS')
+
+    def test_invalidasi_dari_luar_request_terlihat_oleh_request(self):
+        # Perintah cron berjalan tanpa sekolah aktif, worker web dengan sekolah aktif
+        with pakai_sekolah(self.sekolah):
+            reports.ringkasan_kelas(self.sekolah, '7')
+            versi_lama = reports._versi(reports._kunci_versi_kelas(self.sekolah.id, '7'))
+        Tagihan.objects.filter(id=self.tagihan.id).update(jumlah_terbayar=100000, status='LUNAS')
+        reports.hapus_cache_kelas(self.sekolah.id, '7')
+
+        with pakai_sekolah(self.sekolah):
+            self.assertNotEqual(reports._versi(reports._kunci_versi_kelas(self.sekolah.id, '7')), versi_lama)
+            self.assertEqual(reports.ringkasan_kelas(self.sekolah, '7')['total_tunggakan'], 0)
+
+
+    def test_tagihan_massal_mengganti_versi_matriks_sekali(self):
+        for i in range(5):
+            self.buat_siswa(f"61{i:02d}")
+        with mock.patch.object(reports, '_ganti_versi', wraps=reports._ganti_versi) as ganti:
+            with self.captureOnCommitCallbacks(execute=True):
+                BuatTagihanMassal.objects.create(sekolah=self.sekolah, target_kelas='7', judul_tagihan='Infaq',
+                                                 jumlah=10000, bulan='Agustus', tahun=2025)
+        self.assertEqual(sorted(c.args[0] for c in ganti.call_args_list), [
+            reports._kunci_versi_kelas(self.sekolah.id, '7'), reports._kunci_versi_matriks(self.sekolah.id, 2025),
+        ])
+
+    def test_kelas_siswa_yang_belum_dimuat_dicari_sekali_saat_commit(self):
+        kelas_8 = [self.buat_siswa(f"62{i:02d}", kelas='8') for i in range(3)]
+        reports.ringkasan_kelas(self.sekolah, '8')
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                # siswa_id saja: instance tidak memegang objek Siswa
+                with self.assertNumQueries(len(kelas_8) * 2):  # INSERT tagihan + mutasi, tanpa query Siswa
+                    for s in kelas_8:
+                        Tagihan.objects.create(sekolah=self.sekolah, siswa_id=s.id, judul='SPP', jumlah=50000,
+                                               bulan='Juli', tahun=2025)
+        # Kelas semua siswa dicari dalam satu query, lalu dua penulisan versi (matriks & kelas 8)
+        with mock.patch.object(caches['bersama'], 'set') as tulis, self.assertNumQueries(1):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(sorted(c.args[0] for c in tulis.call_args_list), [
+            reports._kunci_versi_kelas(self.sekolah.id, '8'), reports._kunci_versi_matriks(self.sekolah.id, 2025),
+        ])
+        for c in tulis.call_args_list:
+            caches['bersama'].set(*c.args)
+        self.assertEqual(reports.ringkasan_kelas(self.sekolah, '8')['total_tunggakan'], 150000)
+
+    def test_cache_bersama_mati_tidak_menggagalkan_pembayaran(self):
+        with mock.patch.object(caches['bersama'], 'set', side_effect=ConnectionError("cache mati")):
+            with self.captureOnCommitCallbacks(execute=True):
+                Pembayaran.objects.create(tagihan=self.tagihan, jumlah_bayar=100000)
+        self.tagihan.refresh_from_db()
+        self.assertEqual(self.tagihan.status, 'LUNAS')
+
+
+class UmurTunggakanTest(DasarTest):
+    def test_batas_hari_30_60_90_masuk_kelompok_bawah(self):
+        sekarang = timezone.now()
+        siswa = self.buat_siswa('6301')
+        # umur (hari) -> jumlah; tiap batas diikuti satu hari sesudahnya
+        umur = {30: 1000, 31: 2000, 60: 4000, 61: 8000, 90: 16000, 91: 32000}
+        for i, (hari, jumlah) in enumerate(umur.items()):
+            t = self.buat_tagihan(siswa, jumlah=jumlah, bulan=f"Bulan {i}")
+            Tagihan.objects.filter(id=t.id).update(tanggal_dibuat=sekarang - datetime.timedelta(days=hari))
+
+        with mock.patch.object(reports.timezone, 'now', return_value=sekarang):
+            per_kelas = reports.umur_tunggakan_per_kelas(self.sekolah)
+            per_siswa = reports.umur_tunggakan_per_siswa(self.sekolah, '7')
+
+        harapan = {'umur_0_30': 1000, 'umur_31_60': 6000, 'umur_61_90': 24000, 'umur_90_plus': 32000, 'total': 63000}
+        self.assertEqual(len(per_kelas), 1)
+        self.assertEqual({k: per_kelas[0][k] for k in harapan}, harapan)
+        self.assertEqual({k: per_siswa[0][k] for k in harapan}, harapan)
+
+
+class KwitansiTest(DasarTest):
+    def setUp(self):
+        super().setUp()
+        self.pemilik = self.buat_siswa('7001')
+        self.lain = self.buat_siswa('7002')
+        tagihan = self.buat_tagihan(self.pemilik, jumlah=100000)
+        self.pembayaran = Pembayaran.objects.create(tagihan=tagihan, jumlah_bayar=40000)
+        self.url = f"/kwitansi/{self.pembayaran.id}/"
+
+    def test_pemilik_mendapat_304(self):
+        self.login_siswa(self.pemilik)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_bukan_pemilik_tidak_mendapat_304(self):
+        # If-None-Match: * / If-Modified-Since masa depan akan menjawab 304 untuk
+        # kwitansi yang ada, jadi harus ditolak sebelum syarat ETag dievaluasi
+        self.login_siswa(self.lain)
+        for header in ({'HTTP_IF_NONE_MATCH': '*'}, {'HTTP_IF_MODIFIED_SINCE': 'Fri, 01 Jan 2100 00:00:00 GMT'}):
+            response = self.client.get(self.url, **header)
+            self.assertEqual(response.status_code, 404)
+            self.assertFalse(response.has_header('ETag'))
+
+
+class AsetSekolahTest(DasarTest):
+    def test_folder_aset_tanpa_file_ditolak(self):
+        self.sekolah.folder_aset = 'pembayaran/tidak-ada'
+        with self.assertRaises(ValidationError):
+            self.sekolah.full_clean()
+
+    def test_folder_di_luar_manifest_memakai_kop_default(self):
+        siswa = self.buat_siswa('7101')
+        pembayaran = Pembayaran.objects.create(tagihan=self.buat_tagihan(siswa), jumlah_bayar=100000)
+        Sekolah.objects.filter(id=self.sekolah.id).update(folder_aset='pembayaran/sekolah-baru')
+        hapus_cache_host()
+
+        url_asli = staticfiles_storage.url
+
+        def url_manifest(path):
+            # Seperti ManifestStaticFilesStorage untuk folder yang belum di-collectstatic
+            if path.startswith('pembayaran/sekolah-baru/'):
+                raise ValueError(f"Missing staticfiles manifest entry for '{path}'")
+            return url_asli(path)
+
+        self.login_siswa(siswa)
+        with mock.patch.object(staticfiles_storage, 'url', side_effect=url_manifest):
+            response = self.client.get(f"/kwitansi/{pembayaran.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/static/pembayaran/images/kop.jpg')
+
+
+@override_settings(MIDTRANS_SERVER_KEY='server-key-uji')
+class WebhookTest(DasarTest):
+    def setUp(self):
+        super().setUp()
+        self.tagihan = self.buat_tagihan(self.buat_siswa('8001'), jumlah=150000)
+
+    def kirim(self, **kwargs):
+        return self.kirim_webhook(self.tagihan.id, **kwargs)
+
+    def test_signature_salah_ditolak(self):
+        self.assertEqual(self.kirim(server_key='kunci-palsu').status_code, 403)
+        # Nominal diubah setelah ditandatangani
+        self.assertEqual(self.kirim(palsukan={'gross_amount': '1.00'}).status_code, 403)
+        self.assertFalse(Pembayaran.objects.exists())
+
+    def test_signature_benar_mencatat_pembayaran(self):
+        self.assertEqual(self.kirim().status_code, 200)
+        self.tagihan.refresh_from_db()
+        self.assertEqual(self.tagihan.status, 'LUNAS')
+
+    def test_tagihan_sekolah_lain_dicatat_lewat_host_default(self):
+        # Satu URL notifikasi Midtrans untuk semua sekolah
+        lain = Sekolah.objects.create(kode='smp-lain', nama='SMP Lain', domain='spp.smplain.sch.id')
+        siswa = Siswa.objects.create(sekolah=lain, user=User.objects.create_user('siswa-8002'),
+                                     nis='8002', nama_lengkap='Siswa 8002', kelas='7')
+        tagihan = Tagihan.objects.create(sekolah=lain, siswa=siswa, judul='SPP Juli', jumlah=150000,
+                                         bulan='Juli', tahun=2025)
+
+        self.assertEqual(self.kirim_webhook(tagihan.id).status_code, 200)
+        tagihan.refresh_from_db()
+        self.assertEqual(tagihan.status, 'LUNAS')
+        self.assertEqual(Pembayaran.objects.get(tagihan=tagihan).sekolah, lain)
+
+
+@override_settings(RATE_LIMIT_AKTIF=True, RATE_LIMIT={'login': (2, 3600)})
+class RateLimitTest(DasarTest):
+    def coba_login(self, **meta):
+        return self.client.post('/login/', {'username': 'x', 'password': 'y'}, **meta).status_code
+
+    def test_x_forwarded_for_diabaikan_tanpa_proxy(self):
+        kode = [self.coba_login(HTTP_X_FORWARDED_FOR=f"10.0.0.{i}") for i in range(3)]
+        self.assertEqual(kode[-1], 429)
+
+    @override_settings(RATE_LIMIT_PERCAYA_PROXY=True)
+    def test_hanya_hop_terakhir_yang_dipercaya(self):
+        # Klien memalsukan entri paling kiri; proxy menambahkan IP aslinya di kanan
+        kode = [self.coba_login(HTTP_X_FORWARDED_FOR=f"10.0.0.{i}, 203.0.113.7") for i in range(3)]
+        self.assertEqual(kode[-1], 429)
+        self.assertEqual(self.coba_login(HTTP_X_FORWARDED_FOR="10.0.0.1, 203.0.113.8"), 200)
+
+
+class PemanasanTest(DasarTest):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(warmup, '_sudah_hangat', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pemanasan_penuh_sekali_lalu_hanya_cek_database(self):
+        response = self.client.get('/sehat/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'status', 'database_ms', 'urlconf_ms', 'template_ms', 'gateway_ms'})
+
+        with mock.patch.object(warmup, 'get_template') as template:
+            response = self.client.get('/sehat/')
+        self.assertEqual(set(response.json()), {'status', 'database_ms'})
+        template.assert_not_called()
+
+    def test_database_mati_503_dan_pemanasan_diulang(self):
+        with mock.patch.object(warmup, 'cek_database', side_effect=ConnectionError("db mati")):
+            response = self.client.get('/sehat/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'status': 'error'})
+        self.assertIn('template_ms', self.client.get('/sehat/').json())
+
+
+class StaffSekolahTest(DasarTest):
+    def setUp(self):
+        super().setUp()
+        self.lain = Sekolah.objects.create(kode='smp-lain', nama='SMP Lain', domain='spp.smplain.sch.id')
+        tagihan = self.buat_tagihan(self.buat_siswa('12001'))
+        self.pembayaran = Pembayaran.objects.create(tagihan=tagihan, jumlah_bayar=100000)
+
+    def buat_staff(self, username, sekolah):
+        user = User.objects.create_user(username, password='rahasia-123', is_staff=True)
+        user.user_permissions.set(Permission.objects.filter(codename__in=('view_tagihan', 'change_tagihan')))
+        sekolah.staff.add(user)
+        return user
+
+    def buka_semua(self):
+        return [
+            self.client.get('/admin/pembayaran/tagihan/').status_code,
+            self.client.get(f"/kwitansi/{self.pembayaran.id}/").status_code,
+            self.client.get('/wali-kelas/?kelas=7').status_code,
+        ]
+
+    def test_staff_sekolah_ini_boleh(self):
+        self.client.force_login(self.buat_staff('staff-a', self.sekolah))
+        self.assertEqual(self.buka_semua(), [200, 200, 200])
+
+    def test_staff_sekolah_lain_ditolak(self):
+        # Login di host sekolah ini (testserver -> sekolah default) dengan akun staff sekolah lain
+        self.client.force_login(self.buat_staff('staff-b', self.lain))
+        self.assertEqual(self.buka_semua(), [403, 404, 404])
+
+
+class NomorKwitansiTest(DasarTest):
+    def test_nomor_berurutan_tanpa_celah_setelah_rollback(self):
+        siswa = self.buat_siswa('9001')
+        tagihan = [self.buat_tagihan(siswa, jumlah=100000, bulan=b) for b in ('Juli', 'Agustus', 'September')]
+        tahun = timezone.localdate().year
+
+        p1 = Pembayaran.objects.create(tagihan=tagihan[0], jumlah_bayar=10000)
+        try:
+            with transaction.atomic():
+                Pembayaran.objects.create(tagihan=tagihan[0], jumlah_bayar=10000)
+                catat_pembayaran_tunai(Tagihan.objects.filter(id__in=[t.id for t in tagihan]))
+                raise RuntimeError("kasir membatalkan")
+        except RuntimeError:
+            pass
+        self.assertEqual(NomorKwitansi.objects.get(sekolah=self.sekolah, tahun=tahun).terakhir, 1)
+
+        batch = catat_pembayaran_tunai(Tagihan.objects.filter(id__in=[t.id for t in tagihan]))
+        p_akhir = Pembayaran.objects.create(tagihan=self.buat_tagihan(siswa, bulan='Oktober'), jumlah_bayar=10000)
+
+        nomor = [p.id_transaksi_gateway for p in (p1, *batch, p_akhir)]
+        self.assertEqual(nomor, [NomorKwitansi.format(self.sekolah, tahun, n) for n in range(1, 6)])
+
+    def test_urutan_terpisah_per_sekolah(self):
+        lain = Sekolah.objects.create(kode='smp-lain', nama='SMP Lain', domain='spp.smplain.sch.id')
+        siswa_lain = Siswa.objects.create(sekolah=lain, user=User.objects.create_user('siswa-9004'),
+                                          nis='9004', nama_lengkap='Siswa 9004', kelas='7')
+        siswa = self.buat_siswa('9003')
+        tahun = timezone.localdate().year
+
+        nomor = {self.sekolah.id: [], lain.id: []}
+        for i, bulan in enumerate(('Juli', 'Agustus', 'September')):
+            # Sekolah bergantian: nomor satu sekolah tidak boleh melompati nomor sekolah lain
+            for s in (siswa, siswa_lain):
+                tagihan = Tagihan.objects.create(sekolah=s.sekolah, siswa=s, judul=f"SPP {bulan}",
+                                                 jumlah=100000, bulan=bulan, tahun=2025)
+                if i == 2:
+                    [p] = catat_pembayaran_tunai(Tagihan.objects.filter(id=tagihan.id))
+                else:
+                    p = Pembayaran.objects.create(tagihan=tagihan, jumlah_bayar=10000)
+                nomor[s.sekolah_id].append(p.id_transaksi_gateway)
+
+        for sekolah in (self.sekolah, lain):
+            self.assertEqual(nomor[sekolah.id], [NomorKwitansi.format(sekolah, tahun, n) for n in range(1, 4)])
+
+    def test_pembayaran_gateway_tidak_memakai_nomor(self):
+        tagihan = self.buat_tagihan(self.buat_siswa('9002'))
+        Pembayaran.objects.create(tagihan=tagihan, jumlah_bayar=1000, id_transaksi_gateway='midtrans-123')
+        self.assertFalse(NomorKwitansi.objects.exists())
+
+
+@override_settings(MIDTRANS_SERVER_KEY='server-key-uji')
+class TutupTahunTest(DasarTest):
+    def setUp(self):
+        super().setUp()
+        self.a = self.buat_siswa('10001', kelas='7')
+        self.b = self.buat_siswa('10002', kelas='9')
+        self.juli = self.buat_tagihan(self.a, jumlah=100000, bulan='Juli', tahun=2024)
+        Pembayaran.objects.create(tagihan=self.juli, jumlah_bayar=40000)
+        self.maret = self.buat_tagihan(self.a, jumlah=100000, bulan='Maret', tahun=2025)
+        # Tahun ajaran berikutnya: tidak ikut ditutup
+        self.juli_baru = self.buat_tagihan(self.a, jumlah=100000, bulan='Juli', tahun=2025)
+        lunas = self.buat_tagihan(self.b, jumlah=100000, bulan='Agustus', tahun=2024)
+        Pembayaran.objects.create(tagihan=lunas, jumlah_bayar=100000)
+
+    def test_tunggakan_dipindah_per_tahun_ajaran(self):
+        saldo_awal = ledger.saldo_pada(self.a)
+        hasil = tutup_tahun(self.sekolah, 2024)
+
+        self.assertEqual((hasil['tagihan_ditutup'], hasil['siswa_menunggak'], hasil['total_tunggakan']), (2, 1, 160000))
+        tunggakan = Tagihan.objects.get(siswa=self.a, bulan='Tunggakan')
+        self.assertEqual((tunggakan.jumlah, tunggakan.tahun, tunggakan.status), (160000, 2025, 'BELUM_LUNAS'))
+        for t in (self.juli, self.maret):
+            t.refresh_from_db()
+            self.assertEqual((t.jumlah, t.status, t.dipindah_ke_id), (100000, 'DITUTUP', tunggakan.id))
+        self.juli_baru.refresh_from_db()
+        self.assertEqual(self.juli_baru.status, 'BELUM_LUNAS')
+
+        self.assertEqual(list(ledger.verifikasi()), [])
+        self.assertEqual(ledger.saldo_pada(self.a), saldo_awal)
+        self.assertEqual(TutupTahun.objects.get(sekolah=self.sekolah, tahun=2024).total_tunggakan, 160000)
+        self.assertEqual(set(Siswa.objects.values_list('nis', 'kelas')), {('10001', '8'), ('10002', 'LULUS')})
+        with self.assertRaises(SudahDitutup):
+            tutup_tahun(self.sekolah, 2024)
+
+    def test_dry_run_sama_dengan_hasil(self):
+        self.assertEqual(tutup_tahun(self.sekolah, 2024, dry_run=True), tutup_tahun(self.sekolah, 2024))
+
+    def test_webhook_terlambat_masuk_ke_tagihan_tunggakan(self):
+        tutup_tahun(self.sekolah, 2024)
+        self.assertEqual(self.kirim_webhook(self.maret.id, gross_amount='100000.00').status_code, 200)
+
+        tunggakan = Tagihan.objects.get(siswa=self.a, bulan='Tunggakan')
+        self.assertEqual(tunggakan.jumlah_terbayar, 100000)
+        self.maret.refresh_from_db()
+        self.assertEqual((self.maret.jumlah_terbayar, self.maret.status), (0, 'DITUTUP'))
+        self.assertEqual(list(ledger.verifikasi()), [])
+
+    def test_tagihan_massal_melewati_alumni(self):
+        tutup_tahun(self.sekolah, 2024)
+        BuatTagihanMassal.objects.create(sekolah=self.sekolah, target_kelas='SEMUA', judul_tagihan='Infaq',
+                                         jumlah=10000, bulan='Agustus', tahun=2025)
+        self.assertEqual(list(Tagihan.objects.filter(judul='Infaq').values_list('siswa__nis', flat=True)), ['10001'])
+
+    def test_tahun_ajaran_default(self):
+        self.assertEqual(tahun_ajaran_terakhir(datetime.date(2026, 7, 1)), 2025)
+        self.assertEqual(tahun_ajaran_terakhir(datetime.date(2026, 6, 30)), 2024)
+
+
+class TagihanTerjadwalTest(DasarTest):
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            self.buat_siswa(f"11{i:03d}", kelas='7')
+        self.buat_siswa('11999', kelas='LULUS')
+        self.jadwal = JadwalTagihan.objects.create(
+            sekolah=self.sekolah, nama='SPP', target_kelas='SEMUA', jumlah=150000,
+            bulan_ditagih='7,8,9,10,11,12,1,2,3,4,5,6', tanggal_tagih=1, mulai=datetime.date(2025, 7, 1),
+        )
+
+    def test_idempoten_dan_menyusul_bulan_terlewat(self):
+        hari_ini = datetime.date(2025, 9, 15)
+        hasil = penagihan.jalankan(hari_ini)
+        self.assertEqual((hasil['dibuat'], hasil['periode'], hasil['tuntas']), (15, 3, True))
+
+        self.assertEqual(penagihan.jalankan(hari_ini)['dibuat'], 0)
+        # Tagihan yang sengaja dihapus admin tidak dibuat ulang
+        Tagihan.objects.filter(bulan='Agustus').first().delete()
+        self.assertEqual(penagihan.jalankan(hari_ini)['dibuat'], 0)
+
+        self.assertEqual(Tagihan.objects.count(), 14)
+        self.assertFalse(Tagihan.objects.filter(siswa__kelas='LULUS').exists())
+        self.assertEqual(list(ledger.verifikasi()), [])
+
+    def test_batas_per_run_dilanjutkan_run_berikutnya(self):
+        hari_ini = datetime.date(2025, 8, 1)
+        hasil = penagihan.jalankan(hari_ini, batas=3, ukuran_batch=2)
+        self.assertEqual((hasil['dibuat'], hasil['tuntas']), (3, False))
+
+        hasil = penagihan.jalankan(hari_ini, batas=100, ukuran_batch=2)
+        self.assertEqual((hasil['dibuat'], hasil['tuntas']), (7, True))
+        self.assertEqual(penagihan.jalankan(hari_ini)['dibuat'], 0)
+        self.assertEqual(
+            Tagihan.objects.values('siswa', 'bulan').distinct().count(), Tagihan.objects.count(),
+        )
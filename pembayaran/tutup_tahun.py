@@ -0,0 +1,145 @@
+# pembayaran/tutup_tahun.py
+
+"""
+Tutup tahun ajaran `tahun` (Juli `tahun` s/d Juni `tahun`+1): dalam SATU
+transaksi dan beberapa query set-based
+- sisa semua tagihan sampai akhir tahun ajaran itu dijumlahkan per siswa
+  menjadi satu tagihan baru "Tunggakan tahun ajaran ..." di tahun berikutnya
+- tagihan lama ditutup: nominal & pembayarannya tetap (untuk riwayat),
+  statusnya DITUTUP dan `dipindah_ke` menunjuk tagihan tunggakannya.
+  Saldonya di ledger menjadi 0, jadi tunggakan tidak terhitung dua kali,
+  dan webhook yang datang terlambat diteruskan ke tagihan tunggakan.
+- kelas siswa dinaikkan (7 -> 8 -> 9 -> LULUS)
+Tagihan baru dibuat dengan bulk_create dan tagihan lama diubah dengan
+UPDATE, jadi mutasi ledger ditulis eksplisit (sinyal tidak terpicu).
+"""
+
+import time
+
+from django.db import transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, Value, When
+
+from .events import catat, durasi_ms
+from .ledger import UKURAN_BATCH, catat_tagihan_baru
+from .models import MutasiSaldo, Siswa, Tagihan, TutupTahun
+from .reports import BULAN, hapus_cache_kelas, hapus_cache_matriks
+
+KENAIKAN_KELAS = {'7': '8', '8': '9', '9': 'LULUS'}
+BULAN_TUNGGAKAN = 'Tunggakan'
+
+
+class SudahDitutup(Exception):
+    pass
+
+
+def tahun_ajaran_terakhir(hari_ini):
+    """Tahun ajaran terakhir yang sudah selesai pada `hari_ini` (berakhir bulan Juni)."""
+    return hari_ini.year - 1 if hari_ini.month >= 7 else hari_ini.year - 2
+
+
+def _sampai_akhir_tahun_ajaran(tahun):
+    # Semua tagihan tahun <= `tahun`, ditambah Januari-Juni `tahun`+1 (semester genap)
+    semester_genap = Q()
+    for nama in BULAN[:6]:
+        semester_genap |= Q(bulan__iexact=nama)
+    return Q(tahun__lte=tahun) | (Q(tahun=tahun + 1) & semester_genap)
+
+
+def _kandidat(sekolah, tahun):
+    return (
+        Tagihan.objects.filter(_sampai_akhir_tahun_ajaran(tahun), sekolah=sekolah, jumlah__gt=F('jumlah_terbayar'))
+        .exclude(status__in=Tagihan.STATUS_TIDAK_DITAGIH)
+    )
+
+
+def _ringkasan(sekolah, tahun, tagihan_qs):
+    total = tagihan_qs.aggregate(
+        tagihan=Count('id'), siswa=Count('siswa', distinct=True), sisa=Sum(F('jumlah') - F('jumlah_terbayar')),
+    )
+    per_kelas = dict(
+        Siswa.objects.filter(sekolah=sekolah, kelas__in=KENAIKAN_KELAS)
+        .values_list('kelas').annotate(n=Count('id')).values_list('kelas', 'n')
+    )
+    return {
+        'tahun': tahun,
+        'tagihan_ditutup': total['tagihan'],
+        'siswa_menunggak': total['siswa'],
+        'total_tunggakan': total['sisa'] or 0,
+        'naik_kelas': {k: per_kelas.get(k, 0) for k in KENAIKAN_KELAS},
+    }
+
+
+def tutup_tahun(sekolah, tahun, dry_run=False):
+    """
+    Tutup tahun ajaran `tahun` untuk `sekolah`. Return ringkasan dict (untuk dry run
+    dihitung tanpa menulis apa pun). Raise SudahDitutup jika sudah pernah.
+    """
+    mulai = time.perf_counter()
+    if TutupTahun.objects.filter(sekolah=sekolah, tahun=tahun).exists():
+        raise SudahDitutup(f"Tahun ajaran {tahun}/{tahun + 1} sudah ditutup untuk {sekolah}.")
+
+    if dry_run:
+        return _ringkasan(sekolah, tahun, _kandidat(sekolah, tahun))
+
+    with transaction.atomic():
+        # Kunci tagihan agar tidak ada pembayaran masuk di tengah proses
+        lama = list(
+            _kandidat(sekolah, tahun).select_for_update()
+            .order_by('id')
+            .values('id', 'siswa_id', 'tahun', sisa=F('jumlah') - F('jumlah_terbayar'))
+        )
+        ringkasan = _ringkasan(sekolah, tahun, Tagihan.objects.filter(id__in=[t['id'] for t in lama]))
+
+        # 1. Satu tagihan tunggakan per siswa (jumlah sisa dari semua tagihan lamanya)
+        sisa_per_siswa = {}
+        for t in lama:
+            sisa_per_siswa[t['siswa_id']] = sisa_per_siswa.get(t['siswa_id'], 0) + t['sisa']
+        judul = f"Tunggakan tahun ajaran {tahun}/{tahun + 1}"
+        baru = Tagihan.objects.bulk_create(
+            [
+                Tagihan(sekolah=sekolah, siswa_id=siswa_id, judul=judul, jumlah=sisa,
+                        bulan=BULAN_TUNGGAKAN, tahun=tahun + 1)
+                for siswa_id, sisa in sisa_per_siswa.items()
+            ],
+            batch_size=UKURAN_BATCH,
+        )
+        catat_tagihan_baru(baru)
+
+        # 2. Tutup tagihan lama: nominal tetap, saldonya di ledger dinolkan karena
+        # sisanya sudah tercatat di tagihan tunggakan
+        MutasiSaldo.objects.bulk_create(
+            [
+                MutasiSaldo(siswa_id=t['siswa_id'], tagihan_id=t['id'], jenis='PENYESUAIAN',
+                            jumlah=-t['sisa'], keterangan=judul)
+                for t in lama
+            ],
+            batch_size=UKURAN_BATCH,
+        )
+        tunggakan = Tagihan.objects.filter(
+            sekolah=sekolah, siswa_id=OuterRef('siswa_id'), judul=judul, bulan=BULAN_TUNGGAKAN, tahun=tahun + 1,
+        )
+        Tagihan.objects.filter(id__in=[t['id'] for t in lama]).update(
+            status='DITUTUP', dipindah_ke=Subquery(tunggakan.values('id')[:1]),
+        )
+
+        # 3. Naik kelas dengan satu UPDATE
+        naik = Siswa.objects.filter(sekolah=sekolah, kelas__in=KENAIKAN_KELAS).update(
+            kelas=Case(*[When(kelas=dari, then=Value(ke)) for dari, ke in KENAIKAN_KELAS.items()])
+        )
+
+        TutupTahun.objects.create(
+            sekolah=sekolah, tahun=tahun, tagihan_ditutup=len(lama), siswa_menunggak=len(sisa_per_siswa),
+            total_tunggakan=ringkasan['total_tunggakan'], siswa_naik_kelas=naik,
+        )
+
+        # UPDATE/bulk_create tidak memicu sinyal Tagihan
+        for th in {t['tahun'] for t in lama} | {tahun + 1}:
+            transaction.on_commit(lambda th=th: hapus_cache_matriks(sekolah.id, th))
+        # Semua kelas berubah anggota (naik kelas)
+        for kelas in {*KENAIKAN_KELAS, *KENAIKAN_KELAS.values()}:
+            transaction.on_commit(lambda k=kelas: hapus_cache_kelas(sekolah.id, k))
+
+    catat('tutup_tahun', sekolah=sekolah.kode, tahun=tahun, tagihan_ditutup=len(lama),
+          siswa_menunggak=len(sisa_per_siswa), total=ringkasan['total_tunggakan'],
+          naik_kelas=naik, durasi_ms=durasi_ms(mulai))
+    return ringkasan
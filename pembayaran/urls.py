@@ -1,5 +1,5 @@
-from django.urls import path
-from . import views
+from django.urls import path, reverse_lazy
+from . import ratelimit, views
 from django.contrib.auth import views as auth_views
 from django.conf import settings
 from django.conf.urls.static import static
@@ -7,10 +7,20 @@ from django.conf.urls.static import static
 urlpatterns = [
     # Halaman utama (dashboard siswa)
     path('', views.dashboard_siswa, name='dashboard'),
+    path('riwayat/', views.riwayat_lunas, name='riwayat_lunas'),
+    path('wali-kelas/', views.dashboard_wali_kelas, name='dashboard_wali_kelas'),
 
     # Halaman Login / Logout bawaan Django
-    path('login/', auth_views.LoginView.as_view(template_name='pembayaran/login.html'), name='login'),
+    path('login/', ratelimit.batasi('login', metode=('POST',))(
+        auth_views.LoginView.as_view(template_name='pembayaran/login.html')
+    ), name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='login'), name='logout'),
+
+    # Aktivasi akun siswa hasil impor CSV: siswa membuat password sendiri
+    path('aktivasi/<uidb64>/<token>/', ratelimit.batasi('login', metode=('POST',))(
+        auth_views.PasswordResetConfirmView.as_view(success_url=reverse_lazy('aktivasi_selesai'))
+    ), name='aktivasi_akun'),
+    path('aktivasi/selesai/', auth_views.PasswordResetCompleteView.as_view(), name='aktivasi_selesai'),
     
     # URL ini akan dipanggil oleh JavaScript fetch()
     path('bayar/<int:tagihan_id>/', views.buat_transaksi, name='buat_transaksi'),
@@ -18,6 +28,12 @@ urlpatterns = [
 
     # Kwitansi pembayaran
     path('kwitansi/<int:pembayaran_id>/', views.lihat_kwitansi, name='lihat_kwitansi'),
+
+    # Health check & pemanasan setelah cold start
+    path('sehat/', views.sehat, name='sehat'),
+
+    # Metrik format Prometheus
+    path('metrics/', views.metrics_prometheus, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -1,35 +1,57 @@
 # pembayaran/views.py
 
 import datetime
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import redirect, render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from .models import Siswa, Tagihan, Pembayaran
+from .models import Siswa, Tagihan, Pembayaran, TagihanArsip, PembayaranArsip, WaliKelas
+from .archive import cari_pembayaran, versi_pembayaran
+from . import gateway, metrics, ratelimit, reports, warmup
+from .events import catat, durasi_ms
+from .tenancy import staff_sekolah
 from django.conf import settings 
-from django.db.models import Sum, Q
-from django.http import JsonResponse, HttpResponse
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.http import JsonResponse, HttpResponse, Http404
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
-from decimal import Decimal
+from django.views.decorators.http import condition
+import hashlib
+import hmac
 import json
-import midtransclient
+import logging
+import time
 import uuid
 
-@login_required 
-def dashboard_siswa(request):
+def _siswa_aktif(request):
+    """Profil siswa milik user, hanya jika terdaftar di sekolah domain ini."""
     try:
         siswa = request.user.siswa
     except Siswa.DoesNotExist:
+        return None
+    return siswa if siswa.sekolah_id == request.sekolah.id else None
+
+def _wali_kelas_aktif(request):
+    """Profil wali kelas milik user, hanya jika terdaftar di sekolah domain ini."""
+    try:
+        wali = request.user.walikelas
+    except WaliKelas.DoesNotExist:
+        return None
+    return wali if wali.sekolah_id == request.sekolah.id else None
+
+@login_required 
+def dashboard_siswa(request):
+    siswa = _siswa_aktif(request)
+    if siswa is None:
+        if _wali_kelas_aktif(request):
+            return redirect('dashboard_wali_kelas')
         return render(request, 'pembayaran/bukan_siswa.html')
 
     # 1. Ambil tagihan yang BELUM LUNAS
     tagihan_belum_lunas = Tagihan.objects.filter(
         siswa=siswa
-    ).exclude(status='LUNAS').order_by('tanggal_dibuat')
+    ).exclude(status__in=('LUNAS', 'DITUTUP')).order_by('tanggal_dibuat')
 
-    # 2. Ambil tagihan yang SUDAH LUNAS
-    tagihan_lunas = Tagihan.objects.filter(
-        siswa=siswa, 
-        status='LUNAS'
-    ).prefetch_related('pembayaran_set').order_by('-tanggal_dibuat')
+    # 2. Ambil riwayat tagihan LUNAS/DITUTUP, termasuk arsip (halaman pertama saja, sisanya lewat riwayat_lunas)
+    tagihan_lunas, berikutnya = _riwayat_lunas(siswa)
 
     # 3. Hitung total dan jumlah tunggakan
     # Gunakan filter yang sama dengan tagihan_belum_lunas untuk konsistensi
@@ -45,6 +67,7 @@ def dashboard_siswa(request):
         'siswa': siswa,
         'tagihan_belum_lunas': tagihan_belum_lunas,
         'tagihan_lunas': tagihan_lunas,
+        'riwayat_berikutnya': berikutnya,
         'total_tunggakan': total_tunggakan,
         'jumlah_tunggakan': jumlah_tunggakan,
         'midtrans_client_key': settings.MIDTRANS_CLIENT_KEY, # Kirim client key ke template
@@ -52,26 +75,91 @@ def dashboard_siswa(request):
     return render(request, 'pembayaran/dashboard.html', context)
 
 
+UKURAN_HALAMAN_RIWAYAT = 10
+
+
+STATUS_RIWAYAT = ('LUNAS', 'DITUTUP')
+FIELD_RIWAYAT = ('id', 'judul', 'jumlah', 'status', 'tanggal_dibuat',
+                 'pembayaran_id', 'pembayaran_tanggal', 'pembayaran_metode')
+
+
+def _riwayat_lunas(siswa, sebelum=None, jumlah=UKURAN_HALAMAN_RIWAYAT):
+    """
+    Satu halaman tagihan LUNAS/DITUTUP, terbaru dulu, dengan keyset
+    (tanggal_dibuat, id) setelah tagihan `sebelum`. Tagihan aktif dan arsip
+    digabung dengan UNION (ID arsip = ID tagihan aslinya, jadi tidak bentrok),
+    pembayaran pertama tiap tagihan ikut di-annotate dalam query yang sama.
+    Mengembalikan (daftar_tagihan (dict), id_tagihan_berikutnya_atau_None).
+    """
+    bagian = []
+    for model_tagihan, model_pembayaran in ((Tagihan, Pembayaran), (TagihanArsip, PembayaranArsip)):
+        pertama = model_pembayaran.objects.filter(tagihan=OuterRef('pk')).order_by('tanggal_bayar', 'id')
+        bagian.append(
+            model_tagihan.objects.filter(siswa=siswa, status__in=STATUS_RIWAYAT).annotate(
+                pembayaran_id=Subquery(pertama.values('id')[:1]),
+                pembayaran_tanggal=Subquery(pertama.values('tanggal_bayar')[:1]),
+                pembayaran_metode=Subquery(pertama.values('metode_pembayaran')[:1]),
+            ).order_by()
+        )
+
+    if sebelum is not None:
+        acuan = next(
+            (a for a in (qs.filter(id=sebelum).values('tanggal_dibuat').first() for qs in bagian) if a), None
+        )
+        if acuan is None:
+            return [], None
+        setelah = (
+            Q(tanggal_dibuat__lt=acuan['tanggal_dibuat'])
+            | Q(tanggal_dibuat=acuan['tanggal_dibuat'], id__lt=sebelum)
+        )
+        bagian = [qs.filter(setelah) for qs in bagian]
+
+    aktif, arsip = (qs.values(*FIELD_RIWAYAT) for qs in bagian)
+    qs = aktif.union(arsip, all=True).order_by('-tanggal_dibuat', '-id')
+
+    # Ambil satu baris lebih untuk tahu apakah masih ada halaman berikutnya
+    baris = list(qs[:jumlah + 1])
+    if len(baris) > jumlah:
+        baris = baris[:jumlah]
+        return baris, baris[-1]['id']
+    return baris, None
+
+
+@login_required
+def riwayat_lunas(request):
+    """Fragment HTML riwayat pembayaran berikutnya (dipanggil fetch() dari dashboard)."""
+    siswa = _siswa_aktif(request)
+    if siswa is None:
+        raise Http404
+
+    try:
+        sebelum = int(request.GET['sebelum'])
+    except (KeyError, ValueError):
+        return HttpResponse("Parameter 'sebelum' wajib diisi.", status=400)
+
+    tagihan_lunas, berikutnya = _riwayat_lunas(siswa, sebelum)
+    return render(request, 'pembayaran/_riwayat_lunas.html', {
+        'tagihan_lunas': tagihan_lunas,
+        'riwayat_berikutnya': berikutnya,
+    })
+
+
 # ----------------------------------------------------------------
 # --- FUNGSI 'buat_transaksi'
 # ----------------------------------------------------------------
 @login_required
+@ratelimit.batasi('bayar')
 def buat_transaksi(request, tagihan_id):
-    # Konfigurasi Midtrans
-    snap = midtransclient.Snap(
-        is_production=True, # Set False untuk Sandbox
-        server_key=settings.MIDTRANS_SERVER_KEY,
-        client_key=settings.MIDTRANS_CLIENT_KEY
-    )
-
     try:
         # 1. Ambil data tagihan dari database
-        tagihan = Tagihan.objects.get(id=tagihan_id, siswa=request.user.siswa)
+        tagihan = Tagihan.objects.get(id=tagihan_id, siswa=request.user.siswa, sekolah=request.sekolah)
         jumlah_bayar = int(tagihan.sisa_tagihan)
         
         # 2. Cek apakah tagihan sudah lunas
         if tagihan.status == 'LUNAS':
             return JsonResponse({'error': 'Tagihan ini sudah lunas.'}, status=400)
+        if tagihan.status == 'DITUTUP':
+            return JsonResponse({'error': 'Tagihan ini sudah dipindah ke tunggakan tahun lalu.'}, status=400)
 
         # 3. Buat order_id yang unik
         order_id = f"SPP-{tagihan.id}-{uuid.uuid4()}" 
@@ -95,35 +183,78 @@ def buat_transaksi(request, tagihan_id):
         }
 
         # 5. Panggil API Midtrans untuk dapatkan token
-        transaction_token = snap.create_transaction(transaction_params)
+        mulai = time.perf_counter()
+        with metrics.SNAP_DURASI.waktu():
+            transaction_token = gateway.snap().create_transaction(transaction_params)
+        catat('snap_token_dibuat', order_id=order_id, tagihan_id=tagihan.id, durasi_ms=durasi_ms(mulai))
         
         # 6. Kirim token kembali ke frontend
         return JsonResponse({'token': transaction_token['token']})
 
-    except Tagihan.DoesNotExist:
+    except (Tagihan.DoesNotExist, Siswa.DoesNotExist):
         return JsonResponse({'error': 'Tagihan tidak ditemukan.'}, status=404)
     except Exception as e:
-        print(f"Error Midtrans: {e}")
+        metrics.SNAP_ERROR.inc()
+        catat('snap_token_gagal', level=logging.ERROR, tagihan_id=tagihan_id, error=str(e), exc_info=True)
         return JsonResponse({'error': f'Terjadi kesalahan: {str(e)}'}, status=500)
 
 # ----------------------------------------------------------------
 # --- FUNGSI WEBHOOK (Struktur try-except sudah diperbaiki)
 # ----------------------------------------------------------------
 
-# 1. Konfigurasi "Core API" client Midtrans untuk verifikasi
-core_api = midtransclient.CoreApi(
-    is_production=True,
-    server_key=settings.MIDTRANS_SERVER_KEY,
-    client_key=settings.MIDTRANS_CLIENT_KEY
-)
+# Client "Core API" Midtrans untuk verifikasi: gateway.core_api() (dibuat saat dipakai)
+
+# Naikkan jika template kwitansi berubah, agar ETag lama di browser tidak dipakai lagi
+VERSI_TEMPLATE_KWITANSI = '1'
+
+def _boleh_lihat_kwitansi(request, versi):
+    """Aturan akses yang sama dengan lihat_kwitansi: sekolah ini, lalu admin atau siswa pemilik."""
+    if versi['tagihan__siswa__sekolah_id'] != request.sekolah.id:
+        return False
+    if staff_sekolah(request):
+        return True
+    siswa = _siswa_aktif(request)
+    return siswa is not None and siswa.id == versi['tagihan__siswa_id']
+
+def _versi_kwitansi(request, pembayaran_id):
+    # Dipakai oleh etag & last_modified; query cukup sekali per request.
+    # @condition berjalan SEBELUM view, jadi hak akses dicek di sini dulu:
+    # tanpa akses -> None (tanpa ETag), view lalu menjawab 404 seperti biasa,
+    # sehingga 304 tidak membocorkan keberadaan kwitansi orang lain.
+    if not hasattr(request, '_versi_kwitansi'):
+        versi = versi_pembayaran(pembayaran_id)
+        request._versi_kwitansi = versi if versi and _boleh_lihat_kwitansi(request, versi) else None
+    return request._versi_kwitansi
+
+def _etag_kwitansi(request, pembayaran_id):
+    versi = _versi_kwitansi(request, pembayaran_id)
+    if versi is None:
+        return None
+    # User & sekolah ikut di-hash: kwitansi di-cache per pengguna (Cache-Control: private)
+    mentah = '|'.join(str(v) for v in (
+        VERSI_TEMPLATE_KWITANSI, pembayaran_id, request.user.pk, request.sekolah.id, *versi.values()
+    ))
+    return hashlib.sha256(mentah.encode()).hexdigest()[:32]
+
+def _last_modified_kwitansi(request, pembayaran_id):
+    versi = _versi_kwitansi(request, pembayaran_id)
+    return versi and versi['waktu_terakhir']
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_kwitansi, last_modified_func=_last_modified_kwitansi)
 def lihat_kwitansi(request, pembayaran_id):
-    # 1. Ambil data pembayaran, atau tampilkan 404 jika tidak ditemukan
-    pembayaran = get_object_or_404(Pembayaran, id=pembayaran_id)
+    # 1. Ambil data pembayaran (tabel aktif atau arsip), atau tampilkan 404
+    pembayaran = cari_pembayaran(pembayaran_id)
+    if pembayaran is None:
+        raise Http404("Kwitansi tidak ditemukan.")
+
+    # Kwitansi sekolah lain tidak boleh dibuka dari domain sekolah ini (termasuk oleh admin)
+    if pembayaran.tagihan and pembayaran.tagihan.siswa.sekolah_id != request.sekolah.id:
+        raise Http404("Kwitansi tidak ditemukan.")
 
-    if request.user.is_staff or request.user.is_superuser:
-        pass # Admin Boleh Lanjut (Bypass pengecekan siswa)
+    if staff_sekolah(request):
+        pass # Admin sekolah ini Boleh Lanjut (Bypass pengecekan siswa)
     
     # 2. Cek apakah yang akses adalah SISWA PEMILIK?
     # Kita pakai hasattr untuk memastikan user punya profil siswa dulu sebelum dicek
@@ -144,6 +275,26 @@ def lihat_kwitansi(request, pembayaran_id):
 
     return render(request, 'pembayaran/kwitansi.html', context)
 
+@login_required
+def dashboard_wali_kelas(request):
+    # Wali kelas hanya melihat kelasnya sendiri; staff sekolah ini boleh memilih kelas lewat ?kelas=
+    wali = _wali_kelas_aktif(request)
+    if wali is not None:
+        kelas = wali.kelas
+    elif staff_sekolah(request):
+        kelas = request.GET.get('kelas') or '7'
+    else:
+        raise Http404("Halaman ini hanya untuk wali kelas.")
+
+    context = {
+        'wali': wali,
+        'kelas': kelas,
+        'daftar_kelas': Siswa.objects.filter(sekolah=request.sekolah).values_list('kelas', flat=True)
+                        .distinct().order_by('kelas') if wali is None else [],
+        'data': reports.ringkasan_kelas(request.sekolah, kelas),
+    }
+    return render(request, 'pembayaran/wali_kelas.html', context)
+
 @login_required
 def view_laporan_tunggakan(request):
     # 1. Ambil Input Filter dari URL
@@ -185,29 +336,52 @@ def view_laporan_tunggakan(request):
     return render(request, 'pembayaran/laporan_tunggakan_js.html', context)
 
 @csrf_exempt
+@metrics.ukur_webhook
+@ratelimit.batasi('webhook')
 def webhook_midtrans(request):
     if request.method == 'POST':
+        mulai = time.perf_counter()
+        order_id = None
         try:
             # 1. Ambil data dari Midtrans
             body = json.loads(request.body)
+            if isinstance(body, dict):
+                order_id = body.get('order_id')
+
+            # 2. Validasi murah sebelum menyentuh database: signature, order_id, nominal
+            try:
+                tagihan_id, gross_amount = gateway.validasi_notifikasi(body) # gross_amount = jumlah yang dibayar kali ini
+            except gateway.NotifikasiTidakValid as e:
+                request.transaction_status = 'ditolak' # Label untuk metrik
+                catat('webhook_ditolak', level=logging.WARNING, order_id=str(order_id)[:100],
+                      error=str(e), durasi_ms=durasi_ms(mulai))
+                return HttpResponse(status=e.status)
+
             transaction_status = body.get('transaction_status')
-            order_id = body.get('order_id')
             transaction_id = body.get('transaction_id') # <-- INI ID OTOMATIS DARI MIDTRANS
             payment_type = body.get('payment_type')
-            gross_amount = Decimal(body.get('gross_amount')) # Jumlah yang dibayar kali ini
+            request.transaction_status = transaction_status # Label untuk metrik
 
-            print(f"WEBHOOK: Order {order_id}, Status {transaction_status}, ID Transaksi {transaction_id}")
-
-            # 2. Cari Tagihan Terkait
+            # 3. Cari Tagihan Terkait. Server key & URL notifikasi Midtrans hanya satu
+            # per deployment, jadi notifikasi semua sekolah datang ke host yang sama:
+            # sekolahnya diambil dari tagihan (order_id), bukan dari host request.
             try:
-                # Format order_id kita: "SPP-ID_TAGIHAN-UUID"
-                tagihan_id = order_id.split('-')[1]
                 tagihan = Tagihan.objects.get(id=tagihan_id)
-            except (Tagihan.DoesNotExist, IndexError, ValueError) as e:
-                print(f"Error cari tagihan: {e}")
+            except Tagihan.DoesNotExist as e:
+                catat('webhook_tagihan_tidak_ditemukan', level=logging.WARNING, order_id=order_id,
+                      error=str(e), durasi_ms=durasi_ms(mulai))
                 return HttpResponse(status=404)
 
-            # 3. LOGIKA UTAMA
+            # Transaksi dibuat sebelum tutup tahun tapi notifikasinya datang sesudahnya:
+            # sisa tagihan ini sudah dipindah, jadi uangnya masuk ke tagihan tunggakan
+            dialihkan_dari = None
+            while tagihan.status == 'DITUTUP' and tagihan.dipindah_ke_id:
+                dialihkan_dari = dialihkan_dari or tagihan.id
+                tagihan = Tagihan.objects.get(id=tagihan.dipindah_ke_id)
+
+            hasil = 'diabaikan'
+
+            # 4. LOGIKA UTAMA
             if transaction_status == 'settlement':
                 # "Capture" atau "Settlement" berarti uang masuk/berhasil
                 
@@ -223,17 +397,10 @@ def webhook_midtrans(request):
                     }
                 )
 
-                # B. JIKA ini adalah data pembayaran BARU (created=True), update saldo Tagihan
-                if created:
-                    # Tambahkan jumlah yang baru dibayar ke total yang sudah dibayar
-                    tagihan.jumlah_terbayar += gross_amount
-                    
-                    # Panggil save() agar logika status (LUNAS/BELUM) di models.py berjalan
-                    tagihan.save() 
-                    
-                    print(f"Pembayaran baru Rp {gross_amount} diterima. Total terbayar: {tagihan.jumlah_terbayar}")
-                else:
-                    print("Notifikasi duplikat diterima, diabaikan.")
+                # B. JIKA ini adalah data pembayaran BARU (created=True), saldo Tagihan
+                # sudah dihitung ulang oleh sinyal update_saldo_tagihan (models.py),
+                # jadi jangan ditambah lagi di sini (dulu terhitung dobel).
+                hasil = 'pembayaran_baru' if created else 'duplikat'
 
             elif transaction_status in ['expire', 'cancel', 'deny']:
                 # Jika pembayaran gagal, kita tidak perlu mengubah saldo 'jumlah_terbayar'
@@ -241,14 +408,44 @@ def webhook_midtrans(request):
                 if tagihan.status == 'PENDING':
                     # Kembalikan status sesuai kondisi uang
                     tagihan.save() # save() akan otomatis hitung ulang: kalau 0 jadi BELUM_LUNAS
-                    print(f"Transaksi {order_id} gagal. Status dikembalikan.")
-
+                    hasil = 'status_dikembalikan'
+
+            catat(
+                'webhook_midtrans', order_id=order_id, sekolah=tagihan.sekolah_id, tagihan_id=tagihan.id,
+                transaction_id=transaction_id,
+                transaction_status=transaction_status, jumlah=gross_amount, hasil=hasil,
+                jumlah_terbayar=tagihan.jumlah_terbayar, dialihkan_dari=dialihkan_dari, durasi_ms=durasi_ms(mulai),
+            )
             return HttpResponse(status=200)
 
         except json.JSONDecodeError:
             return HttpResponse(status=400)
         except Exception as e:
-            print(f"Error Webhook: {e}")
+            catat('webhook_error', level=logging.ERROR, order_id=order_id, error=str(e),
+                  durasi_ms=durasi_ms(mulai), exc_info=True)
             return HttpResponse(status=500)
     
-    return HttpResponse(status=405)
\ No newline at end of file
+    return HttpResponse(status=405)
+
+def metrics_prometheus(request):
+    # Endpoint untuk Prometheus. Jika METRICS_TOKEN diisi, wajib kirim
+    # header "Authorization: Bearer <token>"; jika tidak, hanya untuk staff.
+    token = settings.METRICS_TOKEN
+    if token:
+        header = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(header, f"Bearer {token}"):
+            return HttpResponse(status=401)
+    elif not request.user.is_staff:
+        return HttpResponse(status=403)
+
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def sehat(request):
+    # Health check + pemanasan setelah cold start (arahkan health check Render ke sini).
+    # Tanpa login; hanya mengembalikan durasi, bukan data.
+    try:
+        hasil = warmup.panaskan()
+    except Exception as e:
+        catat('warmup_gagal', level=logging.ERROR, error=str(e), exc_info=True)
+        return JsonResponse({'status': 'error'}, status=503)
+    return JsonResponse({'status': 'ok', **hasil})
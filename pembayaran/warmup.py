@@ -0,0 +1,76 @@
+# pembayaran/warmup.py
+
+"""
+Pemanasan setelah cold start (dipanggil endpoint /sehat/). Kerja yang
+biasanya dibayar oleh request pertama dipindah ke sini:
+koneksi database, URLconf, kompilasi template, dan import client Midtrans.
+"""
+
+import time
+
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import reverse
+
+from . import gateway
+
+TEMPLATE_DIPANASKAN = (
+    'pembayaran/login.html',
+    'pembayaran/dashboard.html',
+    'pembayaran/_riwayat_lunas.html',
+    'pembayaran/kwitansi.html',
+    'pembayaran/wali_kelas.html',
+    'admin/login.html',
+    'admin/index.html',
+    'admin/change_list.html',
+    'admin/change_form.html',
+)
+
+_sudah_hangat = False
+
+
+def _ms(mulai):
+    return round((time.perf_counter() - mulai) * 1000, 2)
+
+
+def cek_database():
+    """Buka (atau pakai ulang, CONN_MAX_AGE) koneksi ke semua database."""
+    for conn in connections.all():
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+
+def panaskan():
+    """
+    Return waktu tiap langkah dalam milidetik. Setelah berhasil sekali per
+    proses, panggilan berikutnya hanya mengecek database (murah untuk health check).
+    """
+    global _sudah_hangat
+    hasil = {}
+
+    mulai = time.perf_counter()
+    cek_database()
+    hasil['database_ms'] = _ms(mulai)
+
+    if _sudah_hangat:
+        return hasil
+
+    # reverse() memaksa URLconf (termasuk semua URL admin) di-load dan di-index
+    mulai = time.perf_counter()
+    reverse('dashboard')
+    reverse('admin:index')
+    hasil['urlconf_ms'] = _ms(mulai)
+
+    # Dengan cached template loader, template yang sudah dikompilasi disimpan per proses
+    mulai = time.perf_counter()
+    for nama in TEMPLATE_DIPANASKAN:
+        get_template(nama)
+    hasil['template_ms'] = _ms(mulai)
+
+    mulai = time.perf_counter()
+    gateway.snap()
+    gateway.core_api()
+    hasil['gateway_ms'] = _ms(mulai)
+
+    _sudah_hangat = True
+    return hasil
@@ -13,6 +13,7 @@ import os
 import dj_database_url
 from dotenv import load_dotenv
 from pathlib import Path
+from pembayaran.tenancy import JazzminPerSekolah
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -35,6 +36,12 @@ ALLOWED_HOSTS = [
     'www.spp-smp-it-darus-sholihin.onrender.com',
     'localhost'
     ]
+# Domain sekolah lain di deployment yang sama, dipisah koma (misal ".sppsekolah.id,spp.smpabc.sch.id")
+ALLOWED_HOSTS += [h.strip() for h in os.getenv('ALLOWED_HOSTS_TAMBAHAN', '').split(',') if h.strip()]
+
+# Sekolah (kode) untuk host yang tidak terdaftar di tabel Sekolah, misal localhost
+# atau IP server. Kosongkan agar host tak dikenal dibalas 404.
+SEKOLAH_DEFAULT = os.getenv('SEKOLAH_DEFAULT', 'darus-sholihin')
 
 
 # Application definition
@@ -56,6 +63,7 @@ MIDDLEWARE = [
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'pembayaran.tenancy.SekolahMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -74,6 +82,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'pembayaran.tenancy.context_processor',
             ],
         },
     },
@@ -115,6 +124,9 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Masa berlaku tautan aktivasi akun siswa hasil impor CSV (token reset password)
+PASSWORD_RESET_TIMEOUT = 14 * 24 * 3600
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -151,12 +163,105 @@ LOGOUT_REDIRECT_URL = '/admin'
 # Konfigurasi Midtrans
 MIDTRANS_CLIENT_KEY = os.getenv('MIDTRANS_CLIENT_KEY')
 MIDTRANS_SERVER_KEY = os.getenv('MIDTRANS_SERVER_KEY')
+# Kosongkan di production. Diisi oleh uji beban (manage.py uji_beban) agar
+# Snap API diarahkan ke server Midtrans palsu lokal.
+MIDTRANS_SNAP_BASE_URL = os.getenv('MIDTRANS_SNAP_BASE_URL')
+
+# Rate limit per IP: {nama: (jumlah request, jendela detik)}. Lihat pembayaran/ratelimit.py
+RATE_LIMIT_AKTIF = os.getenv('RATE_LIMIT_AKTIF', 'True').lower() == 'true'
+# Isi 'True' HANYA jika aplikasi di belakang proxy yang menambahkan X-Forwarded-For
+# (Render); tanpa proxy header itu bisa diisi klien sembarangan
+RATE_LIMIT_PERCAYA_PROXY = os.getenv('RATE_LIMIT_PERCAYA_PROXY', 'False').lower() == 'true'
+# Batas login/bayar sengaja longgar: satu lab sekolah bisa berbagi satu IP (NAT)
+RATE_LIMIT = {
+    'login': (int(os.getenv('RATE_LIMIT_LOGIN', '30')), 60),      # hanya POST (percobaan login)
+    'bayar': (int(os.getenv('RATE_LIMIT_BAYAR', '30')), 60),
+    'webhook': (int(os.getenv('RATE_LIMIT_WEBHOOK', '300')), 60),
+}
+
+# Konfigurasi Email (pengingat tunggakan)
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '587'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True').lower() == 'true'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'keuangan@smpit-darussholihin.sch.id')
+# Backend khusus pengingat (kosong = pakai EMAIL_BACKEND)
+PENGINGAT_EMAIL_BACKEND = os.getenv('PENGINGAT_EMAIL_BACKEND')
+
+# Konfigurasi Metrik (/metrics/)
+# Folder bersama agar metrik semua worker gunicorn bisa dijumlahkan
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Konfigurasi Logging
+# Event aplikasi (logger 'pembayaran') ditulis sebagai JSON per baris ke stdout
+# lewat antrean + thread latar belakang, agar request tidak menunggu I/O.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'pembayaran.events.JsonFormatter'},
+    },
+    'handlers': {
+        'antrean_json': {
+            'class': 'pembayaran.events.AntreanHandler',
+            'formatter': 'json',
+        },
+    },
+    'loggers': {
+        'pembayaran': {
+            'handlers': ['antrean_json'],
+            'level': os.getenv('LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Rasio sampling event bervolume tinggi (1.0 = semua dicatat)
+LOG_SAMPLING = {
+    'saldo_diperbarui': float(os.getenv('LOG_SAMPLING_SALDO', '1.0')),
+    'webhook_midtrans': float(os.getenv('LOG_SAMPLING_WEBHOOK', '1.0')),
+}
 
 # Konfigurasi Static Files untuk Production
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Django 5.1+ tidak lagi membaca STATICFILES_STORAGE, jadi pakai STORAGES.
+# Nama file diberi hash konten, sehingga WhiteNoise mengirimnya dengan
+# Cache-Control max-age 10 tahun + immutable. Versi .gz dan .br (jika paket
+# Brotli terpasang) dibuat saat collectstatic dan dipilih sesuai Accept-Encoding.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 
-JAZZMIN_SETTINGS = {
+# Cache lokal per proses; setiap kunci otomatis diberi awalan kode sekolah aktif.
+# 'bersama' dipakai semua worker & perintah cron untuk nomor versi laporan
+# (lihat reports.py): Redis jika REDIS_URL diisi, selain itu tabel database
+# (dibuat oleh `manage.py createcachetable`).
+REDIS_URL = os.getenv('REDIS_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'KEY_FUNCTION': 'pembayaran.tenancy.buat_kunci_cache',
+    },
+    'bersama': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'spp',
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'spp_cache_bersama',
+    },
+}
+
+# site_title, copyright & site_logo diganti sesuai sekolah aktif (lihat tenancy.py)
+JAZZMIN_SETTINGS = JazzminPerSekolah({
     "site_title": "SPP Darus Sholihin",
     "site_header": "Admin SPP",
     "site_brand": "Panel Admin",
@@ -165,7 +270,7 @@ JAZZMIN_SETTINGS = {
     
     # Menu samping agar otomatis ngelink ke model
     "show_ui_builder": False,
-}
+})
 
 JAZZMIN_UI_TWEAKS = {
     # Tema dasar yang bersih